@@ -0,0 +1,171 @@
+"""
+Structured, non-blocking logging.
+
+Records are formatted as one JSON object per line, tagged with the id of
+the request that produced them, and handed to a background thread through
+a bounded queue: request threads never wait on stdout. When the queue is
+full (the sink can't keep up) records are dropped and counted rather than
+blocking. Noisy loggers can be sampled with SamplingFilter.
+
+Everything is wired up through LOGGING in cimback/settings.py.
+"""
+
+import atexit
+import copy
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+_request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+# Accepted from an incoming X-Request-ID (e.g. set by the load balancer)
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def current_request_id() -> str:
+    return _request_id.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Tag records with the current request id (runs in the thread that logs, before queueing)."""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a `rate` fraction of records at or below `level`; anything more
+    severe always passes. Attach to a noisy logger in LOGGING.
+    """
+
+    def __init__(self, rate: float = 1.0, level="INFO"):
+        super().__init__()
+        self.rate = rate
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+
+    def filter(self, record):
+        if record.levelno > self.level or self.rate >= 1:
+            return True
+        if random.random() < self.rate:
+            record.sample_rate = self.rate
+            return True
+        return False
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    QueueHandler that owns its QueueListener and the stream handler behind
+    it, so it can be declared as a single handler in LOGGING (Python 3.11's
+    dictConfig can't wire listeners itself). The formatter set on this
+    handler is used by the listener thread.
+    """
+
+    def __init__(self, stream=None, queue_size: int = 10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Render the message and traceback here (their args may change or go
+        # away once we return) but leave the JSON encoding to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Flush the queue and stop the listener thread (safe to call twice)."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+def new_request_id(header: str = "") -> str:
+    return header if header and _REQUEST_ID_RE.match(header) else uuid.uuid4().hex
+
+
+class RequestIdMiddleware:
+    """
+    Give every request an id (the caller's X-Request-ID when it's sane),
+    expose it to log records and echo it back in the response.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self._start(request)
+        response = self.get_response(request)
+        response["X-Request-ID"] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        self._start(request)
+        response = await self.get_response(request)
+        response["X-Request-ID"] = request.request_id
+        return response
+
+    @staticmethod
+    def _start(request):
+        # Not reset on the way out: Django logs 4xx/5xx responses after the
+        # middleware chain returns. The next request on this thread (or its
+        # own context under ASGI) sets a new id anyway.
+        request.request_id = new_request_id(request.headers.get("X-Request-ID", ""))
+        _request_id.set(request.request_id)
@@ -0,0 +1,357 @@
+"""
+Memory instrumentation for the heavy endpoints.
+
+For requests to the URL names in MEMORY_PROFILE_ENDPOINTS,
+MemoryMiddleware records:
+
+- the RSS change over the request;
+- how far the request pushed the process's peak RSS;
+- with tracemalloc tracing, on sampled requests (MEMORY_SNAPSHOT_SAMPLE_RATE)
+  and on staff requests flagged with ?memory (authorised as for profiling),
+  the peak of traced Python allocations and the top allocating lines (a
+  snapshot diff). Snapshots are slow, so other requests skip them.
+
+It also records the RSS and traced-memory change of every timing.stage()
+the request runs (decode, whisper, local_image, ...). The results are
+logged and aggregated per endpoint and stage.
+
+Tracing starts at boot with MEMORY_TRACEMALLOC, or when staff take a
+snapshot through /api/music/metrics/memory/snapshots/. Snapshots can then
+be diffed to find what grows between two points in time.
+
+All figures are per worker process. RSS is shared by everything the
+worker runs, so concurrent requests blur into each other's numbers. Read
+them on a quiet worker, or trend them over many requests. The traced peak
+is process-wide too, and measuring it resets it: a worker takes one
+request snapshot at a time, and a request picked for one while another is
+measured goes without.
+"""
+
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .profiling import authorise
+
+try:
+    import resource
+except ImportError:  # not on Unix
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Never worth reporting: tracemalloc's own bookkeeping and the import system
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or None where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Highest RSS this process has reached."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, kB elsewhere
+
+
+def traced_bytes() -> Optional[int]:
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+
+def _delta(after: Optional[int], before: Optional[int]) -> Optional[int]:
+    return None if after is None or before is None else after - before
+
+
+# ------------------------------------------------------------------
+# Per-request and per-stage measurements
+# ------------------------------------------------------------------
+
+# Held by the request whose snapshot diff and traced peak are being measured
+_snapshot_lock = threading.Lock()
+
+
+class RequestMemory:
+    """Memory figures of one request; `active` once the view is known to be selected."""
+
+    def __init__(self):
+        self.active = False
+        self.snapshot = None
+        self.stages: List[Tuple[str, Optional[int], Optional[int]]] = []  # (stage, rss delta, traced delta)
+
+    def start(self, snapshot: bool = False):
+        self.active = True
+        self.rss = rss_bytes()
+        self.peak = peak_rss_bytes()
+        if snapshot and tracemalloc.is_tracing() and _snapshot_lock.acquire(blocking=False):
+            self.snapshot = take_snapshot()
+            self.traced = traced_bytes()
+            tracemalloc.reset_peak()
+
+    def finish(self) -> Dict:
+        result = {
+            "rss_delta": _delta(rss_bytes(), self.rss),
+            "peak_rss": peak_rss_bytes(),
+            "peak_rss_raised": _delta(peak_rss_bytes(), self.peak),
+        }
+        if self.snapshot is not None:
+            try:
+                if tracemalloc.is_tracing():
+                    result["traced_peak"] = tracemalloc.get_traced_memory()[1] - self.traced
+                    result["top"] = top_differences(take_snapshot(), self.snapshot, settings.MEMORY_TOP_ALLOCATORS)
+            finally:
+                self.snapshot = None
+                _snapshot_lock.release()
+        return result
+
+
+_request: ContextVar[Optional[RequestMemory]] = ContextVar("request_memory", default=None)
+
+
+def stage_start() -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """Called by timing.stage(); None (and nothing to do) unless the request is tracked."""
+    current = _request.get()
+    if current is None or not current.active:
+        return None
+    return rss_bytes(), traced_bytes()
+
+
+def stage_end(name: str, started: Tuple[Optional[int], Optional[int]]) -> None:
+    current = _request.get()
+    if current is not None:
+        current.stages.append((name, _delta(rss_bytes(), started[0]), _delta(traced_bytes(), started[1])))
+
+
+class MemoryStats:
+    """Running count, mean and max of each figure recorded for one endpoint stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.totals = defaultdict(int)
+        self.maxima = {}
+
+    def observe(self, figures: Dict[str, Optional[int]]) -> None:
+        self.count += 1
+        for key, value in figures.items():
+            if value is None:
+                continue
+            self.totals[key] += value
+            self.maxima[key] = max(self.maxima.get(key, value), value)
+
+    def snapshot(self) -> Dict:
+        summary = {"count": self.count}
+        for key, total in self.totals.items():
+            summary[f"{key}_mean"] = round(total / self.count)
+            summary[f"{key}_max"] = self.maxima[key]
+        return summary
+
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, MemoryStats]] = defaultdict(lambda: defaultdict(MemoryStats))
+
+
+def observe(endpoint: str, result: Dict, stages) -> None:
+    with _lock:
+        _stats[endpoint]["request"].observe({
+            key: result.get(key) for key in ("rss_delta", "peak_rss_raised", "traced_peak")
+        })
+        for name, rss_delta, traced_delta in stages:
+            _stats[endpoint][name].observe({"rss_delta": rss_delta, "traced_delta": traced_delta})
+
+
+def stats() -> Dict[str, Dict[str, Dict]]:
+    """{endpoint: {"request" or stage: summary}} for this process, in bytes."""
+    with _lock:
+        return {
+            endpoint: {name: stat.snapshot() for name, stat in stages.items()}
+            for endpoint, stages in _stats.items()
+        }
+
+
+def reset_stats() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def summary() -> Dict:
+    """Process-wide figures, for the staff endpoint."""
+    current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+    return {
+        "rss": rss_bytes(),
+        "peak_rss": peak_rss_bytes(),
+        "tracing": tracemalloc.is_tracing(),
+        "traced": current,
+        "traced_peak": peak,
+        "endpoints": stats(),
+        "snapshots": list_snapshots(),
+    }
+
+
+# ------------------------------------------------------------------
+# tracemalloc snapshots
+# ------------------------------------------------------------------
+
+def start_tracing() -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(settings.MEMORY_TRACEMALLOC_FRAMES)
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, limit: int) -> List[Dict]:
+    return [
+        {"where": str(stat.traceback), "size": stat.size, "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+def top_differences(newer: tracemalloc.Snapshot, older: tracemalloc.Snapshot, limit: int) -> List[Dict]:
+    """Lines whose allocations grew the most from `older` to `newer`."""
+    grown = [stat for stat in newer.compare_to(older, "lineno") if stat.size_diff > 0]
+    return [
+        {"where": str(stat.traceback), "size_diff": stat.size_diff, "count_diff": stat.count_diff, "size": stat.size}
+        for stat in grown[:limit]
+    ]
+
+
+_snapshots: "OrderedDict[int, Tuple[tracemalloc.Snapshot, Dict]]" = OrderedDict()
+_next_id = 1
+
+
+def save_snapshot() -> Dict:
+    """Take and keep a snapshot (starting tracemalloc if needed); oldest beyond MEMORY_SNAPSHOTS_KEEP are dropped."""
+    global _next_id
+    start_tracing()
+    snapshot = take_snapshot()
+    with _lock:
+        info = {"id": _next_id, "taken_at": time.time(), "rss": rss_bytes(), "traced": traced_bytes()}
+        _next_id += 1
+        _snapshots[info["id"]] = (snapshot, info)
+        while len(_snapshots) > settings.MEMORY_SNAPSHOTS_KEEP:
+            _snapshots.popitem(last=False)
+    return dict(info, top=top_allocations(snapshot, settings.MEMORY_TOP_ALLOCATORS))
+
+
+def list_snapshots() -> List[Dict]:
+    with _lock:
+        return [info for _, info in _snapshots.values()]
+
+
+def diff_snapshots(base_id: int, against_id: Optional[int] = None) -> Optional[Dict]:
+    """
+    Growth from snapshot `base_id` to snapshot `against_id` (a fresh,
+    unsaved snapshot by default). None when a snapshot is unknown.
+    """
+    with _lock:
+        base = _snapshots.get(base_id)
+        against = _snapshots.get(against_id) if against_id is not None else None
+    if base is None or (against_id is not None and against is None):
+        return None
+    if against is None:
+        if not tracemalloc.is_tracing():
+            return None
+        newer, info = take_snapshot(), {"id": None, "taken_at": time.time(), "rss": rss_bytes(), "traced": traced_bytes()}
+    else:
+        newer, info = against
+    older, base_info = base
+    return {
+        "base": base_info,
+        "against": info,
+        "rss_delta": _delta(info["rss"], base_info["rss"]),
+        "traced_delta": _delta(info["traced"], base_info["traced"]),
+        "top": top_differences(newer, older, settings.MEMORY_TOP_ALLOCATORS),
+    }
+
+
+def stop_tracing() -> None:
+    """Drop every snapshot and stop tracemalloc (and its overhead)."""
+    with _lock:
+        _snapshots.clear()
+    tracemalloc.stop()
+
+
+# ------------------------------------------------------------------
+# Middleware
+# ------------------------------------------------------------------
+
+class MemoryMiddleware:
+    """
+    Measure requests to the views named in MEMORY_PROFILE_ENDPOINTS (see
+    the module docstring). Other requests only pay for a contextvar.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.endpoints = set(settings.MEMORY_PROFILE_ENDPOINTS)
+        if settings.MEMORY_TRACEMALLOC:
+            start_tracing()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        current = RequestMemory()
+        token = _request.set(current)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+            self._finish(request, current)  # even on errors, to release the snapshot lock
+
+    async def __acall__(self, request):
+        current = RequestMemory()
+        token = _request.set(current)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request.reset(token)
+            self._finish(request, current)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current = _request.get()
+        if current is not None and request.resolver_match.url_name in self.endpoints:
+            current.start(snapshot=tracemalloc.is_tracing() and self._wants_snapshot(request))
+        return None
+
+    @staticmethod
+    def _wants_snapshot(request) -> bool:
+        if random.random() < settings.MEMORY_SNAPSHOT_SAMPLE_RATE:
+            return True
+        return "memory" in request.GET and authorise(request) is not None
+
+    @staticmethod
+    def _finish(request, current: RequestMemory) -> None:
+        if not current.active:
+            return
+        result = current.finish()
+        endpoint = f"{request.method} /{request.resolver_match.route}"
+        observe(endpoint, result, current.stages)
+        logger.info("Request memory", extra=dict(result, endpoint=endpoint, stages=current.stages))
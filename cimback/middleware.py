@@ -0,0 +1,147 @@
+"""
+Response compression (brotli or gzip) for API payloads.
+
+Unlike django.middleware.gzip.GZipMiddleware this only touches content
+types in COMPRESSION_CONTENT_TYPES, skips bodies below COMPRESSION_MIN_SIZE
+and speaks brotli when the optional `brotli` package is installed and the
+client accepts it. Streaming responses (sync or async iterators) are
+compressed chunk by chunk. Works in sync and async middleware chains, so
+under ASGI it doesn't push the views behind it onto a worker thread.
+"""
+
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+DEFAULT_CONTENT_TYPES = (
+    "application/json",
+    "application/javascript",
+    "text/",
+    "image/svg+xml",
+)
+
+
+def accepted_encodings(header: str) -> dict:
+    """{"gzip": 1.0, "br": 0.5, ...} from an Accept-Encoding header."""
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits=31: gzip container
+            self._obj = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.finish() if self.encoding == "br" else self._obj.flush()
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.content_types = tuple(getattr(settings, "COMPRESSION_CONTENT_TYPES", DEFAULT_CONTENT_TYPES))
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or response.status_code in (204, 304):
+            return response
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if not content_type.startswith(self.content_types):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        # Vary even when this client gets plain bytes, so caches keep them apart
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = self.choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = self.compress_stream(response.streaming_content, encoding)
+            del response["Content-Length"]
+        else:
+            compressor = _Compressor(encoding)
+            compressed = compressor.compress(response.content) + compressor.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # The body bytes changed, so a strong validator becomes weak (RFC 9110 8.8.1)
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
+
+    @staticmethod
+    def choose_encoding(header: str):
+        accepted = accepted_encodings(header)
+        if brotli is not None and accepted.get("br", 0) > 0:
+            return "br"
+        if accepted.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    @staticmethod
+    def compress_stream(chunks, encoding):
+        compressor = _Compressor(encoding)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+
+    @staticmethod
+    async def acompress_stream(chunks, encoding):
+        compressor = _Compressor(encoding)
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
@@ -0,0 +1,272 @@
+"""
+On-demand profiling of single requests, for staff.
+
+A request is profiled when it carries
+
+    X-Profile: <token>        a signed token from `manage.py profile_token`, or
+    ?profile=sample|cprofile  sent with a staff user's access token.
+
+Modes:
+
+- "sample" (default): a background thread samples the stacks of every
+  thread in the worker each PROFILE_SAMPLE_INTERVAL seconds, so work done
+  in sync_to_async/to_thread workers shows up too (and, on a busy worker,
+  so do concurrent requests). Written as folded stacks (`<id>.folded`),
+  which flamegraph.pl and speedscope read directly.
+- "cprofile": deterministic cProfile of the thread serving the request,
+  written as a pstats dump (`<id>.prof`) for snakeviz, flameprof or pstats.
+
+The response is left untouched apart from an X-Profile header naming the
+stored profile; staff fetch it from /api/music/metrics/profiles/<name>/.
+Each user gets PROFILE_RATE_LIMIT profiles per PROFILE_RATE_WINDOW, and a
+worker runs one profile at a time. Requests that don't qualify are served
+normally, as if no flag had been sent.
+"""
+
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from .logs import current_request_id
+
+logger = logging.getLogger(__name__)
+
+MODES = {"sample": "folded", "cprofile": "prof"}
+TOKEN_SALT = "cimback.profiling"
+
+# One profile per worker at a time: profiles would skew each other, and
+# cProfile can't run two profilers in one thread
+_busy = threading.Lock()
+
+
+def make_token(user) -> str:
+    """Signed token that lets `user` profile requests until PROFILE_TOKEN_MAX_AGE passes."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def staff_from_token(token: str):
+    from users.authentication import cached_user
+
+    try:
+        user_id = signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return cached_user(user_id)
+
+
+def staff_from_jwt(request):
+    from rest_framework.exceptions import AuthenticationFailed
+    from users.authentication import CachedJWTAuthentication
+
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def requested_mode(request) -> Optional[str]:
+    if request.headers.get("X-Profile"):
+        mode = request.GET.get("profile", "sample")
+    else:
+        mode = request.GET.get("profile")
+    if mode is None:
+        return None
+    return mode if mode in MODES else "sample"
+
+
+def authorise(request) -> Optional[str]:
+    """Id of the staff user asking for a profile, or None. Runs only for flagged requests."""
+    token = request.headers.get("X-Profile")
+    user = staff_from_token(token) if token else staff_from_jwt(request)
+    if user is None or not (user.is_active and user.is_staff):
+        return None
+    return str(user.pk)
+
+
+def within_rate_limit(user_id: str) -> bool:
+    key = f"profiling:{user_id}"
+    cache.add(key, 0, settings.PROFILE_RATE_WINDOW)
+    try:
+        return cache.incr(key) <= settings.PROFILE_RATE_LIMIT
+    except ValueError:  # expired between add and incr
+        return cache.add(key, 1, settings.PROFILE_RATE_WINDOW)
+
+
+class StackSampler:
+    """Wall-clock sampler of all threads' Python stacks, as folded-stack counts."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_path(name: str) -> str:
+    return os.path.join(settings.PROFILE_DIR, name)
+
+
+def stored_profiles() -> list:
+    """Stored profile file names, newest first."""
+    try:
+        names = [name for name in os.listdir(settings.PROFILE_DIR) if name.rsplit(".", 1)[-1] in MODES.values()]
+    except FileNotFoundError:
+        return []
+    return sorted(names, key=lambda name: os.path.getmtime(profile_path(name)), reverse=True)
+
+
+def prune_profiles() -> None:
+    for name in stored_profiles()[settings.PROFILE_KEEP:]:
+        try:
+            os.remove(profile_path(name))
+        except FileNotFoundError:
+            pass
+
+
+class ProfilingMiddleware:
+    """
+    Profile flagged requests from staff (see the module docstring). Sits
+    right after RequestIdMiddleware so profiles are named after the request
+    id and cover the rest of the middleware chain.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        user_id = authorise(request)
+        if user_id is None:
+            return self.get_response(request)
+        if not self._acquire(user_id):
+            return self._refused(self.get_response(request))
+
+        try:
+            profiler = self._start(mode)
+            try:
+                response = self.get_response(request)
+            finally:
+                self._halt(profiler, mode)
+                name = self._store(profiler, mode)
+        finally:
+            _busy.release()
+        return self._finish(response, name, user_id)
+
+    async def __acall__(self, request):
+        mode = requested_mode(request)
+        if mode is None:
+            return await self.get_response(request)
+        user_id = await sync_to_async(authorise)(request)
+        if user_id is None:
+            return await self.get_response(request)
+        if not await sync_to_async(self._acquire)(user_id):
+            return self._refused(await self.get_response(request))
+
+        try:
+            profiler = self._start(mode)
+            try:
+                response = await self.get_response(request)
+            finally:
+                # cProfile hooks the thread that enabled it: disable on the loop thread
+                self._halt(profiler, mode)
+                name = await sync_to_async(self._store)(profiler, mode)
+        finally:
+            _busy.release()
+        return self._finish(response, name, user_id)
+
+    @staticmethod
+    def _acquire(user_id: str) -> bool:
+        if not _busy.acquire(blocking=False):
+            return False
+        if not within_rate_limit(user_id):
+            _busy.release()
+            return False
+        return True
+
+    @staticmethod
+    def _refused(response):
+        response["X-Profile"] = "refused"
+        return response
+
+    @staticmethod
+    def _start(mode: str):
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(settings.PROFILE_SAMPLE_INTERVAL)
+            profiler.start()
+        return profiler
+
+    @staticmethod
+    def _halt(profiler, mode: str) -> None:
+        """Stop `profiler`; must run on the thread that started it."""
+        if mode == "cprofile":
+            profiler.disable()
+        else:
+            profiler.stop()
+
+    @staticmethod
+    def _store(profiler, mode: str) -> str:
+        """Write what `profiler` collected and prune old profiles; returns the file name."""
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        name = f"{current_request_id()}-{int(time.time())}.{MODES[mode]}"
+        if mode == "cprofile":
+            profiler.dump_stats(profile_path(name))
+        else:
+            with open(profile_path(name), "w") as f:
+                f.write(profiler.folded())
+        prune_profiles()
+        return name
+
+    @staticmethod
+    def _finish(response, name: str, user_id: str):
+        logger.info("Request profiled", extra={"profile": name, "user_id": user_id})
+        response["X-Profile"] = name
+        return response
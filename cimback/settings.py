@@ -7,6 +7,7 @@ Generated by 'django-admin startproject' using Django 5.2.7.
 from pathlib import Path
 from datetime import timedelta
 import os
+import sys
 from dotenv import load_dotenv
 
 # ----------------------------
@@ -15,6 +16,7 @@ from dotenv import load_dotenv
 load_dotenv()
 SECRET_KEY = os.getenv("DJANGO_SECRET_KEY", "django-insecure-dev-key")
 DEBUG = os.getenv("DEBUG", "True") == "True"
+TESTING = sys.argv[1:2] == ["test"]
 
 # ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "").split(",")  # comma-separated
 ALLOWED_HOSTS = ["*"]  # dev only
@@ -50,7 +52,12 @@ INSTALLED_APPS = [
 # Middleware
 # ----------------------------
 MIDDLEWARE = [
-    "corsheaders.middleware.CorsMiddleware",  # must be first
+    "cimback.logs.RequestIdMiddleware",  # so every log line of the request carries its id
+    "cimback.profiling.ProfilingMiddleware",  # staff-only, flagged requests
+    "cimback.timing.ServerTimingMiddleware",  # stage timings, Server-Timing header, histograms
+    "cimback.memory.MemoryMiddleware",  # RSS/tracemalloc figures of MEMORY_PROFILE_ENDPOINTS
+    "corsheaders.middleware.CorsMiddleware",
+    "cimback.middleware.CompressionMiddleware",  # before anything that edits the body
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -87,10 +94,21 @@ TEMPLATES = [
 # ----------------------------
 # Database
 # ----------------------------
+# cimback.sqlite wraps the stock SQLite backend with WAL journaling and tuned
+# PRAGMAs (see cimback/sqlite/base.py) so concurrent workers don't hit
+# "database is locked". Connections are kept open across requests.
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "cimback.sqlite",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "600")),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "pragmas": {
+                "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+            },
+            "transaction_mode": "IMMEDIATE",
+        },
     }
 }
 
@@ -131,19 +149,108 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # ----------------------------
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "cimback.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "cimback.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
+# ----------------------------
+# Response compression (cimback.middleware.CompressionMiddleware)
+# ----------------------------
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes
+COMPRESSION_CONTENT_TYPES = ("application/json", "application/javascript", "text/", "image/svg+xml")
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))  # only if `brotli` is installed
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# users.authentication.CachedJWTAuthentication keeps user + profile rows in
+# memory per worker. Saves and revocations clear the entry in the worker
+# that made them; other workers see them once the entry expires.
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "30"))  # seconds
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+# ----------------------------
+# Logging (cimback/logs.py)
+# ----------------------------
+# JSON lines on stdout, written by a background thread so request threads
+# never block on I/O (records are dropped, not waited on, if it falls behind).
+# Expected provider failures are sampled; errors are always kept.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "request_id": {"()": "cimback.logs.RequestIdFilter"},
+        "sampled": {"()": "cimback.logs.SamplingFilter", "rate": LOG_SAMPLE_RATE, "level": "WARNING"},
+    },
+    "formatters": {
+        "json": {"()": "cimback.logs.JSONFormatter"},
+    },
+    "handlers": {
+        "queue": {
+            "()": "cimback.logs.QueueListenerHandler",
+            "queue_size": int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+            "formatter": "json",
+            "filters": ["request_id"],
+        },
+    },
+    "root": {"handlers": ["queue"], "level": LOG_LEVEL},
+    "loggers": {
+        "django": {"handlers": ["queue"], "level": LOG_LEVEL, "propagate": False},
+        # Hedged image providers fail routinely; the race recovers
+        "music.providers": {"level": LOG_LEVEL, "filters": ["sampled"]},
+        # 4xx warnings on every bad request; 5xx are errors and always kept
+        "django.request": {"level": LOG_LEVEL, "filters": ["sampled"]},
+    },
+}
+
+# Per-request stage timings (cimback/timing.py) are always collected for the
+# latency histograms; this only controls sending them to clients. Off, only
+# staff get the Server-Timing header: it exposes internal stage names and timings.
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", str(DEBUG)) == "True"
+
+# On-demand profiling of single requests (cimback/profiling.py): staff send
+# ?profile=sample|cprofile or an X-Profile token from `manage.py profile_token`.
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))  # newest profiles kept on disk
+PROFILE_RATE_LIMIT = int(os.getenv("PROFILE_RATE_LIMIT", "10"))  # profiles per user per window
+PROFILE_RATE_WINDOW = int(os.getenv("PROFILE_RATE_WINDOW", "3600"))  # seconds
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))  # seconds
+PROFILE_TOKEN_MAX_AGE = int(os.getenv("PROFILE_TOKEN_MAX_AGE", "3600"))  # seconds
+
+# Memory instrumentation (cimback/memory.py): RSS and per-stage figures for
+# these URL names, plus top allocators while tracemalloc traces (from boot
+# with MEMORY_TRACEMALLOC, or once staff take a snapshot).
+MEMORY_PROFILE_ENDPOINTS = [
+    name.strip()
+    for name in os.getenv("MEMORY_PROFILE_ENDPOINTS", "upload-song,song-refresh,social-posts-list,social-posts-batch").split(",")
+    if name.strip()
+]
+MEMORY_TRACEMALLOC = os.getenv("MEMORY_TRACEMALLOC", "False") == "True"
+MEMORY_TRACEMALLOC_FRAMES = int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", "1"))
+# Share of requests to those endpoints that also get a snapshot diff and
+# traced peak (staff can flag one with ?memory); snapshots are slow.
+MEMORY_SNAPSHOT_SAMPLE_RATE = float(os.getenv("MEMORY_SNAPSHOT_SAMPLE_RATE", "0"))
+MEMORY_TOP_ALLOCATORS = int(os.getenv("MEMORY_TOP_ALLOCATORS", "10"))
+MEMORY_SNAPSHOTS_KEEP = int(os.getenv("MEMORY_SNAPSHOTS_KEEP", "5"))
+
 # ----------------------------
 # CORS (for React Native frontend)
 # ----------------------------
@@ -151,6 +258,71 @@ CORS_ALLOW_ALL_ORIGINS = True  # dev only
 CORS_ALLOW_CREDENTIALS = True
 AUTH_USER_MODEL = "users.User"
 
+# ----------------------------
+# AI request deadlines (seconds)
+# ----------------------------
+# Each AI-backed endpoint runs under a total time budget. Stages that would
+# start with less than AI_MIN_STAGE_SECONDS left use local fallbacks instead.
+AI_DEADLINES = {
+    "upload": float(os.getenv("AI_DEADLINE_UPLOAD", "60")),
+    "feedback": float(os.getenv("AI_DEADLINE_FEEDBACK", "20")),
+    "social_post": float(os.getenv("AI_DEADLINE_SOCIAL_POST", "30")),
+    "refresh": float(os.getenv("AI_DEADLINE_REFRESH", "60")),
+}
+AI_MIN_STAGE_SECONDS = float(os.getenv("AI_MIN_STAGE_SECONDS", "4"))
+AI_IMAGE_MIN_SECONDS = float(os.getenv("AI_IMAGE_MIN_SECONDS", "8"))
+AI_UPSTREAM_TIMEOUT = float(os.getenv("AI_UPSTREAM_TIMEOUT", "30"))
+
+# Image providers are raced: the next-best provider starts after this many
+# seconds without an answer, with at most AI_IMAGE_MAX_PARALLEL in flight.
+AI_IMAGE_HEDGE_DELAY = float(os.getenv("AI_IMAGE_HEDGE_DELAY", "3"))
+AI_IMAGE_MAX_PARALLEL = int(os.getenv("AI_IMAGE_MAX_PARALLEL", "2"))
+# Requests per worker racing providers at once on the sync path; its thread
+# pool holds AI_IMAGE_MAX_PARALLEL x this many provider calls.
+AI_IMAGE_CONCURRENCY = int(os.getenv("AI_IMAGE_CONCURRENCY", "4"))
+
+# Chat history archival (manage.py archive_chat_history): messages older
+# than CHAT_ARCHIVE_AFTER_DAYS, or beyond the newest CHAT_HOT_MESSAGES of a
+# song, move to compressed AIFeedbackArchive chunks of CHAT_ARCHIVE_CHUNK.
+CHAT_ARCHIVE_AFTER_DAYS = int(os.getenv("CHAT_ARCHIVE_AFTER_DAYS", "90"))
+CHAT_HOT_MESSAGES = int(os.getenv("CHAT_HOT_MESSAGES", "200"))
+CHAT_ARCHIVE_CHUNK = int(os.getenv("CHAT_ARCHIVE_CHUNK", "500"))
+
+# Audio stack warmup (music/warmup.py): when on, each web worker runs the
+# analysis path on a synthetic clip at boot and /api/music/ready/ reports
+# 503 until it is done. Numba's compiled kernels are cached on disk so
+# restarts and sibling workers reuse them; numba reads this at import.
+AUDIO_WARMUP = os.getenv("AUDIO_WARMUP", "False") == "True"
+NUMBA_CACHE_DIR = os.environ.setdefault("NUMBA_CACHE_DIR", str(BASE_DIR / ".numba_cache"))
+
+# CPU thread budget (music/threadbudget.py): usable cores (affinity and
+# cgroup quota) are split between WEB_WORKERS processes (gunicorn's own
+# WEB_CONCURRENCY) and AUDIO_ANALYSIS_JOBS concurrent analyses per worker,
+# and torch/BLAS/numba get that many threads each.
+WEB_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+AUDIO_ANALYSIS_JOBS = int(os.getenv("AUDIO_ANALYSIS_JOBS", "2"))  # an upload transcribes and extracts features at once
+
+# Seconds allowed for django.setup() plus importing the URLconf in a fresh
+# process (manage.py profile_startup, and a test). Heavy ML imports are lazy.
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "3"))
+
+# ----------------------------
+# Cache
+# ----------------------------
+# File-based by default so every worker on the host sees the same entries
+# (and the same invalidations); point CACHE_BACKEND at Redis/Memcached when scaling out.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", str(BASE_DIR / ".cache")),
+    }
+}
+if TESTING:
+    # Tests clear the cache freely: never touch the developer's real one
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+# Rendered responses of the generated-artifact endpoints (invalidated on save)
+ARTIFACT_CACHE_TIMEOUT = int(os.getenv("ARTIFACT_CACHE_TIMEOUT", str(24 * 3600)))
+
 
 # ----------------------------
 # Optional: Custom User model (if you create one)
@@ -0,0 +1,38 @@
+"""
+SQLite backend tuned for several gunicorn workers sharing one database file.
+
+Use it with ENGINE "cimback.sqlite". On every new connection it applies the
+PRAGMAs in OPTIONS["pragmas"] (WAL journaling, synchronous=NORMAL, busy
+timeout, mmap and page cache size), and atomic blocks open with
+BEGIN IMMEDIATE so a writer waits for the lock up front instead of failing
+with "database is locked" when a read transaction tries to upgrade.
+"""
+
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,           # ms to wait for a competing writer
+    "mmap_size": 134217728,         # 128 MiB of memory-mapped reads
+    "cache_size": -32000,           # ~32 MiB page cache (negative = KiB)
+    "temp_store": "MEMORY",
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # Backend-only options; everything else is passed to sqlite3.connect()
+        self.pragmas = {**DEFAULT_PRAGMAS, **kwargs.pop("pragmas", {})}
+        self.transaction_mode = kwargs.pop("transaction_mode", "IMMEDIATE")
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f"BEGIN {self.transaction_mode}" if self.transaction_mode else "BEGIN")
@@ -0,0 +1,211 @@
+"""
+Per-request stage timing.
+
+Code marks the stages it wants measured:
+
+    with stage("whisper"):
+        ...
+
+    @timed("gemini")
+    async def call(...): ...
+
+ServerTimingMiddleware collects the stages of each request (including
+those run in asyncio tasks and sync_to_async/to_thread workers, which
+share the request's context), reports them in a Server-Timing header and
+feeds per-endpoint, per-stage latency histograms. Outside a request the
+timers cost one perf_counter call and record nothing. For requests that
+MemoryMiddleware tracks, stages also record their memory (cimback/memory.py).
+"""
+
+import bisect
+import functools
+import inspect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.functional import empty
+
+from . import memory
+
+# (stage, seconds) recorded by the current request
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("timing_spans", default=None)
+
+# Histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, float("inf"))
+
+
+def record(name: str, seconds: float) -> None:
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as stage `name` of the current request."""
+    started = time.perf_counter()
+    usage = memory.stage_start()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+        if usage is not None:
+            memory.stage_end(name, usage)
+
+
+def timed(name: str):
+    """Decorator form of stage(), for plain and async functions."""
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation."""
+        rank, seen = q * self.count, 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return 0.0
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(BUCKETS_MS, self.counts) if count},
+        }
+
+
+_lock = threading.Lock()
+_histograms: Dict[str, Dict[str, Histogram]] = defaultdict(lambda: defaultdict(Histogram))
+
+
+def observe(endpoint: str, timings: Dict[str, float]) -> None:
+    with _lock:
+        for name, ms in timings.items():
+            _histograms[endpoint][name].observe(ms)
+
+
+def histograms() -> Dict[str, Dict[str, Dict]]:
+    """{endpoint: {stage: summary}} for this process since it started."""
+    with _lock:
+        return {
+            endpoint: {name: histogram.snapshot() for name, histogram in stages.items()}
+            for endpoint, stages in _histograms.items()
+        }
+
+
+def reset_histograms() -> None:
+    with _lock:
+        _histograms.clear()
+
+
+def summarise(spans: List[Tuple[str, float]]) -> Dict[str, Tuple[float, int]]:
+    """{stage: (total ms, count)}. Concurrent stages overlap, so totals can exceed wall time."""
+    totals: Dict[str, Tuple[float, int]] = {}
+    for name, seconds in spans:
+        ms, count = totals.get(name, (0.0, 0))
+        totals[name] = (ms + seconds * 1000, count + 1)
+    return totals
+
+
+def server_timing_header(totals: Dict[str, Tuple[float, int]]) -> str:
+    return ", ".join(
+        f'{name};dur={ms:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+        for name, (ms, count) in totals.items()
+    )
+
+
+def is_staff(request) -> bool:
+    """
+    Whether the request's user, as DRF authentication left it, is staff. A
+    session user nobody looked at is not loaded: that would cost a query,
+    and can't run on the event loop.
+    """
+    user = getattr(request, "user", None)
+    if user is None or getattr(user, "_wrapped", None) is empty:
+        return False
+    return user.is_active and user.is_staff
+
+
+class ServerTimingMiddleware:
+    """
+    Collect the stages of each request, add a Server-Timing header (for
+    everyone with SERVER_TIMING_HEADER, else for staff only) and record
+    them, with the total, under the request's URL pattern.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        spans, token, started = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _spans.reset(token)
+        return self._finish(request, response, spans, started)
+
+    async def __acall__(self, request):
+        spans, token, started = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _spans.reset(token)
+        return self._finish(request, response, spans, started)
+
+    @staticmethod
+    def _start():
+        spans = []
+        return spans, _spans.set(spans), time.perf_counter()
+
+    @staticmethod
+    def _finish(request, response, spans, started):
+        totals = summarise(spans)
+        totals["total"] = ((time.perf_counter() - started) * 1000, 1)
+        if settings.SERVER_TIMING_HEADER or is_staff(request):
+            response["Server-Timing"] = server_timing_header(totals)
+
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            endpoint = f"{request.method} /{match.route}"
+            observe(endpoint, {name: ms for name, (ms, _) in totals.items()})
+        return response
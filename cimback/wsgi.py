@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cimback.settings")
 
 application = get_wsgi_application()
+
+# Size torch/BLAS/numba thread pools for this worker's share of the CPUs,
+# then (opt-in, AUDIO_WARMUP=True) load Whisper and compile the librosa
+# kernels before traffic arrives; /api/music/ready/ answers 503 until done.
+from music import threadbudget  # noqa: E402
+from music.warmup import start_warmup  # noqa: E402
+
+threadbudget.configure()
+start_warmup()
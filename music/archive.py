@@ -0,0 +1,137 @@
+# ============================================================
+# music/archive.py - COLD STORAGE FOR OLD CHAT HISTORY
+# ============================================================
+import json
+import zlib
+from datetime import datetime
+from typing import List, Optional
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import AIFeedback, AIFeedbackArchive
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+
+# ---------------- Encoding ----------------
+def _compress(raw: bytes):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(raw)
+    return "zlib", zlib.compress(raw, 9)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive chunk is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def encode_messages(messages) -> tuple:
+    """(codec, blob) for AIFeedback rows, oldest first."""
+    rows = [[m.id, m.is_user_message, m.message, m.created_at.isoformat()] for m in messages]
+    return _compress(json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode())
+
+
+def decode_chunk(chunk: AIFeedbackArchive) -> List[AIFeedback]:
+    """Unsaved AIFeedback instances rebuilt from one archive chunk, oldest first."""
+    rows = json.loads(_decompress(chunk.codec, bytes(chunk.data)))
+    return [
+        AIFeedback(
+            id=message_id,
+            song_id=chunk.song_id,
+            is_user_message=is_user,
+            message=message,
+            created_at=datetime.fromisoformat(created_at),
+        )
+        for message_id, is_user, message, created_at in rows
+    ]
+
+
+# ---------------- Read path ----------------
+def archived_messages(song_id: int, after: Optional[list] = None, limit: int = 50) -> List[AIFeedback]:
+    """
+    Up to `limit` archived messages of a song, oldest first, strictly after
+    the (created_at, id) keyset position `after` (as parsed by
+    KeysetPagination.decode_cursor: an aware datetime and an int). Chunks
+    that end before the position are skipped by index without being decompressed.
+    """
+    chunks = AIFeedbackArchive.objects.filter(song_id=song_id)
+    position = None
+    if after:
+        position = (after[0], after[1])
+        chunks = chunks.filter(
+            Q(last_created_at__gt=position[0]) |
+            Q(last_created_at=position[0], last_message_id__gt=position[1])
+        )
+
+    messages = []
+    for chunk in chunks.order_by("last_created_at", "last_message_id"):
+        for message in decode_chunk(chunk):
+            if position is None or (message.created_at, message.id) > position:
+                messages.append(message)
+                if len(messages) >= limit:
+                    return messages
+    return messages
+
+
+def recent_messages(song_id: int, limit: int) -> List[AIFeedback]:
+    """The newest `limit` messages of a song, oldest first, topped up from the archive."""
+    messages = list(AIFeedback.objects.filter(song_id=song_id).order_by("-created_at", "-id")[:limit])
+    messages.reverse()
+    if len(messages) < limit:
+        older = []
+        chunks = AIFeedbackArchive.objects.filter(song_id=song_id).order_by("-last_created_at", "-last_message_id")
+        for chunk in chunks:
+            older = decode_chunk(chunk) + older
+            if len(older) + len(messages) >= limit:
+                break
+        messages = older[max(0, len(older) + len(messages) - limit):] + messages
+    return messages
+
+
+# ---------------- Archival ----------------
+def archive_song(song_id: int, cutoff: datetime, keep: int, chunk_size: int) -> int:
+    """
+    Move one chunk of a song's oldest messages into the archive: those
+    created before `cutoff`, plus any beyond the newest `keep`. Returns the
+    number archived (0 when nothing is left to move).
+    """
+    with transaction.atomic():
+        hot = AIFeedback.objects.filter(song_id=song_id).order_by("created_at", "id")
+        overflow = hot.count() - keep
+        expired = hot.filter(created_at__lt=cutoff).count()
+        count = min(max(overflow, expired), chunk_size)
+        if count <= 0:
+            return 0
+
+        messages = list(hot[:count])
+        codec, data = encode_messages(messages)
+        AIFeedbackArchive.objects.create(
+            song_id=song_id,
+            codec=codec,
+            data=data,
+            message_count=len(messages),
+            first_created_at=messages[0].created_at,
+            last_created_at=messages[-1].created_at,
+            last_message_id=messages[-1].id,
+        )
+        AIFeedback.objects.filter(id__in=[m.id for m in messages]).delete()
+    return len(messages)
+
+
+def archive_candidates(cutoff: datetime, keep: int) -> List[int]:
+    """Ids of songs with messages older than `cutoff` or more than `keep` hot messages."""
+    expired = AIFeedback.objects.filter(created_at__lt=cutoff).values_list("song_id", flat=True).distinct()
+    crowded = (
+        AIFeedback.objects.values("song_id")
+        .annotate(messages=Count("id"))
+        .filter(messages__gt=keep)
+        .values_list("song_id", flat=True)
+    )
+    return sorted(set(expired) | set(crowded))
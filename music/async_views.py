@@ -0,0 +1,53 @@
+# ============================================================
+# music/async_views.py - ASYNC DISPATCH FOR DRF VIEWS
+# ============================================================
+import asyncio
+
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncViewMixin:
+    """
+    Async dispatch for a DRF view. DRF's own dispatch is synchronous, so
+    under ASGI a view waiting on Gemini would pin a worker thread; with
+    this mixin `async def` handlers run on the event loop while
+    authentication, permissions, throttling and any remaining sync
+    handlers (e.g. a generic list GET) run through sync_to_async.
+    """
+    # Always async, even when only some handlers are coroutines
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if asyncio.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncAPIView(AsyncViewMixin, APIView):
+    pass
+
+
+async def aload_artist_profile(user):
+    """Load user.artist_profile (or None) so sync prompt builders can read it on the event loop."""
+    return await sync_to_async(getattr)(user, "artist_profile", None)
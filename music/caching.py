@@ -0,0 +1,84 @@
+# ============================================================
+# music/caching.py - CONDITIONAL GET + CACHED ARTIFACT RESPONSES
+# ============================================================
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework.settings import api_settings
+
+from .models import ArtistBranding, ReleasePlan, SocialContent, SongAnalytics
+
+# Generated artifacts served from cache, and the field their endpoint looks them up by
+CACHED_ARTIFACTS = {
+    SocialContent: "song_id",
+    ReleasePlan: "song_id",
+    ArtistBranding: "user_id",
+    SongAnalytics: "song_id",
+}
+
+
+def artifact_cache_key(model, value) -> str:
+    return f"artifact:{model._meta.label_lower}:{value}"
+
+
+def invalidate_artifact(instance) -> None:
+    """
+    Drop the cached response for `instance`. Done again on commit, so a
+    request that re-cached the old row mid-transaction doesn't keep it.
+    """
+    model = type(instance)
+    key = artifact_cache_key(model, getattr(instance, CACHED_ARTIFACTS[model]))
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def is_not_modified(request, etag: str, last_modified: int) -> bool:
+    """
+    RFC 9110: If-None-Match wins (weak comparison, since compression turns
+    our ETag into W/"..."); If-Modified-Since only applies without it.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        etags = [tag.removeprefix("W/") for tag in parse_etags(if_none_match)]
+        return "*" in etags or etag in etags
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return since is not None and last_modified <= since
+
+
+class CachedArtifactMixin:
+    """
+    Serve a retrieve endpoint from a rendered-response cache keyed by its
+    URL kwarg, with a strong ETag and Last-Modified. Matching conditional
+    requests get a 304 without touching the serializer. Entries are
+    dropped by the post_save/post_delete signals of the artifact model.
+    """
+    artifact_model = None
+    lookup_url_kwarg = "song_id"
+
+    def retrieve(self, request, *args, **kwargs):
+        key = artifact_cache_key(self.artifact_model, self.kwargs[self.lookup_url_kwarg])
+        entry = cache.get(key)
+        if entry is None:
+            instance = self.get_object()
+            renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+            body = renderer.render(self.get_serializer(instance).data)
+            entry = {
+                "body": body,
+                "etag": f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+                "last_modified": int(instance.updated_at.timestamp()),
+            }
+            cache.set(key, entry, settings.ARTIFACT_CACHE_TIMEOUT)
+
+        if is_not_modified(request, entry["etag"], entry["last_modified"]):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(entry["body"], content_type="application/json")
+        response["ETag"] = entry["etag"]
+        response["Last-Modified"] = http_date(entry["last_modified"])
+        # Clients may keep a copy but must revalidate; responses are per user
+        response["Cache-Control"] = "private, no-cache"
+        return response
@@ -0,0 +1,129 @@
+# ============================================================
+# music/dashboard.py - PRECOMPUTED SONG DASHBOARD DOCUMENTS
+# ============================================================
+import logging
+import threading
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from django.db import transaction
+
+from .archive import recent_messages
+from .models import (
+    Song, AIFeedback, SocialPost, StreamingLink, SocialContent, ReleasePlan, SongAnalytics, SongDashboard
+)
+from .pagination import ConversationPagination
+from .serializers import (
+    SongSummarySerializer, AIFeedbackSerializer, SocialPostSerializer, StreamingLinkSerializer,
+    SocialContentSerializer, ReleasePlanSerializer, SongAnalyticsSerializer
+)
+
+logger = logging.getLogger(__name__)
+
+# Most recent items embedded in the document; older ones are paged from
+# song-feedback/ and social-posts/ as before
+DASHBOARD_MESSAGES = 20
+DASHBOARD_POSTS = 10
+
+
+def _song_section(song):
+    data = SongSummarySerializer(song).data
+    data["degraded_stages"] = song.degraded_stages
+    return data
+
+
+def _conversation_section(song):
+    messages = recent_messages(song.id, DASHBOARD_MESSAGES)
+    return {
+        "messages": AIFeedbackSerializer(messages, many=True).data,
+        # Poll song-feedback/?since=<cursor> for anything newer
+        "cursor": ConversationPagination().encode_cursor(messages[-1]) if messages else None,
+    }
+
+
+def _one(model, serializer_class):
+    def build(song):
+        instance = model.objects.filter(song=song).first()
+        return serializer_class(instance).data if instance else None
+    return build
+
+
+def _social_posts_section(song):
+    posts = (
+        SocialPost.objects.filter(song=song)
+        .select_related("generated_image")
+        .order_by("-created_at", "-id")[:DASHBOARD_POSTS]
+    )
+    return SocialPostSerializer(posts, many=True).data
+
+
+def _streaming_links_section(song):
+    links = StreamingLink.objects.filter(song=song, is_active=True).order_by("platform")
+    return StreamingLinkSerializer(links, many=True).data
+
+
+SECTIONS = {
+    "song": _song_section,
+    "conversation": _conversation_section,
+    "social_content": _one(SocialContent, SocialContentSerializer),
+    "release_plan": _one(ReleasePlan, ReleasePlanSerializer),
+    "analytics": _one(SongAnalytics, SongAnalyticsSerializer),
+    "social_posts": _social_posts_section,
+    "streaming_links": _streaming_links_section,
+}
+
+# Which section each related model feeds
+MODEL_SECTIONS = {
+    AIFeedback: "conversation",
+    SocialContent: "social_content",
+    ReleasePlan: "release_plan",
+    SongAnalytics: "analytics",
+    SocialPost: "social_posts",
+    StreamingLink: "streaming_links",
+}
+
+
+def refresh_dashboard(song_id: int, sections: Optional[Iterable[str]] = None) -> Optional[SongDashboard]:
+    """
+    Recompute `sections` of a song's dashboard (all of them when None, or
+    when no document exists yet) and store it. Returns None if the song is gone.
+    """
+    song = Song.objects.filter(id=song_id).first()
+    if song is None:
+        return None
+    dashboard = SongDashboard.objects.filter(song_id=song_id).first()
+    if dashboard is None or sections is None:
+        dashboard = dashboard or SongDashboard(song=song, user_id=song.user_id)
+        sections = SECTIONS
+    document = dict(dashboard.document)
+    for name in sections:
+        document[name] = SECTIONS[name](song)
+    dashboard.document = document
+    dashboard.user_id = song.user_id
+    dashboard.save()
+    return dashboard
+
+
+# ---------------- Incremental updates ----------------
+# Sections touched by the current thread, refreshed once after commit so a
+# transaction writing several rows of one song rebuilds each section once.
+_pending = threading.local()
+
+
+def _flush():
+    pending = getattr(_pending, "sections", None)
+    _pending.sections = None
+    for song_id, sections in (pending or {}).items():
+        try:
+            refresh_dashboard(song_id, sections)
+        except Exception:
+            logger.exception("Dashboard refresh failed", extra={"song_id": song_id})
+
+
+def schedule_refresh(song_id: int, section: str) -> None:
+    if getattr(_pending, "sections", None) is None:
+        _pending.sections = defaultdict(set)
+    _pending.sections[song_id].add(section)
+    # Outside a transaction this runs right away; inside, after commit. A
+    # rolled-back write just leaves a section that the next flush recomputes.
+    transaction.on_commit(_flush)
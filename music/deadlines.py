@@ -0,0 +1,124 @@
+# ============================================================
+# music/deadlines.py - PER-REQUEST TIME BUDGETS
+# ============================================================
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from django.conf import settings
+
+_current_deadline: ContextVar[Optional["Deadline"]] = ContextVar("melofy_deadline", default=None)
+
+
+class Deadline:
+    """Absolute point in time by which the current request must answer."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def mark_degraded(self, stage: str) -> None:
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]):
+    """Run the enclosed block under a deadline (no budget when seconds is None)."""
+    deadline = Deadline(seconds) if seconds else None
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current request, or None when no deadline is set."""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline else None
+
+
+def has_budget(stage: str, min_seconds: Optional[float] = None) -> bool:
+    """
+    Return True when `stage` can still afford an upstream call.
+    Otherwise the stage is recorded as degraded and the caller should
+    switch to its local fallback.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return True
+    if min_seconds is None:
+        min_seconds = settings.AI_MIN_STAGE_SECONDS
+    if deadline.remaining() >= min_seconds:
+        return True
+    deadline.mark_degraded(stage)
+    return False
+
+
+def mark_degraded(stage: str) -> None:
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.mark_degraded(stage)
+
+
+@contextmanager
+def collect_degraded():
+    """
+    Yield the list of stages degraded inside the block, so one item of a
+    multi-item request can tell its own fallbacks apart. They still count
+    towards the request's degraded_stages().
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        yield []
+        return
+    outer, deadline.degraded = deadline.degraded, []
+    try:
+        yield deadline.degraded
+    finally:
+        inner, deadline.degraded = deadline.degraded, outer
+        for stage in inner:
+            deadline.mark_degraded(stage)
+
+
+def upstream_timeout(default: float) -> float:
+    """Timeout for an upstream call: `default`, capped by the remaining budget."""
+    remaining = remaining_budget()
+    if remaining is None:
+        return default
+    return max(0.1, min(default, remaining))
+
+
+def degraded_stages() -> List[str]:
+    deadline = _current_deadline.get()
+    return list(deadline.degraded) if deadline else []
+
+
+class DeadlineMixin:
+    """
+    View mixin that runs each request under the budget named by
+    `deadline_key` in settings.AI_DEADLINES.
+    """
+    deadline_key: Optional[str] = None
+
+    def dispatch(self, request, *args, **kwargs):
+        seconds = settings.AI_DEADLINES.get(self.deadline_key) if self.deadline_key else None
+        if getattr(self, "view_is_async", False):
+            return self._adispatch(seconds, request, *args, **kwargs)
+        with request_deadline(seconds):
+            return super().dispatch(request, *args, **kwargs)
+
+    async def _adispatch(self, seconds, request, *args, **kwargs):
+        # Tasks and sync_to_async calls copy the context, so they all see this deadline
+        with request_deadline(seconds):
+            return await super().dispatch(request, *args, **kwargs)
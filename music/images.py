@@ -0,0 +1,173 @@
+# ============================================================
+# music/images.py - LOCAL STORAGE FOR GENERATED SOCIAL IMAGES
+# ============================================================
+import base64
+import hashlib
+import io
+import logging
+from typing import Optional, Tuple
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError
+from django.urls import reverse
+
+from .deadlines import upstream_timeout
+from .models import GeneratedImage
+
+logger = logging.getLogger(__name__)
+
+# Longest edge of each stored thumbnail, in pixels
+THUMBNAIL_SIZES = (160, 320, 640)
+
+# Downloads larger than this are rejected (bytes)
+MAX_IMAGE_BYTES = 15 * 1024 * 1024
+
+# Hosts that only serve throwaway placeholders; those are rendered locally instead
+PLACEHOLDER_HOSTS = ("via.placeholder.com",)
+
+_EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp", "GIF": "gif"}
+
+
+def image_url(image: GeneratedImage, size: Optional[int] = None) -> str:
+    """URL of our own cacheable endpoint for `image` (optionally a thumbnail)."""
+    url = reverse("generated-image", args=[image.sha256])
+    return f"{url}?size={size}" if size else url
+
+
+def thumbnail_urls(image: GeneratedImage) -> dict:
+    return {size: image_url(image, int(size)) for size in image.thumbnails}
+
+
+def store_image_bytes(data: bytes, source_url: Optional[str] = None) -> GeneratedImage:
+    """
+    Store image bytes once per SHA-256 and create its thumbnails.
+    Identical images (same bytes) always map to the same GeneratedImage.
+    """
+    from PIL import Image
+    from .rendering import encode_image
+
+    digest = hashlib.sha256(data).hexdigest()
+    existing = GeneratedImage.objects.filter(sha256=digest).first()
+    if existing:
+        return existing
+
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    extension = _EXTENSIONS.get(img.format, "png")
+    prefix = f"generated/{digest[:2]}/{digest}"
+
+    name = f"{prefix}.{extension}"
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+
+    thumbnails = {}
+    rgb = img.convert("RGB")
+    for size in THUMBNAIL_SIZES:
+        thumb_name = f"{prefix}_{size}.webp"
+        if not default_storage.exists(thumb_name):
+            thumb = rgb.copy()
+            thumb.thumbnail((size, size))
+            thumb_name = default_storage.save(thumb_name, ContentFile(encode_image(thumb, "webp")))
+        thumbnails[str(size)] = thumb_name
+
+    try:
+        return GeneratedImage.objects.create(
+            sha256=digest,
+            image=name,
+            width=img.width,
+            height=img.height,
+            thumbnails=thumbnails,
+            source_url=source_url if source_url and source_url.startswith("http") else None,
+        )
+    except IntegrityError:
+        # Another worker stored the same image first
+        return GeneratedImage.objects.get(sha256=digest)
+
+
+def _load_image_bytes(url: str) -> Optional[bytes]:
+    """Bytes behind a provider URL, a data: URL or one of our media paths."""
+    if url.startswith("data:image/"):
+        payload = url.split(",", 1)[1]
+        # Every 4 base64 characters decode to 3 bytes: check the size before decoding
+        if len(payload) > (MAX_IMAGE_BYTES + 2) // 3 * 4:
+            return None
+        return base64.b64decode(payload)
+
+    if url.startswith(settings.MEDIA_URL):
+        name = url[len(settings.MEDIA_URL):]
+        if default_storage.exists(name):
+            with default_storage.open(name, "rb") as f:
+                return f.read()
+        return None
+
+    if url.startswith("http") and not any(host in url for host in PLACEHOLDER_HOSTS):
+        response = requests.get(url, timeout=upstream_timeout(settings.AI_UPSTREAM_TIMEOUT), stream=True)
+        response.raise_for_status()
+        data = response.raw.read(MAX_IMAGE_BYTES + 1, decode_content=True)
+        if len(data) > MAX_IMAGE_BYTES:
+            return None
+        return data
+
+    return None
+
+
+def is_provider_image(url: Optional[str]) -> bool:
+    """True when `url` points at real provider output rather than a placeholder."""
+    if not url:
+        return False
+    if url.startswith("data:image/"):
+        return True
+    return url.startswith("http") and not any(host in url for host in PLACEHOLDER_HOSTS)
+
+
+def persist_post_image(
+    url: Optional[str],
+    song_title: str,
+    artist_name: str,
+    genre: str,
+    size: Tuple[int, int] = (1080, 1080),
+) -> Optional[GeneratedImage]:
+    """
+    Copy a generated image into our storage. When the provider URL cannot
+    be fetched (or is only a placeholder), a local promo image is rendered
+    at `size` instead.
+    """
+    data = None
+    if url:
+        try:
+            data = _load_image_bytes(url)
+        except Exception as e:
+            logger.warning("Image download failed", extra={"url": url[:200], "error": repr(e)})
+
+    if not data:
+        try:
+            from .rendering import encode_image, render_promotional_image
+            img = render_promotional_image(song_title, artist_name, genre, size)
+            data = encode_image(img, "png")
+            url = None
+        except Exception:
+            logger.exception("Local image generation failed")
+            return None
+
+    try:
+        return store_image_bytes(data, source_url=url)
+    except Exception:
+        logger.exception("Image storage failed")
+        return None
+
+
+def store_resized(base: GeneratedImage, size: Tuple[int, int]) -> GeneratedImage:
+    """Centre-crop and scale `base` to `size`, stored as its own GeneratedImage."""
+    from PIL import Image, ImageOps
+    from .rendering import encode_image
+
+    if (base.width, base.height) == tuple(size):
+        return base
+    with default_storage.open(base.image.name, "rb") as f:
+        img = Image.open(f)
+        img.load()
+    fitted = ImageOps.fit(img.convert("RGB"), size, method=Image.LANCZOS)
+    return store_image_bytes(encode_image(fitted, "jpeg"), source_url=base.source_url)
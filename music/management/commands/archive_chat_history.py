@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from music.archive import archive_candidates, archive_song
+
+
+class Command(BaseCommand):
+    help = (
+        "Move old chat messages out of AIFeedback into compressed per-song archive chunks. "
+        "Safe to run repeatedly (e.g. nightly); each chunk is its own short transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.CHAT_ARCHIVE_AFTER_DAYS,
+                            help="Archive messages older than this many days")
+        parser.add_argument("--keep", type=int, default=settings.CHAT_HOT_MESSAGES,
+                            help="Always archive beyond this many newest messages per song")
+        parser.add_argument("--chunk-size", type=int, default=settings.CHAT_ARCHIVE_CHUNK,
+                            help="Messages per archive chunk (and per transaction)")
+        parser.add_argument("--max-songs", type=int, default=None,
+                            help="Stop after this many songs (for throttled runs)")
+        parser.add_argument("--dry-run", action="store_true", help="Only list the songs that would be archived")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        keep = max(options["keep"], 0)
+        song_ids = archive_candidates(cutoff, keep)[:options["max_songs"]]
+
+        if options["dry_run"]:
+            self.stdout.write(f"{len(song_ids)} songs have messages to archive.")
+            return
+
+        total = 0
+        for song_id in song_ids:
+            while True:
+                archived = archive_song(song_id, cutoff, keep, options["chunk_size"])
+                total += archived
+                if archived < options["chunk_size"]:
+                    break
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} messages from {len(song_ids)} songs."))
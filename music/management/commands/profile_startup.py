@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from music.startup import profile_startup
+
+
+class Command(BaseCommand):
+    help = "Report django.setup() + URLconf import time, the slowest modules and any heavy module loaded eagerly."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=25, help="Number of modules to list")
+        parser.add_argument("--import", dest="imports", action="append", default=[],
+                            help="Module to import after setup (repeatable; default: the URLconf)")
+        parser.add_argument("--budget", type=float, default=settings.STARTUP_BUDGET,
+                            help="Fail when startup takes longer than this many seconds")
+
+    def handle(self, *args, **options):
+        report = profile_startup(options["imports"])
+
+        slowest = sorted(report["modules"], key=lambda row: row.cumulative_us, reverse=True)[:options["top"]]
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for row in slowest:
+            self.stdout.write(f"{row.cumulative_us / 1000:14.1f} {row.self_us / 1000:9.1f}  {row.module}")
+
+        for name in report["heavy"]:
+            self.stdout.write(self.style.WARNING(f"{name} is imported at startup; import it on first use instead."))
+
+        summary = f"Startup took {report['seconds']:.2f}s (budget {options['budget']:.2f}s)."
+        if report["seconds"] > options["budget"]:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cimback.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = "Print an X-Profile header value that lets a staff user profile requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options["username"]).first()
+        if user is None or not (user.is_active and user.is_staff):
+            raise CommandError(f"{options['username']} is not an active staff user.")
+        self.stdout.write(make_token(user))
+        self.stderr.write(f"Valid for {settings.PROFILE_TOKEN_MAX_AGE}s. Send it as the X-Profile header.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from music import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the FTS5 artist and song search indexes from scratch."
+
+    def handle(self, *args, **options):
+        if not search.search_enabled():
+            self.stdout.write(self.style.WARNING("Search index requires SQLite; nothing to do."))
+            return
+        artists, songs = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {artists} artists and {songs} songs."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music", "0005_socialpost_streaminglink"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="song",
+            name="degraded_stages",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0 on 2026-10-19 04:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music", "0006_song_degraded_stages"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeneratedImage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                ("image", models.ImageField(upload_to="generated/")),
+                ("width", models.PositiveIntegerField(default=0)),
+                ("height", models.PositiveIntegerField(default=0)),
+                ("thumbnails", models.JSONField(blank=True, default=dict)),
+                ("source_url", models.URLField(blank=True, max_length=1000, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="socialpost",
+            name="generated_image",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="social_posts",
+                to="music.generatedimage",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-19 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music", "0007_generatedimage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="aifeedback",
+            index=models.Index(
+                fields=["song", "created_at"], name="aifeedback_song_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="socialpost",
+            index=models.Index(
+                fields=["song", "-created_at"], name="socialpost_song_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="streaminglink",
+            index=models.Index(
+                fields=["song", "is_active", "platform"],
+                name="streamlink_song_active_idx",
+            ),
+        ),
+    ]
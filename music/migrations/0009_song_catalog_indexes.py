@@ -0,0 +1,29 @@
+# Generated by Django 5.0 on 2026-10-19 04:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music", "0008_hot_query_indexes"),
+        ("users", "0003_hot_query_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="song",
+            index=models.Index(
+                fields=["user", "-uploaded_at", "-id"], name="song_user_uploaded_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="song",
+            index=models.Index(
+                fields=["artist", "-uploaded_at", "-id"],
+                name="song_artist_uploaded_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-19 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music", "0009_song_catalog_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="socialpost",
+            name="socialpost_song_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="socialpost",
+            index=models.Index(
+                fields=["song", "-created_at", "-id"],
+                name="socialpost_song_created_idx",
+            ),
+        ),
+    ]
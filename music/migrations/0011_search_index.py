@@ -0,0 +1,50 @@
+# FTS5 search index for artist discovery and song lyrics.
+
+from django.db import migrations
+
+OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+
+def create_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS music_artist_search "
+        f"USING fts5(stage_name, username, genre, {OPTIONS})"
+    )
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS music_song_search "
+        f"USING fts5(title, transcription, lyrics, user_id UNINDEXED, {OPTIONS})"
+    )
+    # The tables may already exist from a manual rebuild_search_index run
+    schema_editor.execute("DELETE FROM music_artist_search")
+    schema_editor.execute("DELETE FROM music_song_search")
+    schema_editor.execute(
+        "INSERT INTO music_artist_search (rowid, stage_name, username, genre) "
+        "SELECT p.id, p.stage_name, u.username, p.primary_genre "
+        "FROM users_artistprofile p JOIN users_user u ON u.id = p.user_id"
+    )
+    schema_editor.execute(
+        "INSERT INTO music_song_search (rowid, title, transcription, lyrics, user_id) "
+        "SELECT id, title, COALESCE(transcription, ''), COALESCE(lyrics_text, ''), user_id "
+        "FROM music_song"
+    )
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS music_artist_search")
+    schema_editor.execute("DROP TABLE IF EXISTS music_song_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music", "0010_keyset_pagination_indexes"),
+        ("users", "0004_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-19 04:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music", "0011_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="artistbranding",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="releaseplan",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="socialcontent",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="songanalytics",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0 on 2026-10-19 04:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music", "0013_songdashboard"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AIFeedbackArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("codec", models.CharField(max_length=10)),
+                ("data", models.BinaryField()),
+                ("message_count", models.PositiveIntegerField()),
+                ("first_created_at", models.DateTimeField()),
+                ("last_created_at", models.DateTimeField()),
+                ("last_message_id", models.BigIntegerField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "song",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feedback_archives",
+                        to="music.song",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["song", "last_created_at", "last_message_id"],
+                        name="feedback_archive_song_idx",
+                    )
+                ],
+            },
+        ),
+    ]
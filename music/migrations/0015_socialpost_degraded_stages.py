@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 05:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("music", "0014_aifeedbackarchive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="socialpost",
+            name="degraded_stages",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
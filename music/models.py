@@ -28,6 +28,16 @@ class Song(models.Model):
     transcription = models.TextField(blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # AI stages that fell back to local output because the request ran out of time
+    degraded_stages = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            # Song catalog pages, newest first (own songs / an artist's songs)
+            models.Index(fields=['user', '-uploaded_at', '-id'], name='song_user_uploaded_idx'),
+            models.Index(fields=['artist', '-uploaded_at', '-id'], name='song_artist_uploaded_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} - {getattr(self.user, 'username', 'unknown')}"
     
@@ -45,12 +55,58 @@ class AIFeedback(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Conversation for a song, oldest first
+            models.Index(fields=['song', 'created_at'], name='aifeedback_song_created_idx'),
+        ]
 
     def __str__(self):
         msg_type = "User" if self.is_user_message else "AI"
         return f"{msg_type} message for {self.song.title}"
 
 
+class AIFeedbackArchive(models.Model):
+    """
+    A run of a song's oldest chat messages moved out of AIFeedback by
+    `manage.py archive_chat_history`, stored as one compressed JSON blob.
+    Read back transparently by music/archive.py.
+    """
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name="feedback_archives")
+    codec = models.CharField(max_length=10)  # zlib or zstd
+    data = models.BinaryField()
+    message_count = models.PositiveIntegerField()
+    first_created_at = models.DateTimeField()
+    last_created_at = models.DateTimeField()
+    last_message_id = models.BigIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Chunks of a song in conversation order, seekable by keyset position
+            models.Index(fields=['song', 'last_created_at', 'last_message_id'], name='feedback_archive_song_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.message_count} archived messages for song {self.song_id}"
+
+
+# ============================================================
+# Generated images stored once per content hash
+# ============================================================
+class GeneratedImage(models.Model):
+    """AI-generated or locally rendered image, deduplicated by SHA-256"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    image = models.ImageField(upload_to="generated/")
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    thumbnails = models.JSONField(default=dict, blank=True)  # {"320": "generated/ab/<sha>_320.webp"}
+    source_url = models.URLField(max_length=1000, blank=True, null=True)  # Provider URL it was copied from
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Image {self.sha256[:12]} ({self.width}x{self.height})"
+
+
 # ============================================================
 # NEW: Social Media Posts with AI-Generated Images
 # ============================================================
@@ -61,12 +117,20 @@ class SocialPost(models.Model):
     hashtags = models.TextField(blank=True)
     image_url = models.URLField(max_length=500, blank=True, null=True)  # AI-generated image
     image_file = models.ImageField(upload_to="social_posts/", blank=True, null=True)  # Local storage
+    generated_image = models.ForeignKey(
+        GeneratedImage, on_delete=models.SET_NULL, related_name="social_posts", blank=True, null=True
+    )
     platform = models.CharField(max_length=50, default="instagram")  # instagram, tiktok, facebook, etc.
     prompt_used = models.TextField(blank=True)  # The prompt that generated this post
+    degraded_stages = models.JSONField(default=list, blank=True)  # Parts left on a local fallback
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Posts for a song, newest first
+            models.Index(fields=['song', '-created_at', '-id'], name='socialpost_song_created_idx'),
+        ]
 
     def __str__(self):
         return f"Post for {self.song.title} - {self.platform}"
@@ -86,6 +150,10 @@ class StreamingLink(models.Model):
     class Meta:
         ordering = ['platform']
         unique_together = ['song', 'platform']
+        indexes = [
+            # Active links for a song, in platform order
+            models.Index(fields=['song', 'is_active', 'platform'], name='streamlink_song_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.song.title} - {self.platform}"
@@ -103,6 +171,7 @@ class SocialContent(models.Model):
     streaming_links = models.TextField(blank=True, null=True)
     video_script = models.TextField(blank=True, null=True)
     streaming_text = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"SocialContent for {self.song.title}"
@@ -112,6 +181,7 @@ class ReleasePlan(models.Model):
     song = models.OneToOneField(Song, on_delete=models.CASCADE, related_name="release_plan")
     schedule_days = models.JSONField(default=list)
     reminder_texts = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"ReleasePlan for {self.song.title}"
@@ -123,6 +193,7 @@ class ArtistBranding(models.Model):
     taglines = models.TextField(blank=True, null=True)
     visual_style = models.TextField(blank=True, null=True)
     content_tone = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Branding for {getattr(self.user, 'username', 'user')}"
@@ -133,6 +204,22 @@ class SongAnalytics(models.Model):
     virality_score = models.FloatField(default=0.0)
     predicted_engagement = models.JSONField(default=dict)
     ai_trends_insight = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Analytics for {self.song.title}"
+
+
+class SongDashboard(models.Model):
+    """
+    Read model for GET songs/<id>/dashboard/: the song, its recent chat,
+    generated artifacts, posts and links as one JSON document.
+    Maintained section by section by music/dashboard.py.
+    """
+    song = models.OneToOneField(Song, on_delete=models.CASCADE, primary_key=True, related_name="dashboard")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    document = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dashboard for song {self.song_id}"
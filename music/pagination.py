@@ -0,0 +1,167 @@
+# ============================================================
+# music/pagination.py - PAGE NUMBER AND KEYSET PAGINATION
+# ============================================================
+import base64
+import json
+from datetime import datetime, timezone
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class SongPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def cursor_value(field: str, value):
+    """
+    A cursor value parsed for ordering field `field`: ids are ints and
+    *_at timestamps aware datetimes (naive ones are taken as UTC). Raises
+    ValueError or TypeError for anything else.
+    """
+    if field == 'id' or field.endswith('_id'):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise TypeError(f"{field} must be an integer")
+        return value
+    if field.endswith('_at'):
+        parsed = datetime.fromisoformat(value)
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    raise ValueError(f"{field} can't be used in a cursor")
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over a unique ordering such as (created_at, id).
+
+    Each page ends with an opaque cursor holding the ordering values of its last
+    row; the next page is the rows strictly after it, so every page costs one
+    indexed range read no matter how deep the client has scrolled.
+
+    Query params:
+        - cursor: continue after this position
+        - since: same as cursor, for polling clients that only want new rows
+        - limit: page size (capped at max_page_size)
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    since_query_param = 'since'
+    limit_query_param = 'limit'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(limit, self.max_page_size))
+
+    def encode_cursor(self, obj) -> str:
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            raise NotFound("Invalid cursor")
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound("Invalid cursor")
+        try:
+            return [cursor_value(field.lstrip('-'), value) for field, value in zip(self.ordering, values)]
+        except (ValueError, TypeError):
+            raise NotFound("Invalid cursor")
+
+    def after(self, values) -> Q:
+        """Rows strictly after `values` in self.ordering."""
+        first = self.ordering[0].lstrip('-')
+        # Redundant bound on the leading column lets SQLite use a range scan
+        bound = Q(**{f"{first}__{'lte' if self.ordering[0].startswith('-') else 'gte'}": values[0]})
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            step = Q(**{f"{name}__{'lt' if field.startswith('-') else 'gt'}": values[i]})
+            for prev, value in zip(self.ordering[:i], values[:i]):
+                step &= Q(**{prev.lstrip('-'): value})
+            condition |= step
+        return bound & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = self.get_limit(request)
+        cursor = request.query_params.get(self.since_query_param) or request.query_params.get(self.cursor_query_param)
+
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor)))
+
+        return self.finish_page(list(queryset[:limit + 1]), limit, cursor)
+
+    def finish_page(self, rows, limit, cursor):
+        """Trim a fetched limit + 1 rows to the page and set has_more / next_cursor."""
+        self.has_more = len(rows) > limit
+        rows = rows[:limit]
+        # With nothing new, a polling client keeps its current position
+        self.next_cursor = self.encode_cursor(rows[-1]) if rows else cursor
+        return rows
+
+    def get_next_link(self):
+        if not self.has_more:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more,
+            'results': data,
+        })
+
+
+class ConversationPagination(KeysetPagination):
+    """Chat messages oldest first; poll with ?since=<next_cursor> for new ones."""
+    ordering = ('created_at', 'id')
+    page_size = 50
+    max_page_size = 200
+
+    def paginate_song(self, song, request):
+        """
+        Page through a song's whole conversation. Archived messages are all
+        older than the hot AIFeedback rows, so a page starts in the archive
+        and continues into the hot table; cursors work across both.
+        """
+        from .archive import archived_messages
+
+        self.request = request
+        limit = self.get_limit(request)
+        cursor = request.query_params.get(self.since_query_param) or request.query_params.get(self.cursor_query_param)
+        values = self.decode_cursor(cursor) if cursor else None
+
+        rows = archived_messages(song.id, after=values, limit=limit + 1)
+        if len(rows) <= limit:
+            queryset = song.feedbacks.order_by(*self.ordering)
+            if values:
+                queryset = queryset.filter(self.after(values))
+            rows += list(queryset[:limit + 1 - len(rows)])
+        return self.finish_page(rows, limit, cursor)
+
+
+class SocialPostPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ArtistPagination(KeysetPagination):
+    """Artist profiles have no timestamp; newest profiles (highest id) first."""
+    ordering = ('-id',)
+    page_size = 50
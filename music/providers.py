@@ -0,0 +1,379 @@
+# ============================================================
+# music/providers.py - HEDGED IMAGE PROVIDER DISPATCH
+# ============================================================
+import asyncio
+import base64
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List
+
+import httpx
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# How often an async request waiting for a free pool thread checks again (seconds)
+SLOT_POLL_INTERVAL = 0.02
+
+class ProviderHealth:
+    """Rolling success rate and latency over the last `window` calls."""
+
+    def __init__(self, window: int = 20, prior_latency: float = 10.0):
+        self.samples = deque(maxlen=window)  # (latency_seconds, ok)
+        self.prior_latency = prior_latency
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self.lock:
+            self.samples.append((latency, ok))
+
+    def success_rate(self) -> float:
+        with self.lock:
+            if not self.samples:
+                return 1.0
+            return sum(1 for _, ok in self.samples if ok) / len(self.samples)
+
+    def latency(self) -> float:
+        """Mean latency of successful calls (prior_latency until there are any)."""
+        with self.lock:
+            good = [latency for latency, ok in self.samples if ok]
+        return sum(good) / len(good) if good else self.prior_latency
+
+    def score(self) -> float:
+        """Higher is better: successful images per second of waiting."""
+        return self.success_rate() / max(self.latency(), 0.1)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "calls": len(self.samples),
+            "success_rate": round(self.success_rate(), 3),
+            "latency": round(self.latency(), 3),
+            "score": round(self.score(), 4),
+        }
+
+
+class ImageProvider:
+    """One text-to-image backend with a lazily initialised, reused client."""
+    name = ""
+    # No async API: ImageDispatcher runs its calls in the thread pool on both paths
+    threaded = True
+
+    def __init__(self):
+        self.health = ProviderHealth()
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def is_configured(self) -> bool:
+        return True
+
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.create_client()
+        return self._client
+
+    def create_client(self):
+        raise NotImplementedError
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        """Return an image URL (http or data:) or "" on failure."""
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str, timeout: float) -> str:
+        """Async generate; SDKs without an async API run in a worker thread."""
+        return await asyncio.to_thread(self.generate, prompt, timeout)
+
+
+class ImagenProvider(ImageProvider):
+    """Google Imagen 3 (Vertex AI)"""
+    name = "imagen"
+
+    def is_configured(self) -> bool:
+        return bool(os.getenv("GOOGLE_CLOUD_PROJECT"))
+
+    def create_client(self):
+        from google.cloud import aiplatform
+        from vertexai.preview.vision_models import ImageGenerationModel
+
+        aiplatform.init(
+            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
+            location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
+        )
+        return ImageGenerationModel.from_pretrained("imagen-3.0-generate-001")
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        images = self.client().generate_images(
+            prompt=prompt,
+            number_of_images=1,
+            aspect_ratio="1:1",  # Square for Instagram
+        )
+        if not images:
+            return ""
+        image = images[0]
+        if getattr(image, "url", None):
+            return image.url
+        data = getattr(image, "_image_bytes", None)
+        return f"data:image/png;base64,{base64.b64encode(data).decode()}" if data else ""
+
+
+class DalleProvider(ImageProvider):
+    """OpenAI DALL-E"""
+    name = "dalle"
+
+    def is_configured(self) -> bool:
+        return bool(os.getenv("OPENAI_API_KEY"))
+
+    def create_client(self):
+        import openai
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+        return openai
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self.client().Image.create(
+            prompt=prompt,
+            n=1,
+            size="1024x1024",
+            request_timeout=timeout,
+        )
+        return response['data'][0]['url']
+
+
+async def _close_on_shutdown(client):
+    """
+    Suspended async generator whose cleanup closes `client`: the running
+    loop tracks it and finalises it in shutdown_asyncgens(), which
+    asyncio.run() and uvicorn call as the loop stops.
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+class StabilityProvider(ImageProvider):
+    """Stability AI (Stable Diffusion XL), over a keep-alive session"""
+    name = "stability"
+    threaded = False
+    url = "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
+
+    def __init__(self):
+        super().__init__()
+        # loop -> (client, closer); entries go away with their loop
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def is_configured(self) -> bool:
+        return bool(os.getenv("STABILITY_API_KEY"))
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {os.getenv('STABILITY_API_KEY')}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+
+    def create_client(self):
+        session = requests.Session()
+        session.headers.update(self.headers())
+        return session
+
+    async def async_client(self):
+        """One pooled httpx.AsyncClient per event loop, closed when the loop shuts down."""
+        loop = asyncio.get_running_loop()
+        entry = self._async_clients.get(loop)
+        if entry is None:
+            client = httpx.AsyncClient(headers=self.headers())
+            closer = _close_on_shutdown(client)
+            await closer.__anext__()
+            entry = self._async_clients[loop] = (client, closer)
+        return entry[0]
+
+    @staticmethod
+    def body(prompt: str) -> Dict:
+        return {
+            "text_prompts": [{"text": prompt}],
+            "cfg_scale": 7,
+            "height": 1024,
+            "width": 1024,
+            "samples": 1,
+            "steps": 30,
+        }
+
+    @staticmethod
+    def image_from(response) -> str:
+        if response.status_code != 200:
+            return ""
+        artifact = response.json().get('artifacts', [{}])[0]
+        if artifact.get('url'):
+            return artifact['url']
+        if artifact.get('base64'):
+            return f"data:image/png;base64,{artifact['base64']}"
+        return ""
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        return self.image_from(self.client().post(self.url, json=self.body(prompt), timeout=timeout))
+
+    async def agenerate(self, prompt: str, timeout: float) -> str:
+        client = await self.async_client()
+        response = await client.post(self.url, json=self.body(prompt), timeout=timeout)
+        return self.image_from(response)
+
+
+class ImageDispatcher:
+    """
+    Races the healthiest configured providers and returns the first good image.
+    The best-scoring provider starts immediately; the next one is started after
+    AI_IMAGE_HEDGE_DELAY seconds without an answer, or as soon as one fails.
+
+    Calls to threaded providers, from either path, run in a pool of
+    AI_IMAGE_MAX_PARALLEL × AI_IMAGE_CONCURRENCY threads. A running call can't
+    be cancelled, so a losing hedge keeps its thread until the provider
+    answers or times out. To keep those losers from queueing later requests
+    behind them, a request only hedges when a thread is free right away, and
+    waits at most its own time budget for its first call. Providers with a
+    native async client run as tasks on the event loop on the async path.
+    """
+
+    def __init__(self, providers: List[ImageProvider]):
+        self.providers = providers
+        self._pool_lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    def pool(self):
+        """(executor, slots): one thread per slot, created on first use."""
+        if self._executor is None:
+            with self._pool_lock:
+                if self._executor is None:
+                    size = max(1, settings.AI_IMAGE_MAX_PARALLEL * settings.AI_IMAGE_CONCURRENCY)
+                    self._slots = threading.BoundedSemaphore(size)
+                    self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="image-provider")
+        return self._executor, self._slots
+
+    def ranked(self) -> List[ImageProvider]:
+        available = [provider for provider in self.providers if provider.is_configured()]
+        return sorted(available, key=lambda provider: provider.health.score(), reverse=True)
+
+    def health(self) -> Dict[str, Dict[str, float]]:
+        return {provider.name: provider.health.snapshot() for provider in self.providers}
+
+    def _run(self, provider: ImageProvider, prompt: str, timeout: float) -> str:
+        started = time.monotonic()
+        try:
+            url = provider.generate(prompt, timeout) or ""
+        except Exception as e:
+            logger.warning("Image provider failed", extra={"provider": provider.name, "error": repr(e)})
+            url = ""
+        provider.health.record(time.monotonic() - started, bool(url))
+        return url
+
+    async def _arun(self, provider: ImageProvider, prompt: str, timeout: float) -> str:
+        started = time.monotonic()
+        try:
+            url = await asyncio.wait_for(provider.agenerate(prompt, timeout), timeout) or ""
+        except Exception as e:
+            logger.warning("Image provider failed", extra={"provider": provider.name, "error": repr(e)})
+            url = ""
+        provider.health.record(time.monotonic() - started, bool(url))
+        return url
+
+    @staticmethod
+    async def _aacquire(slots, deadline: float, block: bool) -> bool:
+        """Take a pool slot without blocking the event loop; with `block`, poll until `deadline`."""
+        while not slots.acquire(blocking=False):
+            if not block or time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(SLOT_POLL_INTERVAL)
+        return True
+
+    async def agenerate(self, prompt: str, timeout: float) -> str:
+        """Async generate: the same hedged race, awaited on the running event loop."""
+        queue = self.ranked()
+        if not queue:
+            return ""
+
+        executor, slots = self.pool()
+        deadline = time.monotonic() + timeout
+        hedge_delay = settings.AI_IMAGE_HEDGE_DELAY
+        max_parallel = settings.AI_IMAGE_MAX_PARALLEL
+        pending = set()
+
+        try:
+            while queue or pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if queue and len(pending) < max_parallel:
+                    if not queue[0].threaded:
+                        pending.add(asyncio.ensure_future(self._arun(queue.pop(0), prompt, remaining)))
+                    # Same rule as the sync path: hedge only on a free thread
+                    elif await self._aacquire(slots, deadline, block=not pending):
+                        future = executor.submit(self._run, queue.pop(0), prompt, remaining)
+                        future.add_done_callback(lambda _: slots.release())
+                        pending.add(asyncio.wrap_future(future))
+                if not pending:
+                    continue
+
+                wait_for = min(remaining, hedge_delay) if queue and len(pending) < max_parallel else remaining
+                done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result():
+                        return task.result()
+            return ""
+        finally:
+            # Native async losers stop right away and free their sockets; threaded
+            # ones only lose their place in the queue and keep their slot until they return
+            for task in pending:
+                task.cancel()
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        """First good image URL from the providers, or "" when all fail or time runs out."""
+        queue = self.ranked()
+        if not queue:
+            return ""
+
+        executor, slots = self.pool()
+        deadline = time.monotonic() + timeout
+        hedge_delay = settings.AI_IMAGE_HEDGE_DELAY
+        max_parallel = settings.AI_IMAGE_MAX_PARALLEL
+        pending = {}
+
+        while queue or pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if queue and len(pending) < max_parallel:
+                # Hedge only on a free thread; with nothing in flight, wait for one
+                if slots.acquire(blocking=False) if pending else slots.acquire(timeout=remaining):
+                    provider = queue.pop(0)
+                    future = executor.submit(self._run, provider, prompt, remaining)
+                    future.add_done_callback(lambda _: slots.release())  # also runs when cancelled
+                    pending[future] = provider
+
+            wait_for = min(remaining, hedge_delay) if queue and len(pending) < max_parallel else remaining
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                url = future.result()
+                if url:
+                    for other in pending:
+                        other.cancel()
+                    return url
+
+        for future in pending:
+            future.cancel()
+        return ""
+
+
+IMAGE_PROVIDERS: Dict[str, ImageProvider] = {
+    provider.name: provider
+    for provider in (ImagenProvider(), DalleProvider(), StabilityProvider())
+}
+
+image_dispatcher = ImageDispatcher(list(IMAGE_PROVIDERS.values()))
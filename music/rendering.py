@@ -0,0 +1,138 @@
+# ============================================================
+# music/rendering.py - LOCAL PROMOTIONAL IMAGE RENDERER
+# ============================================================
+import io
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+FONT_REGULAR = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+# Output sizes per layout (width, height)
+VARIANTS: Dict[str, Tuple[int, int]] = {
+    "square": (1080, 1080),    # Instagram feed, Facebook
+    "story": (1080, 1920),     # Stories, Reels, TikTok
+    "landscape": (1920, 1080), # YouTube, X cards
+}
+
+# Layout used for each social platform's posts
+PLATFORM_VARIANTS = {
+    "instagram": "square",
+    "facebook": "square",
+    "boomplay": "square",
+    "spotify": "square",
+    "tiktok": "story",
+    "youtube": "landscape",
+    "x": "landscape",
+}
+
+# Gradient background colors based on genre (top, bottom)
+GENRE_COLORS = {
+    "HipHop": [(99, 102, 241), (139, 92, 246)],  # Blue to Purple
+    "Pop": [(236, 72, 153), (251, 146, 60)],      # Pink to Orange
+    "R&B": [(59, 130, 246), (147, 51, 234)],      # Blue to Purple
+    "Afrobeat": [(234, 179, 8), (239, 68, 68)],   # Yellow to Red
+    "Default": [(99, 102, 241), (139, 92, 246)]
+}
+
+# Encoder settings, tuned for speed over the last few percent of size
+FORMATS = {
+    "png": ("PNG", {"compress_level": 1}),
+    "webp": ("WEBP", {"quality": 80, "method": 0}),
+    "jpeg": ("JPEG", {"quality": 85}),
+}
+
+
+@lru_cache(maxsize=32)
+def load_font(path: str, size: int):
+    """Load a TrueType font once per process, falling back to PIL's default."""
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            return ImageFont.load_default()
+
+
+def genre_background(genre: str, size: Tuple[int, int]) -> Image.Image:
+    """
+    Vertical gradient for `genre` at `size`. Shared per process; callers
+    must .copy() before drawing on it.
+    """
+    top, bottom = GENRE_COLORS.get(genre, GENRE_COLORS["Default"])
+    return _gradient(tuple(top), tuple(bottom), size)
+
+
+# Keyed by colours, not the (user-supplied) genre: every unknown genre shares
+# the default gradient. Each entry is a full-size canvas (~6 MB for a story),
+# so this holds at most the distinct palettes at the VARIANTS sizes.
+@lru_cache(maxsize=12)
+def _gradient(top: Tuple[int, int, int], bottom: Tuple[int, int, int], size: Tuple[int, int]) -> Image.Image:
+    """Vertical gradient from `top` to `bottom`, built as one NumPy array."""
+    width, height = size
+    ramp = np.arange(height, dtype=np.float32)[:, None] / height
+    column = np.array(top, dtype=np.float32) + (np.array(bottom, dtype=np.float32) - np.array(top, dtype=np.float32)) * ramp
+    pixels = np.broadcast_to(column.astype(np.uint8)[:, None, :], (height, width, 3))
+    return Image.fromarray(np.ascontiguousarray(pixels), "RGB")
+
+
+def _fit_font(draw: ImageDraw.ImageDraw, text: str, path: str, size: int, max_width: int):
+    """Largest cached font (down to half of `size`) that fits `text` in `max_width`."""
+    font = load_font(path, size)
+    min_size = max(12, size // 2)
+    while size > min_size:
+        bbox = draw.textbbox((0, 0), text, font=font)
+        if bbox[2] - bbox[0] <= max_width:
+            break
+        size -= max(2, size // 10)
+        font = load_font(path, size)
+    return font
+
+
+def _draw_centered(draw: ImageDraw.ImageDraw, text: str, y: int, width: int, font, fill) -> None:
+    bbox = draw.textbbox((0, 0), text, font=font)
+    x = (width - (bbox[2] - bbox[0])) / 2
+    draw.text((x, y), text, fill=fill, font=font)
+
+
+def render_promotional_image(song_title: str, artist_name: str, genre: str, size: Tuple[int, int]) -> Image.Image:
+    """Render one promotional image (title, artist, genre over the genre gradient)."""
+    width, height = size
+    scale = min(width, height) / 1080
+    img = genre_background(genre, size).copy()
+    draw = ImageDraw.Draw(img)
+    max_width = int(width * 0.9)
+
+    # Text block is vertically centred around the middle of the canvas
+    centre = height / 2
+    title_font = _fit_font(draw, song_title, FONT_BOLD, int(80 * scale), max_width)
+    artist_font = _fit_font(draw, artist_name, FONT_REGULAR, int(50 * scale), max_width)
+    genre_font = load_font(FONT_REGULAR, int(40 * scale))
+
+    _draw_centered(draw, song_title, int(centre - 140 * scale), width, title_font, "white")
+    _draw_centered(draw, artist_name, int(centre - 20 * scale), width, artist_font, "white")
+    _draw_centered(draw, genre.upper(), int(centre + 80 * scale), width, genre_font, (230, 230, 240))
+    return img
+
+
+def render_promotional_images(
+    song_title: str,
+    artist_name: str,
+    genre: str,
+    variants: Optional[Iterable[str]] = None,
+) -> Dict[str, Image.Image]:
+    """Render every requested layout (all of VARIANTS by default) in one pass."""
+    names = list(variants) if variants else list(VARIANTS)
+    return {name: render_promotional_image(song_title, artist_name, genre, VARIANTS[name]) for name in names}
+
+
+def encode_image(img: Image.Image, fmt: str) -> bytes:
+    """Encode `img` as png, webp or jpeg."""
+    pil_format, options = FORMATS[fmt]
+    buffer = io.BytesIO()
+    img.save(buffer, format=pil_format, **options)
+    return buffer.getvalue()
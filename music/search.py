@@ -0,0 +1,130 @@
+# ============================================================
+# music/search.py - SQLITE FTS5 SEARCH INDEX
+# ============================================================
+import re
+from typing import List, Tuple
+
+from django.db import connection
+
+ARTIST_TABLE = "music_artist_search"
+SONG_TABLE = "music_song_search"
+
+# unicode61 + remove_diacritics folds "é" to "e" so French and English match
+# alike; prefix indexes make "as-you-type" prefix queries cheap.
+_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+CREATE_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {ARTIST_TABLE} USING fts5(stage_name, username, genre, {_OPTIONS})",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SONG_TABLE} USING fts5(title, transcription, lyrics, user_id UNINDEXED, {_OPTIONS})",
+]
+DROP_SQL = [f"DROP TABLE IF EXISTS {ARTIST_TABLE}", f"DROP TABLE IF EXISTS {SONG_TABLE}"]
+
+# BM25 column weights: a hit in the name counts more than one in the body
+ARTIST_WEIGHTS = (10.0, 5.0, 2.0)      # stage_name, username, genre
+SONG_WEIGHTS = (10.0, 2.0, 2.0, 0.0)   # title, transcription, lyrics, user_id
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_QUERY_TOKENS = 8
+
+
+def search_enabled() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def build_match_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word must match as a prefix.
+    Words are quoted, so user input can never inject FTS5 operators.
+    """
+    tokens = _TOKEN_RE.findall(text or "")[:MAX_QUERY_TOKENS]
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+# ---------------- Incremental maintenance ----------------
+def index_artist(profile) -> None:
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {ARTIST_TABLE} WHERE rowid = %s", [profile.pk])
+        cursor.execute(
+            f"INSERT INTO {ARTIST_TABLE} (rowid, stage_name, username, genre) VALUES (%s, %s, %s, %s)",
+            [profile.pk, profile.stage_name or "", profile.user.username or "", profile.primary_genre or ""],
+        )
+
+
+def remove_artist(profile_id: int) -> None:
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {ARTIST_TABLE} WHERE rowid = %s", [profile_id])
+
+
+def index_song(song) -> None:
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SONG_TABLE} WHERE rowid = %s", [song.pk])
+        cursor.execute(
+            f"INSERT INTO {SONG_TABLE} (rowid, title, transcription, lyrics, user_id) VALUES (%s, %s, %s, %s, %s)",
+            [song.pk, song.title or "", song.transcription or "", song.lyrics_text or "", song.user_id],
+        )
+
+
+def remove_song(song_id: int) -> None:
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SONG_TABLE} WHERE rowid = %s", [song_id])
+
+
+def rebuild() -> Tuple[int, int]:
+    """Recreate both indexes from the model tables. Returns (artists, songs) indexed."""
+    if not search_enabled():
+        return 0, 0
+    with connection.cursor() as cursor:
+        for sql in DROP_SQL + CREATE_SQL:
+            cursor.execute(sql)
+        cursor.execute(
+            f"INSERT INTO {ARTIST_TABLE} (rowid, stage_name, username, genre) "
+            f"SELECT p.id, p.stage_name, u.username, p.primary_genre "
+            f"FROM users_artistprofile p JOIN users_user u ON u.id = p.user_id"
+        )
+        artists = cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO {SONG_TABLE} (rowid, title, transcription, lyrics, user_id) "
+            f"SELECT id, title, COALESCE(transcription, ''), COALESCE(lyrics_text, ''), user_id FROM music_song"
+        )
+        songs = cursor.rowcount
+    return artists, songs
+
+
+# ---------------- Queries ----------------
+def search_artists(text: str, limit: int = 200) -> List[Tuple[int, float]]:
+    """[(profile_id, bm25)] best match first."""
+    match = build_match_query(text)
+    if not match or not search_enabled():
+        return []
+    weights = ", ".join(str(w) for w in ARTIST_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, bm25({ARTIST_TABLE}, {weights}) AS rank FROM {ARTIST_TABLE} "
+            f"WHERE {ARTIST_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+            [match, limit],
+        )
+        return cursor.fetchall()
+
+
+def search_songs(text: str, user_id: int, limit: int = 50) -> List[Tuple[int, float, str]]:
+    """[(song_id, bm25, snippet)] for one user's songs, best match first."""
+    match = build_match_query(text)
+    if not match or not search_enabled():
+        return []
+    weights = ", ".join(str(w) for w in SONG_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, bm25({SONG_TABLE}, {weights}) AS rank, "
+            f"snippet({SONG_TABLE}, -1, '[', ']', '…', 12) "
+            f"FROM {SONG_TABLE} WHERE {SONG_TABLE} MATCH %s AND user_id = %s ORDER BY rank LIMIT %s",
+            [match, user_id, limit],
+        )
+        return cursor.fetchall()
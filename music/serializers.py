@@ -14,7 +14,18 @@ class SongSerializer(serializers.ModelSerializer):
     class Meta:
         model = Song
         fields = "__all__"
-        read_only_fields = ("tempo", "key", "energy", "transcription", "uploaded_at", 'artist')
+        read_only_fields = ("tempo", "key", "energy", "transcription", "uploaded_at", 'artist', 'degraded_stages')
+
+
+class SongSummarySerializer(serializers.ModelSerializer):
+    """Song without transcription or lyrics, for lists and profile previews"""
+    class Meta:
+        model = Song
+        fields = ['id', 'title', 'language', 'tempo', 'key', 'energy', 'uploaded_at']
+        read_only_fields = fields
+
+    # Columns to load with .only() when a queryset feeds this serializer
+    load_fields = ['id', 'title', 'language', 'tempo', 'key', 'energy', 'uploaded_at']
 
 
 class AIFeedbackSerializer(serializers.ModelSerializer):
@@ -26,11 +37,23 @@ class AIFeedbackSerializer(serializers.ModelSerializer):
 
 # NEW: Social Post Serializer
 class SocialPostSerializer(serializers.ModelSerializer):
+    thumbnails = serializers.SerializerMethodField()
+
     class Meta:
         model = SocialPost
-        fields = ['id', 'song', 'caption', 'hashtags', 'image_url', 'image_file', 
-                  'platform', 'prompt_used', 'created_at']
-        read_only_fields = ['id', 'created_at', 'image_url', 'image_file']
+        fields = ['id', 'song', 'caption', 'hashtags', 'image_url', 'image_file', 'thumbnails',
+                  'platform', 'prompt_used', 'degraded_stages', 'created_at']
+        read_only_fields = ['id', 'created_at', 'image_url', 'image_file', 'degraded_stages']
+
+    def get_thumbnails(self, obj):
+        if not obj.generated_image_id:
+            return {}
+        from .images import thumbnail_urls
+        urls = thumbnail_urls(obj.generated_image)
+        request = self.context.get('request')
+        if request is not None:
+            urls = {size: request.build_absolute_uri(url) for size, url in urls.items()}
+        return urls
 
 
 # NEW: Streaming Link Serializer
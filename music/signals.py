@@ -0,0 +1,67 @@
+# ============================================================
+# music/signals.py - KEEP SEARCH, RESPONSE CACHE AND DASHBOARDS IN SYNC
+# ============================================================
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import ArtistProfile
+from . import search
+from .dashboard import MODEL_SECTIONS, schedule_refresh
+from .caching import CACHED_ARTIFACTS, invalidate_artifact
+from .models import Song
+
+# Song saves that only touch these fields don't change what is searchable
+_SONG_SEARCH_FIELDS = {"title", "transcription", "lyrics_text"}
+
+
+@receiver(post_save, sender=ArtistProfile)
+def index_artist_profile(sender, instance, **kwargs):
+    search.index_artist(instance)
+
+
+@receiver(post_delete, sender=ArtistProfile)
+def unindex_artist_profile(sender, instance, **kwargs):
+    search.remove_artist(instance.pk)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reindex_artist_username(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "username" not in update_fields:
+        return
+    profile = ArtistProfile.objects.filter(user=instance).select_related("user").first()
+    if profile:
+        search.index_artist(profile)
+
+
+@receiver(post_save, sender=Song)
+def index_song(sender, instance, update_fields=None, **kwargs):
+    schedule_refresh(instance.pk, "song")
+    if update_fields is not None and not _SONG_SEARCH_FIELDS.intersection(update_fields):
+        return
+    search.index_song(instance)
+
+
+@receiver(post_delete, sender=Song)
+def unindex_song(sender, instance, **kwargs):
+    search.remove_song(instance.pk)
+
+
+# ---------------- Cached artifact responses ----------------
+def drop_cached_artifact(sender, instance, **kwargs):
+    invalidate_artifact(instance)
+
+
+for _model in CACHED_ARTIFACTS:
+    post_save.connect(drop_cached_artifact, sender=_model, dispatch_uid=f"drop_cached_{_model._meta.model_name}")
+    post_delete.connect(drop_cached_artifact, sender=_model, dispatch_uid=f"drop_cached_{_model._meta.model_name}")
+
+
+# ---------------- Song dashboards ----------------
+def refresh_song_dashboard(sender, instance, **kwargs):
+    schedule_refresh(instance.song_id, MODEL_SECTIONS[sender])
+
+
+for _model in MODEL_SECTIONS:
+    post_save.connect(refresh_song_dashboard, sender=_model, dispatch_uid=f"dashboard_{_model._meta.model_name}")
+    post_delete.connect(refresh_song_dashboard, sender=_model, dispatch_uid=f"dashboard_{_model._meta.model_name}")
@@ -0,0 +1,65 @@
+# ============================================================
+# music/startup.py - IMPORT-TIME PROFILING
+# ============================================================
+import subprocess
+import sys
+from typing import Dict, Iterable, List, NamedTuple
+
+from django.conf import settings
+
+# Must only be imported when audio is processed or Gemini is called
+HEAVY_MODULES = ("librosa", "numba", "whisper", "torch", "google.generativeai")
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import django
+django.setup()
+{imports}
+print(time.perf_counter() - started)
+print(",".join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportTime]:
+    """Rows of `python -X importtime` output ("import time: self | cumulative | name")."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the header line
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        rows.append(ImportTime(stripped, int(parts[0]), int(parts[1]), (len(name) - len(stripped)) // 2))
+    return rows
+
+
+def profile_startup(imports: Iterable[str] = ()) -> Dict:
+    """
+    Time django.setup() plus importing `imports` (the URLconf by default, which
+    pulls in every view) in a fresh interpreter, since this one has long since
+    imported everything. Returns {"seconds", "heavy", "modules"}.
+    """
+    imports = list(imports) or [settings.ROOT_URLCONF]
+    code = PROBE.format(imports="\n".join(f"import {name}" for name in imports), heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=settings.BASE_DIR, capture_output=True, text=True, check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{result.stderr[-2000:]}")
+    seconds, heavy = result.stdout.splitlines()[-2:]
+    return {
+        "seconds": float(seconds),
+        "heavy": [name for name in heavy.split(",") if name],
+        "modules": parse_importtime(result.stderr),
+    }
@@ -1,3 +1,1319 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import StreamingHttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from cimback import memory, profiling, timing
+from cimback.logs import (
+    JSONFormatter, QueueListenerHandler, RequestIdFilter, SamplingFilter, current_request_id
+)
+from cimback.middleware import CompressionMiddleware
+from cimback.sqlite.base import DatabaseWrapper
+from users.authentication import issue_tokens
+from users.models import User, ArtistProfile
+from . import threadbudget, warmup
+from .archive import archive_song, recent_messages
+from .images import image_url, persist_post_image, store_image_bytes
+from .models import (
+    Song, AIFeedback, AIFeedbackArchive, GeneratedImage, SocialPost, StreamingLink, SocialContent, ReleasePlan, ArtistBranding, SongAnalytics
+)
+from .providers import ImageDispatcher, ImageProvider, StabilityProvider
+from .rendering import (
+    FORMATS, VARIANTS, _gradient, encode_image, genre_background, render_promotional_images
+)
+from .startup import profile_startup
+from .utils import fallback_feedback, generate_local_promotional_image
+from .views import SongFeedbackView
+
+
+def query_plans(queries):
+    """EXPLAIN QUERY PLAN every captured SELECT; return (plan line, sql) pairs."""
+    plans = []
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            plans += [(row[-1], sql) for row in cursor.fetchall()]
+    return plans
+
+
+def full_table_scans(queries):
+    """
+    Plan lines of the captured SELECTs that scan a whole table or sort rows
+    in a temporary B-tree instead of reading an index in order.
+    """
+    return [
+        f"{detail}  <-  {sql}" for detail, sql in query_plans(queries)
+        if (detail.startswith("SCAN ") and "INDEX" not in detail) or "TEMP B-TREE" in detail
+    ]
+
+class QueryPlanTests(TestCase):
+    """Hot read paths must be served from indexes, not full table scans."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="artist", is_artist=True)
+        ArtistProfile.objects.create(
+            user=cls.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        for i in range(20):
+            other = User.objects.create(username=f"other{i}", is_artist=True)
+            ArtistProfile.objects.create(
+                user=other, stage_name=f"Artist {i}", primary_genre=["HipHop", "Pop", "Afrobeat"][i % 3],
+                experience_level=["beginner", "intermediate", "professional"][i % 3],
+                languages_of_lyrics=["english", "french"][i % 2],
+                current_platforms=["youtube", "tiktok"][:1 + i % 2], goals_or_interests=["branding"]
+            )
+
+        cls.song = Song.objects.create(user=cls.user, title="Track", transcription="la la")
+        for i in range(10):
+            AIFeedback.objects.create(song=cls.song, is_user_message=i % 2 == 0, message=f"msg {i}")
+            SocialPost.objects.create(song=cls.song, caption=f"caption {i}", platform="instagram")
+        for platform in ["spotify", "deezer", "tidal"]:
+            StreamingLink.objects.create(song=cls.song, platform=platform, url=f"https://{platform}.com/x")
+        SocialContent.objects.create(song=cls.song, captions="c")
+        ReleasePlan.objects.create(song=cls.song, schedule_days=[], reminder_texts=[])
+        ArtistBranding.objects.create(user=cls.user, taglines="t")
+        SongAnalytics.objects.create(song=cls.song, virality_score=90.0)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertIndexedGet(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertTrue(ctx.captured_queries, url)
+        self.assertEqual(full_table_scans(ctx.captured_queries), [], url)
+
+    def test_song_feedback(self):
+        self.assertIndexedGet(f"/api/music/song-feedback/{self.song.id}/")
+        cursor = self.client.get(f"/api/music/song-feedback/{self.song.id}/?limit=3").json()["next_cursor"]
+        self.assertIndexedGet(f"/api/music/song-feedback/{self.song.id}/?since={cursor}")
+
+    def test_song_list(self):
+        self.assertIndexedGet("/api/music/songs/")
+        self.assertIndexedGet(f"/api/music/songs/?artist={self.user.artist_profile.id}")
+
+    def test_social_posts(self):
+        self.assertIndexedGet(f"/api/music/social-posts/{self.song.id}/")
+        cursor = self.client.get(f"/api/music/social-posts/{self.song.id}/?limit=3").json()["next_cursor"]
+        self.assertIndexedGet(f"/api/music/social-posts/{self.song.id}/?cursor={cursor}")
+
+    def test_song_dashboard(self):
+        url = f"/api/music/songs/{self.song.id}/dashboard/"
+        self.client.get(url)
+        self.assertIndexedGet(url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_streaming_links(self):
+        self.assertIndexedGet(f"/api/music/streaming-links/{self.song.id}/")
+
+    def test_generated_artifacts(self):
+        self.assertIndexedGet(f"/api/music/social-content/{self.song.id}/")
+        self.assertIndexedGet(f"/api/music/release-plan/{self.song.id}/")
+        self.assertIndexedGet(f"/api/music/song-analytics/{self.song.id}/")
+        self.assertIndexedGet(f"/api/music/branding/{self.user.id}/")
+
+    def test_discovery_filters(self):
+        for query in [
+            "genre=hiphop",
+            "genre=Pop&experience=intermediate",
+            "experience=professional",
+            "language=french",
+            "experience=beginner&language=english",
+            "platform=tiktok",
+            "platform=youtube,tiktok&platform_match=all",
+            "goal=branding&platform=tiktok&genre=pop&language=french",
+            "experience=beginner&goal=branding,promote&goal_match=all",
+        ]:
+            self.assertIndexedGet(f"/api/music/discover-artists/?{query}")
+
+        # The genre filter walks the (lower(primary_genre), id DESC) index in page order
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/music/discover-artists/?genre=hiphop")
+        self.assertTrue(any("artist_genre_id_idx" in detail for detail, _ in query_plans(ctx.captured_queries)))
+
+
+class DiscoveryAttributeTests(TestCase):
+    """Platform and goal filters follow profile saves and support any/all matching."""
+
+    def setUp(self):
+        viewer = User.objects.create(username="viewer", is_artist=True)
+        self.client = APIClient()
+        self.client.force_authenticate(viewer)
+        self.profiles = {}
+        for name, platforms, goals in [
+            ("A", ["YouTube", "tiktok"], ["promote"]),
+            ("B", ["tiktok"], ["promote", "branding"]),
+            ("C", ["spotify"], ["collaboration"]),
+        ]:
+            user = User.objects.create(username=name.lower(), is_artist=True)
+            self.profiles[name] = ArtistProfile.objects.create(
+                user=user, stage_name=name, primary_genre="Pop", experience_level="beginner",
+                languages_of_lyrics="english", current_platforms=platforms, goals_or_interests=goals
+            )
+
+    def discover(self, **params):
+        response = self.client.get("/api/music/discover-artists/", params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(artist["stage_name"] for artist in response.json()["results"])
+
+    def test_any_and_all(self):
+        self.assertEqual(self.discover(platform="tiktok"), ["A", "B"])
+        self.assertEqual(self.discover(platform="youtube,spotify"), ["A", "C"])
+        self.assertEqual(self.discover(platform="youtube,tiktok", platform_match="all"), ["A"])
+        self.assertEqual(self.discover(goal="promote,branding", goal_match="all"), ["B"])
+        self.assertEqual(self.discover(platform="tiktok", goal="branding"), ["B"])
+        self.assertEqual(self.discover(platform="myspace"), [])
+
+    def test_rows_follow_save(self):
+        profile = self.profiles["C"]
+        profile.current_platforms = ["tiktok"]
+        profile.goals_or_interests = []
+        profile.save()
+        self.assertEqual(self.discover(platform="tiktok"), ["A", "B", "C"])
+        self.assertEqual(self.discover(goal="collaboration"), [])
+
+
+class ConditionalArtifactTests(TestCase):
+    """Artifact endpoints answer revalidation with 304 from cache and drop it on save."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="artist", is_artist=True)
+        ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        self.song = Song.objects.create(user=self.user, title="Track")
+        self.analytics = SongAnalytics.objects.create(song=self.song, virality_score=42.0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/music/song-analytics/{self.song.id}/"
+
+    def test_not_modified_without_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()["virality_score"], 42.0)
+        self.assertTrue(first["ETag"] and first["Last-Modified"])
+
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], first["ETag"])
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        since = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(since.status_code, 304)
+
+    def test_save_invalidates(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.analytics.virality_score = 77.0
+        self.analytics.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["virality_score"], 77.0)
+
+        SongAnalytics.objects.update_or_create(song=self.song, defaults={"virality_score": 12.0})
+        self.assertEqual(self.client.get(self.url).json()["virality_score"], 12.0)
+
+        self.analytics.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class SongDashboardTests(TestCase):
+    """The dashboard document follows writes to every related model."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="artist", is_artist=True)
+        ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.song = Song.objects.create(user=self.user, title="Track")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/music/songs/{self.song.id}/dashboard/"
+
+    def test_incremental_updates(self):
+        document = self.client.get(self.url).json()
+        self.assertEqual(document["song"]["title"], "Track")
+        self.assertIsNone(document["analytics"])
+        self.assertEqual(document["conversation"]["messages"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AIFeedback.objects.create(song=self.song, message="hello")
+            SongAnalytics.objects.create(song=self.song, virality_score=55.0)
+            link = StreamingLink.objects.create(song=self.song, platform="spotify", url="https://spotify.com/x")
+            SocialPost.objects.create(song=self.song, caption="new post", platform="instagram")
+        document = self.client.get(self.url).json()
+        self.assertEqual([m["message"] for m in document["conversation"]["messages"]], ["hello"])
+        self.assertEqual(document["analytics"]["virality_score"], 55.0)
+        self.assertEqual([l["platform"] for l in document["streaming_links"]], ["spotify"])
+        self.assertEqual([p["caption"] for p in document["social_posts"]], ["new post"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            link.delete()
+            self.song.title = "Renamed"
+            self.song.save()
+        document = self.client.get(self.url).json()
+        self.assertEqual(document["streaming_links"], [])
+        self.assertEqual(document["song"]["title"], "Renamed")
+
+    def test_other_users_song(self):
+        other = User.objects.create(username="other", is_artist=True)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class StreamingLinkBulkTests(TestCase):
+    """Bulk upsert inserts new links, updates and reactivates existing ones in one statement."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="artist", is_artist=True)
+        ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        self.song = Song.objects.create(user=self.user, title="Track")
+        StreamingLink.objects.create(song=self.song, platform="spotify", url="https://spotify.com/old")
+        StreamingLink.objects.create(song=self.song, platform="tidal", url="https://tidal.com/x", is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/music/streaming-links/{self.song.id}/bulk/"
+
+    def test_upsert(self):
+        links = [
+            {"platform": "Spotify", "url": "https://spotify.com/new"},
+            {"platform": "tidal", "url": "https://tidal.com/y"},
+            {"platform": "deezer", "url": "https://deezer.com/z"},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {"links": links}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(l["platform"], l["url"]) for l in response.json()["links"]],
+            [("deezer", "https://deezer.com/z"), ("spotify", "https://spotify.com/new"), ("tidal", "https://tidal.com/y")],
+        )
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(StreamingLink.objects.filter(song=self.song).count(), 3)
+
+    def test_validation(self):
+        for body in [{}, {"links": []}, {"links": [{"platform": "spotify"}]}, {"links": [{"platform": "x", "url": "nope"}]}]:
+            response = self.client.post(self.url, body, format="json")
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(StreamingLink.objects.get(platform="spotify").url, "https://spotify.com/old")
+
+
+class ResponseEncodingTests(TestCase):
+    """Large JSON responses are compressed for clients that accept it; small ones are not."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="artist", is_artist=True)
+        ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        self.song = Song.objects.create(user=self.user, title="Track")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_gzip_over_threshold(self):
+        SocialContent.objects.create(song=self.song, captions="la " * 2000)
+        url = f"/api/music/social-content/{self.song.id}/"
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertEqual(json.loads(gzip.decompress(response.content))["captions"], "la " * 2000)
+
+        # The weakened ETag still revalidates
+        again = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header("Content-Encoding"))
+
+    def test_small_responses_untouched(self):
+        response = self.client.get(f"/api/music/songs/{self.song.id}/dashboard/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_async_chain(self):
+        # Under ASGI every middleware runs on the event loop: none is adapted
+        # (which would put the async views behind it on a worker thread)
+        with self.settings(DEBUG=True), mock.patch("django.core.handlers.base.logger") as handler_logger:
+            chain = ASGIHandler()._middleware_chain
+        self.assertTrue(iscoroutinefunction(chain))
+        adapted = [call for call in handler_logger.debug.call_args_list if "adapted" in call.args[0]]
+        self.assertEqual(adapted, [])
+
+        SocialContent.objects.create(song=self.song, captions="la " * 2000)
+        headers = {"Accept-Encoding": "gzip", "Authorization": f"Bearer {issue_tokens(self.user).access_token}"}
+        response = async_to_sync(AsyncClient().get)(f"/api/music/social-content/{self.song.id}/", headers=headers)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.content))["captions"], "la " * 2000)
+
+    def test_async_streaming(self):
+        async def chunks():
+            for _ in range(100):
+                yield b"la " * 100
+
+        response = StreamingHttpResponse(chunks(), content_type="text/plain")
+        middleware = CompressionMiddleware(lambda request: response)
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        compressed = middleware(request)
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+
+        async def body():
+            return b"".join([chunk async for chunk in compressed.streaming_content])
+        self.assertEqual(gzip.decompress(asyncio.run(body())), b"la " * 10000)
+
+    def test_json_parser(self):
+        response = self.client.post(
+            f"/api/music/streaming-links/{self.song.id}/",
+            data=b'{"platform": "Spotify", "url": "https://open.spotify.com/track/x"}',
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["platform"], "spotify")
+
+        bad = self.client.post(f"/api/music/streaming-links/{self.song.id}/", data=b"{", content_type="application/json")
+        self.assertEqual(bad.status_code, 400)
+
+
+class ChatArchiveTests(TestCase):
+    """Archived messages move to compressed chunks but still read back in order."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="artist", is_artist=True)
+        ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        self.song = Song.objects.create(user=self.user, title="Track")
+        for i in range(30):
+            AIFeedback.objects.create(song=self.song, is_user_message=i % 2 == 0, message=f"msg {i} — é")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def read_all(self, limit):
+        messages, url = [], f"/api/music/song-feedback/{self.song.id}/?limit={limit}"
+        while True:
+            data = self.client.get(url).json()
+            messages += [m["message"] for m in data["conversation"]]
+            if not data["has_more"]:
+                return messages, data["next_cursor"]
+            url = f"/api/music/song-feedback/{self.song.id}/?limit={limit}&cursor={data['next_cursor']}"
+
+    def test_archive_and_read_back(self):
+        before, _ = self.read_all(50)
+        call_command("archive_chat_history", keep=10, chunk_size=8, stdout=io.StringIO())
+
+        self.assertEqual(AIFeedback.objects.filter(song=self.song).count(), 10)
+        self.assertEqual(
+            list(AIFeedbackArchive.objects.order_by("id").values_list("message_count", flat=True)), [8, 8, 4]
+        )
+        after, cursor = self.read_all(7)
+        self.assertEqual(after, before)
+
+        AIFeedback.objects.create(song=self.song, message="new")
+        delta = self.client.get(f"/api/music/song-feedback/{self.song.id}/", {"since": cursor}).json()
+        self.assertEqual([m["message"] for m in delta["conversation"]], ["new"])
+
+    def test_age_cutoff_and_recent_messages(self):
+        call_command("archive_chat_history", days=0, keep=1000, stdout=io.StringIO())
+        self.assertFalse(AIFeedback.objects.filter(song=self.song).exists())
+        self.assertEqual(
+            [m.message for m in recent_messages(self.song.id, 3)], [f"msg {i} — é" for i in (27, 28, 29)]
+        )
+
+
+    def test_chat_context_is_the_newest_turns(self):
+        call_command("archive_chat_history", keep=10, chunk_size=8, stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as ctx:
+            context = SongFeedbackView.history_context(self.song)
+        self.assertEqual([m["message"] for m in context], [f"msg {i} — é" for i in range(20, 30)])
+        self.assertFalse(any("music_aifeedbackarchive" in q["sql"] for q in ctx.captured_queries))
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset pages never repeat or skip rows, and ?since= returns only new messages."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="artist", is_artist=True)
+        ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        self.song = Song.objects.create(user=self.user, title="Track", transcription="la la")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_social_posts_pages(self):
+        for i in range(7):
+            SocialPost.objects.create(song=self.song, caption=f"caption {i}", platform="instagram")
+
+        seen, url = [], f"/api/music/social-posts/{self.song.id}/?limit=3"
+        while url:
+            data = self.client.get(url).json()
+            seen += [post["id"] for post in data["results"]]
+            url = data["next"]
+        self.assertEqual(seen, list(SocialPost.objects.order_by("-created_at", "-id").values_list("id", flat=True)))
+
+    def test_conversation_since(self):
+        for i in range(3):
+            AIFeedback.objects.create(song=self.song, message=f"msg {i}")
+        url = f"/api/music/song-feedback/{self.song.id}/"
+        first = self.client.get(url).json()
+        self.assertEqual(len(first["conversation"]), 3)
+
+        empty = self.client.get(url, {"since": first["next_cursor"]}).json()
+        self.assertEqual(empty["conversation"], [])
+        self.assertEqual(empty["next_cursor"], first["next_cursor"])
+
+        AIFeedback.objects.create(song=self.song, message="new")
+        delta = self.client.get(url, {"since": first["next_cursor"]}).json()
+        self.assertEqual([m["message"] for m in delta["conversation"]], ["new"])
+
+    def test_invalid_cursor(self):
+        def cursor(values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+        created = "2024-05-01T12:00:00+00:00"
+        bad = ["not-a-cursor", cursor(["nope", 1]), cursor([created, "1"]), cursor([created, True]),
+               cursor([1, 1]), cursor([created]), cursor({"id": 1})]
+        for url in (f"/api/music/social-posts/{self.song.id}/", f"/api/music/song-feedback/{self.song.id}/"):
+            for value in bad:
+                self.assertEqual(self.client.get(url, {"cursor": value}).status_code, 404, (url, value))
+        self.assertEqual(self.client.get("/api/music/discover-artists/", {"cursor": cursor(["1"])}).status_code, 404)
+
+    def test_naive_cursor_across_archive(self):
+        for i in range(4):
+            AIFeedback.objects.create(song=self.song, message=f"msg {i}")
+        archive_song(self.song.id, cutoff=timezone.now() + timedelta(days=1), keep=2, chunk_size=10)
+        self.assertTrue(AIFeedbackArchive.objects.filter(song=self.song).exists())
+
+        oldest = recent_messages(self.song.id, 4)[0]
+        naive = oldest.created_at.replace(tzinfo=None).isoformat()
+        values = base64.urlsafe_b64encode(json.dumps([naive, oldest.id]).encode()).decode().rstrip("=")
+        response = self.client.get(f"/api/music/song-feedback/{self.song.id}/", {"cursor": values})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m["message"] for m in response.json()["conversation"]], ["msg 1", "msg 2", "msg 3"])
+
+
+class SearchIndexTests(TestCase):
+    """The FTS index follows model saves and matches prefixes regardless of accents."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="artist", is_artist=True)
+        self.profile = ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        other = User.objects.create(username="belle", is_artist=True)
+        self.other = ArtistProfile.objects.create(
+            user=other, stage_name="Hélène Soleil", primary_genre="Pop", experience_level="beginner",
+            languages_of_lyrics="french", current_platforms=["youtube"], goals_or_interests=["branding"]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def discover(self, search):
+        response = self.client.get("/api/music/discover-artists/", {"search": search})
+        self.assertEqual(response.status_code, 200)
+        return [artist["stage_name"] for artist in response.json()["results"]]
+
+    def test_prefix_and_diacritics(self):
+        self.assertEqual(self.discover("hel"), ["Hélène Soleil"])
+        self.assertEqual(self.discover("helene sol"), ["Hélène Soleil"])
+        self.assertEqual(self.discover("belle"), ["Hélène Soleil"])
+        self.assertEqual(self.discover("nobody"), [])
+
+    def test_incremental_updates(self):
+        self.other.stage_name = "Luna"
+        self.other.save()
+        self.assertEqual(self.discover("hel"), [])
+        self.assertEqual(self.discover("lun"), ["Luna"])
+        self.other.delete()
+        self.assertEqual(self.discover("lun"), [])
+
+    def test_song_search(self):
+        song = Song.objects.create(user=self.user, title="Night Drive", lyrics_text="we ride through the café lights")
+        Song.objects.create(user=self.other.user, title="Cafe Noir")
+        response = self.client.get("/api/music/search/songs/", {"q": "cafe"})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["id"] for r in results], [song.id])
+        self.assertIn("[café]", results[0]["snippet"])
+        self.assertEqual(self.client.get("/api/music/search/songs/").status_code, 400)
+
+
+class AsyncViewTests(TestCase):
+    """AI endpoints dispatch asynchronously but keep the sync views' behaviour."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="artist", is_artist=True)
+        ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        self.song = Song.objects.create(user=self.user, title="Track", transcription="la la")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_feedback_post(self):
+        url = f"/api/music/song-feedback/{self.song.id}/"
+        response = self.client.post(url, {"artist_input": "How is the hook?"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["user_message"]["message"], "How is the hook?")
+        self.assertTrue(response.json()["ai_response"]["message"])
+        self.assertEqual(AIFeedback.objects.filter(song=self.song).count(), 2)
+
+        self.assertEqual(self.client.post(url, {}, format="json").status_code, 400)
+        self.assertEqual(len(self.client.get(url).json()["conversation"]), 2)
+
+        other = User.objects.create(username="other")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.post(url, {"artist_input": "hi"}, format="json").status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.post(url, {"artist_input": "hi"}, format="json").status_code, 401)
+        self.assertEqual(self.client.post("/api/music/song-feedback/999999/", {}, format="json").status_code, 401)
+
+    def test_image_race_on_event_loop(self):
+        class Fake(ImageProvider):
+            threaded = False
+
+            def __init__(self, name, delay, url):
+                super().__init__()
+                self.name, self.delay, self.url = name, delay, url
+
+            def is_configured(self):
+                return True
+
+            async def agenerate(self, prompt, timeout):
+                await asyncio.sleep(self.delay)
+                return self.url
+
+        dispatcher = ImageDispatcher([Fake("slow", 5, "https://slow"), Fake("fast", 0.01, "https://fast")])
+        with self.settings(AI_IMAGE_HEDGE_DELAY=0.01, AI_IMAGE_MAX_PARALLEL=2):
+            self.assertEqual(asyncio.run(dispatcher.agenerate("x", timeout=2)), "https://fast")
+        dispatcher = ImageDispatcher([Fake("broken", 0.01, "")])
+        self.assertEqual(asyncio.run(dispatcher.agenerate("x", timeout=1)), "")
+
+
+class SqliteBackendTests(TestCase):
+    """cimback.sqlite applies its PRAGMAs on connect and opens atomic blocks with BEGIN IMMEDIATE."""
+
+    def setUp(self):
+        # The test database lives in memory, where journal_mode can't be WAL
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.wal = DatabaseWrapper({**connection.settings_dict, "NAME": os.path.join(tmp.name, "db.sqlite3")}, alias="wal")
+        connections["wal"] = self.wal
+        self.addCleanup(connections.__delitem__, "wal")
+        self.addCleanup(self.wal.close)
+
+    def test_pragmas(self):
+        with self.wal.cursor() as cursor:
+            pragmas = {}
+            for name in ("journal_mode", "synchronous", "busy_timeout"):
+                cursor.execute(f"PRAGMA {name}")
+                pragmas[name] = cursor.fetchone()[0]
+        # synchronous=NORMAL reads back as 1
+        self.assertEqual(pragmas, {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000})
+
+    def test_begin_immediate(self):
+        with CaptureQueriesContext(self.wal) as ctx:
+            with transaction.atomic(using="wal"):
+                self.wal.cursor().execute("SELECT 1")
+        self.assertEqual(ctx.captured_queries[0]["sql"], "BEGIN IMMEDIATE")
+
+
+class StartupTests(TestCase):
+    """django.setup() stays fast: ML libraries and models load on first use."""
+
+    def test_setup_budget(self):
+        report = profile_startup()
+        self.assertEqual(report["heavy"], [])
+        self.assertIn("music.views", [row.module for row in report["modules"]])
+        self.assertLess(report["seconds"], settings.STARTUP_BUDGET)
+
+
+class ReadinessTests(TestCase):
+    """The readiness probe holds traffic back until the opt-in audio warmup is done."""
+
+    def tearDown(self):
+        warmup._state.update(status="cold", seconds=None, error=None)
+
+    def probe(self):
+        response = APIClient().get("/api/music/ready/")
+        data = response.json()
+        return response.status_code, data["ready"], data["warmup"], data["error"]
+
+    def test_disabled(self):
+        self.assertEqual(self.probe(), (200, True, "disabled", None))
+
+    def test_warm(self):
+        with self.settings(AUDIO_WARMUP=True):
+            self.assertEqual(self.probe(), (503, False, "cold", None))
+            warmup._state["status"] = "warming"
+            self.assertEqual(self.probe(), (503, False, "warming", None))
+            with mock.patch("music.warmup.run_warmup") as run_warmup:
+                warmup._warm()
+            run_warmup.assert_called_once()
+            self.assertEqual(self.probe(), (200, True, "warm", None))
+
+    def test_failed_warmup_still_serves(self):
+        with self.settings(AUDIO_WARMUP=True):
+            with mock.patch("music.warmup.run_warmup", side_effect=RuntimeError("no model")):
+                warmup._warm()
+            self.assertEqual(self.probe(), (200, True, "failed", "RuntimeError('no model')"))
+
+
+class ThreadBudgetTests(TestCase):
+    """Cores are split between workers and analysis jobs within the cgroup quota."""
+
+    def test_cgroup_quota(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.assertIsNone(threadbudget.cgroup_cpu_limit(root))
+            os.makedirs(os.path.join(root, "cpu"))
+            for name, value in (("cpu.cfs_quota_us", "150000"), ("cpu.cfs_period_us", "100000")):
+                with open(os.path.join(root, "cpu", name), "w") as f:
+                    f.write(value)
+            self.assertEqual(threadbudget.cgroup_cpu_limit(root), 1.5)
+            with open(os.path.join(root, "cpu.max"), "w") as f:
+                f.write("max 100000\n")
+            self.assertIsNone(threadbudget.cgroup_cpu_limit(root))
+            with open(os.path.join(root, "cpu.max"), "w") as f:
+                f.write("400000 100000\n")
+            self.assertEqual(threadbudget.cgroup_cpu_limit(root), 4.0)
+
+    def test_split(self):
+        with mock.patch.object(threadbudget, "available_cpus", return_value=16):
+            with self.settings(WEB_WORKERS=4, AUDIO_ANALYSIS_JOBS=2):
+                self.assertEqual(tuple(threadbudget.compute_budget()), (16, 4, 2, 2))
+            with self.settings(WEB_WORKERS=8, AUDIO_ANALYSIS_JOBS=4):
+                self.assertEqual(threadbudget.compute_budget().threads_per_job, 1)
+
+
+class StructuredLoggingTests(TestCase):
+    """JSON log lines go through a background queue, carry the request id and can be sampled."""
+
+    def make_logger(self, handler):
+        logger = logging.getLogger("music.tests.logging")
+        logger.handlers, logger.propagate, logger.level = [handler], False, logging.INFO
+        self.addCleanup(setattr, logger, "handlers", [])
+        return logger
+
+    def test_json_lines_through_queue(self):
+        stream = io.StringIO()
+        handler = QueueListenerHandler(stream=stream)
+        handler.setFormatter(JSONFormatter())
+        handler.addFilter(RequestIdFilter())
+        logger = self.make_logger(handler)
+
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Upload %s failed", "x", extra={"song_id": 7})
+        handler.stop()
+
+        entry = json.loads(stream.getvalue())
+        self.assertEqual((entry["message"], entry["level"], entry["song_id"]), ("Upload x failed", "ERROR", 7))
+        self.assertEqual(entry["request_id"], current_request_id())
+        self.assertIn("ValueError: boom", entry["exception"])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = QueueListenerHandler(stream=io.StringIO(), queue_size=1)
+        handler.stop()
+        logger = self.make_logger(handler)
+        for i in range(3):
+            logger.info("line %d", i)
+        self.assertEqual(handler.dropped, 2)
+
+    def test_sampling_keeps_errors(self):
+        sampler = SamplingFilter(rate=0, level="WARNING")
+        record = lambda level: logging.LogRecord("x", level, __file__, 1, "m", (), None)
+        self.assertFalse(sampler.filter(record(logging.WARNING)))
+        self.assertTrue(sampler.filter(record(logging.ERROR)))
+
+    def test_request_id_header(self):
+        response = self.client.get("/api/music/ready/", HTTP_X_REQUEST_ID="lb-1234")
+        self.assertEqual(response["X-Request-ID"], "lb-1234")
+        response = self.client.get("/api/music/ready/", HTTP_X_REQUEST_ID="not valid\n")
+        self.assertRegex(response["X-Request-ID"], r"^[0-9a-f]{32}$")
+
+
+class ServerTimingTests(TestCase):
+    """Request stages show up in Server-Timing and the per-endpoint histograms."""
+
+    def setUp(self):
+        timing.reset_histograms()
+        self.user = User.objects.create(username="artist", is_artist=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_header_and_histograms(self):
+        with self.settings(SERVER_TIMING_HEADER=True):
+            response = self.client.get("/api/music/songs/")
+        stages = {part.split(";")[0] for part in response["Server-Timing"].split(", ")}
+        self.assertTrue({"render", "total"} <= stages)
+
+        stats = timing.histograms()["GET /api/music/songs/"]
+        self.assertEqual(stats["total"]["count"], 1)
+        self.assertEqual(stats["render"]["count"], 1)
+
+        with self.settings(SERVER_TIMING_HEADER=False):
+            self.assertNotIn("Server-Timing", self.client.get("/api/music/songs/"))
+            self.assertNotIn("Server-Timing", APIClient().get("/api/music/songs/"))
+            self.user.is_staff = True
+            self.client.force_authenticate(self.user)
+            self.assertIn("Server-Timing", self.client.get("/api/music/songs/"))
+        self.assertEqual(timing.histograms()["GET /api/music/songs/"]["total"]["count"], 4)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get("/api/music/metrics/timings/").status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_authenticate(self.user)
+        self.assertIn("GET /api/music/metrics/timings/", self.client.get("/api/music/metrics/timings/").json())
+
+    def test_stages_in_async_tasks(self):
+        @timing.timed("step")
+        async def step():
+            await asyncio.sleep(0)
+
+        async def request():
+            spans = []
+            timing._spans.set(spans)
+            await asyncio.gather(step(), step())
+            return timing.summarise(spans)
+
+        ms, count = asyncio.run(request())["step"]
+        self.assertEqual(count, 2)
+        self.assertIn('step;dur=', timing.server_timing_header({"step": (ms, count)}))
+
+    def test_histogram_quantiles(self):
+        histogram = timing.Histogram()
+        for ms in [3] * 90 + [700] * 10:
+            histogram.observe(ms)
+        snapshot = histogram.snapshot()
+        self.assertEqual((snapshot["p50_ms"], snapshot["p95_ms"]), (5, 1000))
+
+
+class ProfilingTests(TestCase):
+    """Staff can profile single requests; everyone else is served as usual."""
+
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = self.settings(PROFILE_DIR=tmp.name, PROFILE_RATE_LIMIT=2, PROFILE_SAMPLE_INTERVAL=0.001)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.staff = User.objects.create(username="ops", is_staff=True)
+        self.artist = User.objects.create(username="artist", is_artist=True)
+
+    def auth(self, user):
+        return {"HTTP_AUTHORIZATION": f"Bearer {issue_tokens(user).access_token}"}
+
+    def test_staff_query_flag(self):
+        response = self.client.get("/api/music/songs/?profile=cprofile", **self.auth(self.staff))
+        self.assertEqual(response.status_code, 200)
+        name = response["X-Profile"]
+        self.assertTrue(name.endswith(".prof"))
+
+        download = self.client.get(f"/api/music/metrics/profiles/{name}/", **self.auth(self.staff))
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b"".join(download.streaming_content))
+        self.assertEqual(self.client.get("/api/music/metrics/profiles/x.prof/", **self.auth(self.staff)).status_code, 404)
+        self.assertEqual(self.client.get(f"/api/music/metrics/profiles/{name}/", **self.auth(self.artist)).status_code, 403)
+
+    def test_signed_header(self):
+        response = self.client.get("/api/music/ready/", HTTP_X_PROFILE=profiling.make_token(self.staff))
+        self.assertTrue(response["X-Profile"].endswith(".folded"))
+        self.assertEqual(profiling.stored_profiles(), [response["X-Profile"]])
+
+        response = self.client.get("/api/music/ready/", HTTP_X_PROFILE=profiling.make_token(self.staff) + "x")
+        self.assertNotIn("X-Profile", response)
+
+    def test_async_cprofile_unhooks_loop_thread(self):
+        token = profiling.make_token(self.staff)
+
+        async def request():
+            response = await AsyncClient().get("/api/music/ready/?profile=cprofile", headers={"X-Profile": token})
+            return response, sys.getprofile()
+
+        response, hook = async_to_sync(request)()
+        self.assertTrue(response["X-Profile"].endswith(".prof"))
+        self.assertIsNone(hook)
+
+    def test_non_staff_and_rate_limit(self):
+        response = self.client.get("/api/music/songs/?profile=sample", **self.auth(self.artist))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile", response)
+
+        headers = [self.client.get("/api/music/songs/?profile", **self.auth(self.staff))["X-Profile"] for _ in range(3)]
+        self.assertEqual(headers[2], "refused")
+        self.assertEqual(len(profiling.stored_profiles()), 2)
+
+
+class MemoryInstrumentationTests(TestCase):
+    """Selected endpoints record memory per request and stage; staff can snapshot and diff."""
+
+    def setUp(self):
+        memory.reset_stats()
+        self.addCleanup(memory.stop_tracing)
+        self.user = User.objects.create(username="ops", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_selected_endpoints_only(self):
+        with self.settings(MEMORY_PROFILE_ENDPOINTS=["song-list"], MEMORY_TRACEMALLOC=True):
+            self.client.get("/api/music/songs/")
+            self.client.get("/api/music/ready/")
+
+        self.assertTrue(tracemalloc.is_tracing())
+        endpoints = memory.stats()
+        self.assertEqual(list(endpoints), ["GET /api/music/songs/"])
+        self.assertEqual(endpoints["GET /api/music/songs/"]["request"]["count"], 1)
+        self.assertNotIn("traced_peak_max", endpoints["GET /api/music/songs/"]["request"])
+        self.assertIn("traced_delta_max", endpoints["GET /api/music/songs/"]["render"])
+
+    def test_snapshot_only_when_sampled_or_flagged(self):
+        staff = {"HTTP_AUTHORIZATION": f"Bearer {issue_tokens(self.user).access_token}"}
+        artist = {"HTTP_AUTHORIZATION": f"Bearer {issue_tokens(User.objects.create(username='artist')).access_token}"}
+
+        def traced_peak_recorded(*requests):
+            memory.reset_stats()
+            for path, headers in requests:
+                self.client.get(path, **headers)
+            return memory.stats()["GET /api/music/songs/"]["request"].get("traced_peak_mean") is not None
+
+        with self.settings(MEMORY_PROFILE_ENDPOINTS=["song-list"], MEMORY_TRACEMALLOC=True):
+            self.assertTrue(traced_peak_recorded(("/api/music/songs/?memory", staff)))
+            self.assertFalse(traced_peak_recorded(("/api/music/songs/?memory", artist)))
+            with self.settings(MEMORY_SNAPSHOT_SAMPLE_RATE=1.0):
+                self.assertTrue(traced_peak_recorded(("/api/music/songs/", {})))
+
+                # One measured request at a time: the traced peak is process-wide
+                with memory._snapshot_lock:
+                    self.assertFalse(traced_peak_recorded(("/api/music/songs/", {})))
+        self.assertFalse(memory._snapshot_lock.locked())
+
+    def test_snapshot_diff(self):
+        base = self.client.post("/api/music/metrics/memory/snapshots/")
+        self.assertEqual(base.status_code, 201)
+        self.assertTrue(self.client.get("/api/music/metrics/memory/").json()["tracing"])
+
+        retained = [bytearray(1000) for _ in range(1000)]
+        after = self.client.post("/api/music/metrics/memory/snapshots/").json()
+        url = f"/api/music/metrics/memory/snapshots/{base.json()['id']}/diff/"
+        diff = self.client.get(url, {"against": after["id"]}).json()
+        self.assertGreater(diff["traced_delta"], 900_000)
+        self.assertIn("tests.py", diff["top"][0]["where"])
+        del retained
+
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url, {"against": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/music/metrics/memory/snapshots/999/diff/").status_code, 404)
+
+        self.assertEqual(self.client.delete("/api/music/metrics/memory/snapshots/").status_code, 204)
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(User.objects.create(username="artist", is_artist=True))
+        self.assertEqual(self.client.get("/api/music/metrics/memory/").status_code, 403)
+        self.assertEqual(self.client.post("/api/music/metrics/memory/snapshots/").status_code, 403)
+
+
+class DeadlineTests(TestCase):
+    """Out of time, AI stages fall back locally and are regenerated by a refresh."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="artist", is_artist=True)
+        ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self):
+        with self.settings(AI_DEADLINES=dict(settings.AI_DEADLINES, upload=0.001)):
+            response = self.client.post("/api/music/upload-song/", {
+                "user": self.user.id, "title": "Late Night", "lyrics_text": "la la la",
+            }, format="json")
+        self.assertEqual(response.status_code, 201)
+        return Song.objects.get(id=response.json()["id"]), response.json()
+
+    def test_budget_spent_serves_fallbacks(self):
+        song, body = self.upload()
+        self.assertEqual(set(body["degraded_stages"]), {"feedback", "social_content", "release_plan", "branding", "analytics"})
+        self.assertEqual(song.degraded_stages, body["degraded_stages"])
+        feedback = AIFeedback.objects.get(song=song)
+        self.assertEqual(feedback.message, fallback_feedback(song))
+
+        url = f"/api/music/song-feedback/{song.id}/"
+        with self.settings(AI_DEADLINES=dict(settings.AI_DEADLINES, feedback=0.001)):
+            response = self.client.post(url, {"artist_input": "How is the hook?"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["degraded"], ["chat"])
+        self.assertEqual(response.json()["ai_response"]["message"], fallback_feedback(song, "How is the hook?"))
+
+    def test_refresh_replaces_fallback(self):
+        song, _ = self.upload()
+        AIFeedback.objects.create(song=song, is_user_message=True, message="Any notes?")
+
+        with mock.patch("music.utils._call_gemini", return_value="Tight hook, longer verse."):
+            response = self.client.post(f"/api/music/songs/{song.id}/refresh/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("feedback", response.json()["refreshed"])
+        self.assertNotIn("feedback", response.json()["degraded"])
+
+        messages = list(AIFeedback.objects.filter(song=song).order_by("created_at", "id"))
+        self.assertEqual([(m.is_user_message, m.message) for m in messages],
+                         [(False, "Tight hook, longer verse."), (True, "Any notes?")])
+
+        song.refresh_from_db()
+        self.assertNotIn("feedback", song.degraded_stages)
+        other = User.objects.create(username="other")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.post(f"/api/music/songs/{song.id}/refresh/").status_code, 403)
+
+
+class RenderingTests(TestCase):
+    """Promo images: one shared gradient per palette and size, every variant and format."""
+
+    def setUp(self):
+        _gradient.cache_clear()
+
+    def test_unknown_genres_share_the_default_gradient(self):
+        size = VARIANTS["square"]
+        first = genre_background("Drill", size)
+        for genre in ("Shoegaze", "Default", "HipHop", "x" * 500):
+            self.assertIs(genre_background(genre, size), first)
+        self.assertIsNot(genre_background("Pop", size), first)
+        self.assertEqual(_gradient.cache_info().currsize, 2)
+        self.assertEqual(first.getpixel((0, 0)), (99, 102, 241))
+
+    def test_variants_and_formats(self):
+        images = render_promotional_images("Late Night", "DJ Frank", "Afrobeat")
+        self.assertEqual({name: img.size for name, img in images.items()}, VARIANTS)
+        # Text is drawn on a copy; the shared gradient stays blank where the title went
+        background = genre_background("Afrobeat", VARIANTS["square"])
+        self.assertEqual(background.getpixel((540, 450)), background.getpixel((0, 450)))
+        self.assertNotEqual(images["square"].tobytes(), background.tobytes())
+
+        for fmt, (pil_format, _) in FORMATS.items():
+            with Image.open(io.BytesIO(encode_image(images["square"], fmt))) as decoded:
+                self.assertEqual((decoded.format, decoded.size), (pil_format, VARIANTS["square"]))
+
+
+class GeneratedImageTests(TestCase):
+    """Generated images are stored once per SHA-256, with thumbnails, and served cacheably."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = self.settings(MEDIA_ROOT=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.png = encode_image(Image.new("RGB", (800, 600), "red"), "png")
+
+    def test_dedup_and_thumbnails(self):
+        image = store_image_bytes(self.png)
+        self.assertEqual(store_image_bytes(self.png), image)
+        self.assertEqual(GeneratedImage.objects.count(), 1)
+        self.assertEqual((image.width, image.height), (800, 600))
+        self.assertEqual(sorted(image.thumbnails, key=int), ["160", "320", "640"])
+        with default_storage.open(image.thumbnails["320"], "rb") as f:
+            self.assertEqual(Image.open(f).size, (320, 240))
+
+    def test_local_fallback(self):
+        data_url = "data:image/png;base64," + base64.b64encode(self.png).decode()
+        self.assertEqual(persist_post_image(data_url, "Song", "Artist", "Pop").sha256, store_image_bytes(self.png).sha256)
+
+        with mock.patch("music.images.requests.get", side_effect=ConnectionError("unreachable")) as get:
+            unreachable = persist_post_image("https://cdn.example.com/a.png", "Song", "Artist", "Pop", (200, 200))
+        get.assert_called_once()
+        placeholder = persist_post_image("https://via.placeholder.com/200", "Song", "Artist", "Pop", (200, 200))
+        with mock.patch("music.images.MAX_IMAGE_BYTES", 1000):
+            oversized = persist_post_image(data_url, "Song", "Artist", "Pop", (200, 200))
+
+        for image in (unreachable, placeholder, oversized):
+            self.assertEqual((image.width, image.height, image.source_url), (200, 200, None))
+
+    def test_local_promotional_image(self):
+        url = generate_local_promotional_image("Late Night", "DJ Frank", "Afrobeat")
+        self.assertEqual(generate_local_promotional_image("Late Night", "DJ Frank", "Afrobeat"), url)
+        # Only the square PNG and its thumbnails are written; copying it for a post reuses it
+        image = GeneratedImage.objects.get()
+        self.assertEqual(url, f"{settings.MEDIA_URL}{image.image.name}")
+        self.assertEqual((image.width, image.height), VARIANTS["square"])
+        self.assertEqual(persist_post_image(url, "Late Night", "DJ Frank", "Afrobeat"), image)
+        stored = [os.path.join(root, name) for root, _, names in os.walk(settings.MEDIA_ROOT) for name in names]
+        self.assertEqual(len(stored), 1 + len(image.thumbnails))
+
+    def test_view(self):
+        image = store_image_bytes(self.png)
+        url = f"/api/music/images/{image.sha256}/"
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "image/png"))
+        self.assertEqual(b"".join(response.streaming_content), self.png)
+        self.assertIn("immutable", response["Cache-Control"])
+        response.close()
+
+        thumbnail = self.client.get(url, {"size": "320"})
+        self.assertEqual((thumbnail.status_code, thumbnail["Content-Type"]), (200, "image/webp"))
+        self.assertNotEqual(thumbnail["ETag"], response["ETag"])
+        thumbnail.close()
+
+        self.assertEqual(self.client.get(url, {"size": "999"}).status_code, 404)
+        self.assertEqual(self.client.get("/api/music/images/unknown/").status_code, 404)
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual((cached.status_code, cached.content), (304, b""))
+
+
+class ImageDispatcherTests(TestCase):
+    """The hedged provider race on the sync path, and its bounded thread pool."""
+
+    class Fake(ImageProvider):
+        def __init__(self, name, delay, url="", fail=False):
+            super().__init__()
+            self.name, self.delay, self.url, self.fail = name, delay, url, fail
+            self.calls = 0
+
+        def generate(self, prompt, timeout):
+            self.calls += 1
+            self.thread = threading.current_thread().name
+            time.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("down")
+            return self.url
+
+    def race(self, *providers, timeout=2):
+        dispatcher = ImageDispatcher(list(providers))
+        started = time.monotonic()
+        url = dispatcher.generate("x", timeout=timeout)
+        return url, time.monotonic() - started
+
+    def setUp(self):
+        override = self.settings(AI_IMAGE_HEDGE_DELAY=0.2, AI_IMAGE_MAX_PARALLEL=2, AI_IMAGE_CONCURRENCY=1)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_first_success(self):
+        best, backup = self.Fake("best", 0, "https://best"), self.Fake("backup", 0, "https://backup")
+        self.assertEqual(self.race(best, backup)[0], "https://best")
+        self.assertEqual((best.calls, backup.calls), (1, 0))
+        self.assertEqual(best.health.snapshot()["success_rate"], 1.0)
+
+    def test_hedge_after_delay(self):
+        url, elapsed = self.race(self.Fake("slow", 1, "https://slow"), self.Fake("fast", 0, "https://fast"))
+        self.assertEqual(url, "https://fast")
+        self.assertGreaterEqual(elapsed, 0.2)
+        self.assertLess(elapsed, 0.9)
+
+    def test_immediate_failover(self):
+        broken, backup = self.Fake("broken", 0, fail=True), self.Fake("backup", 0, "https://backup")
+        url, elapsed = self.race(broken, backup)
+        self.assertEqual(url, "https://backup")
+        self.assertLess(elapsed, 0.2)
+        self.assertEqual(broken.health.snapshot()["success_rate"], 0.0)
+
+    def test_overall_timeout_and_busy_pool(self):
+        dispatcher = ImageDispatcher([self.Fake("a", 1, "https://a"), self.Fake("b", 1, "https://b")])
+        started = time.monotonic()
+        self.assertEqual(dispatcher.generate("x", timeout=0.3), "")
+        self.assertLess(time.monotonic() - started, 0.6)
+
+        # Both threads are still held by the losers: the next request gives up
+        # within its own budget instead of queueing behind them
+        started = time.monotonic()
+        self.assertEqual(dispatcher.generate("x", timeout=0.1), "")
+        self.assertLess(time.monotonic() - started, 0.4)
+
+        # ...and the threads are free again once the losers finish
+        time.sleep(1)
+        dispatcher.providers = [self.Fake("c", 0, "https://c"), self.Fake("d", 0, "https://d")]
+        self.assertEqual(dispatcher.generate("x", timeout=0.1), "https://c")
+
+    def test_async_race_runs_threaded_providers_in_the_pool(self):
+        slow = self.Fake("slow", 1, "https://slow")
+        dispatcher = ImageDispatcher([slow, self.Fake("fast", 0, "https://fast")])
+        started = time.monotonic()
+        self.assertEqual(asyncio.run(dispatcher.agenerate("x", timeout=2)), "https://fast")
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertTrue(slow.thread.startswith("image-provider"))
+
+        # The cancelled loser still holds its thread, so only one is free: no hedging
+        dispatcher.providers = [self.Fake("a", 1, "https://a"), self.Fake("b", 0, "https://b")]
+        self.assertEqual(asyncio.run(dispatcher.agenerate("x", timeout=0.5)), "")
+        self.assertEqual(dispatcher.providers[1].calls, 0)
+
+    def test_async_client_closed_with_its_loop(self):
+        provider = StabilityProvider()
+
+        async def client():
+            return await provider.async_client(), await provider.async_client()
+
+        first, again = asyncio.run(client())
+        self.assertIs(first, again)
+        self.assertTrue(first.is_closed)
+        self.assertIsNot(asyncio.run(client())[0], first)
+
+
+class SocialPostBatchTests(TestCase):
+    """One call, several platforms: model output is validated and gaps filled locally."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = self.settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create(username="artist", is_artist=True)
+        ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        self.song = Song.objects.create(user=self.user, title="Track", transcription="la la")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/music/social-posts/{self.song.id}/batch/"
+
+    def post(self, body, reply=None):
+        with mock.patch("music.utils._call_gemini", return_value=reply or "") as gemini:
+            response = self.client.post(self.url, body, format="json")
+        return response, gemini
+
+    def captions(self, response, platform):
+        return [post["caption"] for post in response.json()["posts"] if post["platform"] == platform]
+
+    def test_mixed_platform_list(self):
+        reply = json.dumps({
+            "instagram": [{"caption": "IG one", "hashtags": "#ig"}, {"caption": ""}, "junk", {"caption": "IG two"}],
+            "tiktok": "not a list",
+        })
+        response, gemini = self.post({"platforms": ["Instagram", " ", "tiktok", "instagram", "myspace"], "options": 2}, reply)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(gemini.call_count, 1)
+
+        # Blank and duplicate entries dropped, names normalised, unknown platforms get the square layout
+        self.assertEqual(SocialPost.objects.filter(song=self.song).count(), 6)
+        self.assertEqual(self.captions(response, "instagram"), ["IG one", "IG two"])
+        fallback = self.captions(response, "tiktok")
+        self.assertEqual(len(fallback), 2)
+        self.assertIn("'Track' by DJ Frank is out now", fallback[0])
+        self.assertEqual(len(self.captions(response, "myspace")), 2)
+        self.assertNotIn("social_post_caption", response.json()["degraded"])
+
+        instagram = SocialPost.objects.get(song=self.song, platform="instagram", caption="IG one")
+        self.assertEqual(instagram.hashtags, "#ig")
+        # Only the gap-filled captions are recorded as fallbacks (no image provider is configured here)
+        self.assertEqual(instagram.degraded_stages, ["social_post_image"])
+        tiktok_stages = SocialPost.objects.filter(song=self.song, platform="tiktok").values_list("degraded_stages", flat=True)
+        self.assertEqual(list(tiktok_stages), [["social_post_caption", "social_post_image"]] * 2)
+        myspace = SocialPost.objects.filter(song=self.song, platform="myspace").first()
+        self.assertEqual(myspace.generated_image_id, instagram.generated_image_id)
+        tiktok = SocialPost.objects.filter(song=self.song, platform="tiktok").first()
+        self.assertNotEqual(tiktok.generated_image_id, instagram.generated_image_id)
+
+    def test_invalid_requests(self):
+        for body in ({}, {"platforms": "instagram"}, {"platforms": []}, {"platforms": [" "]},
+                     {"platforms": [f"p{i}" for i in range(9)]}, {"platforms": ["x"], "options": "many"}):
+            self.assertEqual(self.post(body)[0].status_code, 400, body)
+        self.assertFalse(SocialPost.objects.exists())
+
+    def test_malformed_model_response(self):
+        response, _ = self.post({"platforms": ["instagram"], "options": 1}, "Sure! Here are captions: [oops")
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("social_post_caption", response.json()["degraded"])
+        self.assertIn("is out now", self.captions(response, "instagram")[0])
+
+    def test_refresh_degraded_posts(self):
+        with self.settings(AI_DEADLINES=dict(settings.AI_DEADLINES, social_post=0.001)):
+            self.post({"platforms": ["instagram", "youtube"], "options": 1})
+        self.assertEqual(
+            list(SocialPost.objects.values_list("degraded_stages", flat=True)),
+            [["social_post_caption", "social_post_image"]] * 2,
+        )
+        png = encode_image(Image.new("RGB", (1024, 1024), "blue"), "png")
+        data_url = "data:image/png;base64," + base64.b64encode(png).decode()
+        refresh = f"/api/music/songs/{self.song.id}/refresh/"
+
+        # The image provider fails again: captions are replaced, images stay on their fallback
+        with mock.patch("music.utils._call_gemini", return_value="Fresh one\nline two\nline three\n#fresh"), \
+                mock.patch("music.utils.image_dispatcher.generate", return_value=""):
+            response = self.client.post(refresh)
+        self.assertEqual(response.status_code, 200)
+        posts = {post.platform: post for post in SocialPost.objects.all()}
+        self.assertEqual(response.json()["social_posts"]["refreshed"], [])
+        self.assertEqual(sorted(response.json()["social_posts"]["degraded"]), sorted(p.id for p in posts.values()))
+        for post in posts.values():
+            self.assertEqual((post.caption, post.hashtags), ("Fresh one\nline two\nline three", "#fresh"))
+            self.assertEqual(post.degraded_stages, ["social_post_image"])
+        fallback_image = posts["youtube"].generated_image_id
+
+        with mock.patch("music.utils.image_dispatcher.generate", return_value=data_url) as generate:
+            response = self.client.post(refresh)
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual(sorted(response.json()["social_posts"]["refreshed"]), sorted(p.id for p in posts.values()))
+        posts = {post.platform: post for post in SocialPost.objects.select_related("generated_image")}
+        self.assertEqual(posts["youtube"].degraded_stages, [])
+        self.assertNotEqual(posts["youtube"].generated_image_id, fallback_image)
+        self.assertEqual((posts["youtube"].generated_image.width, posts["youtube"].generated_image.height), VARIANTS["landscape"])
+        self.assertEqual(posts["youtube"].generated_image.source_url, None)
+        self.assertEqual(posts["instagram"].image_url, image_url(posts["instagram"].generated_image))
+
+        # Nothing left to refresh
+        self.assertEqual(self.client.post(refresh).json()["social_posts"], {"refreshed": [], "degraded": []})
+
+    def test_deadline_degraded(self):
+        with self.settings(AI_DEADLINES=dict(settings.AI_DEADLINES, social_post=0.001)):
+            response, gemini = self.post({"platforms": ["instagram", "youtube"], "options": 1})
+        self.assertEqual(response.status_code, 201)
+        gemini.assert_not_called()
+        self.assertEqual(response.json()["degraded"], ["social_post_caption", "social_post_image"])
+        self.assertEqual(len(response.json()["posts"]), 2)
+        self.assertTrue(all(post["image_file"] for post in response.json()["posts"]))
@@ -0,0 +1,137 @@
+# ============================================================
+# music/threadbudget.py - CPU THREAD BUDGET FOR AUDIO ANALYSIS
+# ============================================================
+import logging
+import math
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+from cimback import timing
+
+logger = logging.getLogger(__name__)
+
+# Read by OpenMP (torch), OpenBLAS/MKL/Accelerate (numpy) and numba when they load
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMBA_NUM_THREADS",
+)
+
+
+class ThreadBudget(NamedTuple):
+    cpus: int             # usable cores: affinity mask and cgroup quota
+    workers: int          # web worker processes sharing them
+    analysis_jobs: int    # concurrent analysis jobs per worker
+    threads_per_job: int  # native threads each job may use
+
+
+def cgroup_cpu_limit(root: str = "/sys/fs/cgroup") -> Optional[float]:
+    """CPUs allowed by the cgroup CPU quota (v2 or v1), or None when unlimited."""
+    try:
+        with open(os.path.join(root, "cpu.max")) as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_limit()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def compute_budget() -> ThreadBudget:
+    """
+    Split the usable cores evenly between web workers, then between each
+    worker's concurrent analysis jobs, so workers × jobs × threads stays
+    within the CPUs actually available.
+    """
+    cpus = available_cpus()
+    workers = max(1, settings.WEB_WORKERS)
+    jobs = max(1, settings.AUDIO_ANALYSIS_JOBS)
+    return ThreadBudget(cpus, workers, jobs, max(1, cpus // (workers * jobs)))
+
+
+_lock = threading.Lock()
+_budget: Optional[ThreadBudget] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+
+
+def budget() -> ThreadBudget:
+    global _budget, _slots
+    if _budget is None:
+        with _lock:
+            if _budget is None:
+                current = compute_budget()
+                _slots = threading.BoundedSemaphore(current.analysis_jobs)
+                _budget = current
+    return _budget
+
+
+def configure() -> ThreadBudget:
+    """
+    Apply the budget at worker start, before torch, librosa or numba are
+    imported (they are loaded lazily). Thread counts set explicitly in the
+    environment win.
+    """
+    current = budget()
+    for name in THREAD_ENV_VARS:
+        os.environ.setdefault(name, str(current.threads_per_job))
+    limit_loaded_pools()
+    logger.info("Thread budget", extra=report())
+    return current
+
+
+def limit_loaded_pools() -> None:
+    """Cap thread pools of native libraries that are already loaded (numpy's BLAS, torch)."""
+    threads = int(os.environ.get("OMP_NUM_THREADS", budget().threads_per_job))
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:  # only settable before torch's first parallel work
+            pass
+
+
+@contextmanager
+def analysis_slot():
+    """Hold one of this worker's analysis job slots (blocks while all are busy)."""
+    budget()
+    with timing.stage("analysis_wait"):
+        _slots.acquire()
+    try:
+        yield
+    finally:
+        _slots.release()
+
+
+def report() -> dict:
+    current = budget()
+    effective = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        effective["torch"] = torch.get_num_threads()
+    return dict(current._asdict(), effective=effective)
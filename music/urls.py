@@ -4,34 +4,50 @@
 # ============================================================
 from django.urls import path
 from .views import (
-    UploadSongView, SongFeedbackView,
-    SocialPostListView, SocialPostDetailView,
-    StreamingLinkListView, StreamingLinkDetailView,
-    ArtistDiscoveryView,
-    SocialContentView, ReleasePlanView, ArtistBrandingView, SongAnalyticsView
+    UploadSongView, SongListView, SongFeedbackView, SongRefreshView, SongDashboardView,
+    SocialPostListView, SocialPostBatchView, SocialPostDetailView, GeneratedImageView,
+    StreamingLinkListView, StreamingLinkBulkView, StreamingLinkDetailView,
+    ArtistDiscoveryView, SongSearchView,
+    SocialContentView, ReleasePlanView, ArtistBrandingView, SongAnalyticsView, ReadinessView,
+    StageTimingView, ProfileDownloadView, MemoryStatsView, MemorySnapshotView, MemorySnapshotDiffView
 )
 
 urlpatterns = [
     # Song upload
     path('upload-song/', UploadSongView.as_view(), name='upload-song'),
+    path('songs/', SongListView.as_view(), name='song-list'),
+    path('songs/<int:song_id>/refresh/', SongRefreshView.as_view(), name='song-refresh'),
+    path('songs/<int:song_id>/dashboard/', SongDashboardView.as_view(), name='song-dashboard'),
     
     # AI Feedback
     path('song-feedback/<int:song_id>/', SongFeedbackView.as_view(), name='song-feedback'),
     
     # NEW: Social Posts with Images
     path('social-posts/<int:song_id>/', SocialPostListView.as_view(), name='social-posts-list'),
+    path('social-posts/<int:song_id>/batch/', SocialPostBatchView.as_view(), name='social-posts-batch'),
     path('social-posts/detail/<int:pk>/', SocialPostDetailView.as_view(), name='social-post-detail'),
+    path('images/<str:sha256>/', GeneratedImageView.as_view(), name='generated-image'),
     
     # NEW: Streaming Links
     path('streaming-links/<int:song_id>/', StreamingLinkListView.as_view(), name='streaming-links-list'),
+    path('streaming-links/<int:song_id>/bulk/', StreamingLinkBulkView.as_view(), name='streaming-links-bulk'),
     path('streaming-links/detail/<int:pk>/', StreamingLinkDetailView.as_view(), name='streaming-link-detail'),
     
     # NEW: Artist Discovery
     path('discover-artists/', ArtistDiscoveryView.as_view(), name='discover-artists'),
+    path('search/songs/', SongSearchView.as_view(), name='song-search'),
     
     # Legacy endpoints
     path('social-content/<int:song_id>/', SocialContentView.as_view(), name='social-content'),
     path('release-plan/<int:song_id>/', ReleasePlanView.as_view(), name='release-plan'),
     path('branding/<int:artist_id>/', ArtistBrandingView.as_view(), name='branding'),
     path('song-analytics/<int:song_id>/', SongAnalyticsView.as_view(), name='song-analytics'),
+
+    # Load balancer readiness probe
+    path('ready/', ReadinessView.as_view(), name='ready'),
+    path('metrics/timings/', StageTimingView.as_view(), name='stage-timings'),
+    path('metrics/profiles/<str:name>/', ProfileDownloadView.as_view(), name='profile-download'),
+    path('metrics/memory/', MemoryStatsView.as_view(), name='memory-stats'),
+    path('metrics/memory/snapshots/', MemorySnapshotView.as_view(), name='memory-snapshots'),
+    path('metrics/memory/snapshots/<int:snapshot_id>/diff/', MemorySnapshotDiffView.as_view(), name='memory-snapshot-diff'),
 ]
\ No newline at end of file
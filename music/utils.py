@@ -2,82 +2,180 @@
 # ============================================================
 # music/utils.py - UPDATED WITH CHAT HISTORY SUPPORT
 # ============================================================
+import asyncio
+import json
+import logging
 import os
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Tuple, Optional
 
-import librosa
-import soundfile as sf
-import whisper
-import google.generativeai as genai
+from django.conf import settings
 
-genai.configure(api_key=os.getenv("GENAI_API_KEY"))
+from cimback import timing
+from .deadlines import has_budget, mark_degraded, upstream_timeout
+from .providers import IMAGE_PROVIDERS, image_dispatcher
+from .threadbudget import analysis_slot, limit_loaded_pools
 
-try:
-    whisper_model = whisper.load_model("tiny", device="cpu")
-except Exception as e:
-    print("Warning: could not load whisper model:", e)
-    whisper_model = None
+logger = logging.getLogger(__name__)
 
 
-def _call_gemini(prompt: str, model_name: str = "models/gemini-2.5-flash-lite") -> str:
-    """Call Gemini safely, return text (fallback string on error)."""
+# ---------------- Heavy dependencies, loaded on first use ----------------
+# librosa (numba), whisper (torch) and google.generativeai take seconds and
+# hundreds of MB to import. Keeping them out of module scope means
+# migrations, management commands and tests that never touch audio or
+# Gemini don't pay for them; check with `manage.py profile_startup`.
+def lazy(factory):
+    """Call `factory` once, on first use, even when first used from several threads."""
+    lock = threading.Lock()
+    state = {}
+
+    def get():
+        if "value" not in state:
+            with lock:
+                if "value" not in state:
+                    state["value"] = factory()
+        return state["value"]
+
+    get.is_loaded = lambda: "value" in state
+    return get
+
+
+@lazy
+def gemini():
+    """google.generativeai, configured with the API key."""
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GENAI_API_KEY"))
+    return genai
+
+
+@lazy
+def whisper_model():
+    """The Whisper model, or None when it can't be loaded."""
     try:
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=0.85,
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=1024,
-            ),
-        )
-        text = getattr(response, "text", None)
-        if text:
-            return text.strip()
-        candidates = getattr(response, "candidates", None)
-        if candidates and len(candidates) > 0:
-            candidate = candidates[0]
-            content = candidate.get("content") if isinstance(candidate, dict) else getattr(candidate, "content", None)
-            if content:
-                if isinstance(content, dict):
-                    return content.get("text", str(content)).strip()
-                return str(content).strip()
-        return "AI returned no content. Keep going — your sound is unique!"
+        import whisper
+        model = whisper.load_model("tiny", device="cpu")
+        limit_loaded_pools()  # torch is loaded now
+        return model
+    except Exception:
+        logger.warning("Could not load the Whisper model", exc_info=True)
+        return None
+
+
+FALLBACK_REPLY = "This is fire. Keep going — your sound is unique and powerful!"
+
+
+def _generation_config(max_output_tokens: int):
+    return gemini().GenerationConfig(
+        temperature=0.85,
+        top_p=0.95,
+        top_k=40,
+        max_output_tokens=max_output_tokens,
+    )
+
+
+def _response_text(response) -> str:
+    text = getattr(response, "text", None)
+    if text:
+        return text.strip()
+    candidates = getattr(response, "candidates", None)
+    if candidates and len(candidates) > 0:
+        candidate = candidates[0]
+        content = candidate.get("content") if isinstance(candidate, dict) else getattr(candidate, "content", None)
+        if content:
+            if isinstance(content, dict):
+                return content.get("text", str(content)).strip()
+            return str(content).strip()
+    return "AI returned no content. Keep going — your sound is unique!"
+
+
+def _call_gemini(
+    prompt: str,
+    model_name: str = "models/gemini-2.5-flash-lite",
+    stage: str = "gemini",
+    max_output_tokens: int = 1024,
+) -> str:
+    """
+    Call Gemini safely, return text (fallback string on error).
+    The call is skipped when the request deadline is nearly spent, and its
+    timeout never exceeds what is left of the budget.
+    """
+    if not has_budget(stage):
+        return FALLBACK_REPLY
+    try:
+        model = gemini().GenerativeModel(model_name)
+        with timing.stage(f"gemini.{stage}"):
+            response = model.generate_content(
+                prompt,
+                generation_config=_generation_config(max_output_tokens),
+                request_options={"timeout": upstream_timeout(settings.AI_UPSTREAM_TIMEOUT)},
+            )
+        return _response_text(response)
+    except Exception as e:
+        logger.warning("Gemini call failed", extra={"stage": stage, "error": repr(e)})
+        mark_degraded(stage)
+        return FALLBACK_REPLY
+
+
+async def _acall_gemini(
+    prompt: str,
+    model_name: str = "models/gemini-2.5-flash-lite",
+    stage: str = "gemini",
+    max_output_tokens: int = 1024,
+) -> str:
+    """Async _call_gemini: awaits the upstream call instead of blocking a thread."""
+    if not has_budget(stage):
+        return FALLBACK_REPLY
+    try:
+        model = gemini().GenerativeModel(model_name)
+        with timing.stage(f"gemini.{stage}"):
+            response = await model.generate_content_async(
+                prompt,
+                generation_config=_generation_config(max_output_tokens),
+                request_options={"timeout": upstream_timeout(settings.AI_UPSTREAM_TIMEOUT)},
+            )
+        return _response_text(response)
     except Exception as e:
-        print(f"Gemini API Error: {e}")
-        return "This is fire. Keep going — your sound is unique and powerful!"
+        logger.warning("Gemini call failed", extra={"stage": stage, "error": repr(e)})
+        mark_degraded(stage)
+        return FALLBACK_REPLY
 
 
+@timing.timed("decode")
 def preprocess_audio(file_path: str) -> Optional[str]:
     """Ensure audio is resampled to 16k WAV for Whisper."""
     try:
+        import librosa
+        import soundfile as sf
+
         y, sr = librosa.load(file_path, sr=16000)
         base, _ = os.path.splitext(file_path)
         temp_path = f"{base}_16k.wav"
         sf.write(temp_path, y, 16000)
         return temp_path
-    except Exception as e:
-        print("Preprocessing error:", e)
+    except Exception:
+        logger.exception("Audio preprocessing failed")
         return None
 
 
+@analysis_slot()  # at most AUDIO_ANALYSIS_JOBS at once per worker
 def transcribe_audio(file_path: str) -> str:
     """Transcribe audio with Whisper."""
     processed = preprocess_audio(file_path)
     if not processed:
         return "[No audio detected]"
 
-    if whisper_model is None:
+    model = whisper_model()
+    if model is None:
         return "[Transcription model not available]"
 
     try:
-        result = whisper_model.transcribe(processed)
+        with timing.stage("whisper"):
+            result = model.transcribe(processed)
         text = result.get("text", "").strip() if isinstance(result, dict) else str(result).strip()
         return text if text else "[Instrumental / No lyrics detected]"
-    except Exception as e:
-        print("Whisper error:", e)
+    except Exception:
+        logger.exception("Whisper transcription failed")
         return "[Transcription failed]"
     finally:
         if processed and os.path.exists(processed):
@@ -87,19 +185,24 @@ def transcribe_audio(file_path: str) -> str:
                 pass
 
 
+@analysis_slot()
 def extract_audio_features(file_path: str) -> Dict[str, Any]:
     """Extract tempo, key, energy from audio."""
     try:
-        y, sr = librosa.load(file_path)
-        tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-        chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-        key_idx = int(chroma.mean(axis=1).argmax())
-        keys = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
-        key = keys[key_idx] if 0 <= key_idx < len(keys) else "Unknown"
-        energy = float(librosa.feature.rms(y=y).mean())
+        import librosa
+
+        with timing.stage("decode"):
+            y, sr = librosa.load(file_path)
+        with timing.stage("features"):
+            tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+            chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+            key_idx = int(chroma.mean(axis=1).argmax())
+            keys = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+            key = keys[key_idx] if 0 <= key_idx < len(keys) else "Unknown"
+            energy = float(librosa.feature.rms(y=y).mean())
         return {"tempo": round(float(tempo), 1), "key": key, "energy": round(energy, 4)}
-    except Exception as e:
-        print("Feature extraction error:", e)
+    except Exception:
+        logger.exception("Audio feature extraction failed")
         return {"tempo": None, "key": "Unknown", "energy": None}
 
 
@@ -124,6 +227,26 @@ def generate_ai_feedback_with_history(
     Returns:
         AI response string
     """
+    stage = "feedback" if artist_input is None else "chat"
+    if not has_budget(stage):
+        return fallback_feedback(song, artist_input)
+    return _call_gemini(_feedback_prompt(user, song, artist_input, conversation_history), stage=stage)
+
+
+async def agenerate_ai_feedback_with_history(
+    user,
+    song,
+    artist_input: Optional[str] = None,
+    conversation_history: List[Dict[str, Any]] = None
+) -> str:
+    """Async generate_ai_feedback_with_history (user.artist_profile must already be loaded)."""
+    stage = "feedback" if artist_input is None else "chat"
+    if not has_budget(stage):
+        return fallback_feedback(song, artist_input)
+    return await _acall_gemini(_feedback_prompt(user, song, artist_input, conversation_history), stage=stage)
+
+
+def _feedback_prompt(user, song, artist_input: Optional[str], conversation_history: Optional[List[Dict[str, Any]]]) -> str:
     profile = getattr(user, "artist_profile", None)
     stage_name = profile.stage_name if profile and getattr(profile, "stage_name", None) else getattr(user, "username", "Unknown")
     genre = profile.primary_genre if profile and getattr(profile, "primary_genre", None) else "Hip-hop/Rap"
@@ -180,14 +303,44 @@ def generate_ai_feedback_with_history(
             f"Go straight to the point and give responses as soon as possible with thefew information you have and responses before asking for more information for more accuracy"
         )
 
-    return _call_gemini(prompt)
+    return prompt
+
+
+def fallback_feedback(song, artist_input: Optional[str] = None) -> str:
+    """Deterministic reply used when there is no time left for Gemini."""
+    title = getattr(song, "title", "your song")
+    if artist_input is None:
+        return (
+            f"Thanks for sharing '{title}'! Your upload is saved and your sound is unique. "
+            f"Detailed feedback on flow, hook, lyrics and energy is on its way — "
+            f"pull to refresh in a moment."
+        )
+    return (
+        "Great question! I need a little more time to give you a proper answer. "
+        "Please send it again in a moment."
+    )
 
 
 # ============================================================
 # Other utility functions remain the same
 # ============================================================
 def generate_song_analytics(user, song) -> Dict[str, Any]:
-    prompt = (
+    if not has_budget("analytics"):
+        return _analytics_result(ANALYTICS_FALLBACK)
+    return _analytics_result(_call_gemini(_analytics_prompt(user, song), stage="analytics"))
+
+
+async def agenerate_song_analytics(user, song) -> Dict[str, Any]:
+    if not has_budget("analytics"):
+        return _analytics_result(ANALYTICS_FALLBACK)
+    return _analytics_result(await _acall_gemini(_analytics_prompt(user, song), stage="analytics"))
+
+
+ANALYTICS_FALLBACK = "This has serious hit potential. The energy is undeniable."
+
+
+def _analytics_prompt(user, song) -> str:
+    return (
         f"Artist: {getattr(user, 'username', 'unknown')}\n"
         f"Song: {getattr(song, 'title', 'unknown')}\n"
         f"Language: {getattr(song, 'language', 'english')}\n"
@@ -199,11 +352,9 @@ def generate_song_analytics(user, song) -> Dict[str, Any]:
         f"- One current trend this fits perfectly\n"
         f"Be bold and specific. Speak like an African. Return back the lyrics then comment on it."
     )
-    try:
-        text = _call_gemini(prompt)
-    except Exception:
-        text = "This has serious hit potential. The energy is undeniable."
 
+
+def _analytics_result(text: str) -> Dict[str, Any]:
     return {
         "virality_score": 90.0,
         "predicted_engagement": {"first_week_streams": "10K-50K", "monthly_listeners_est": "50K-200K"},
@@ -212,9 +363,26 @@ def generate_song_analytics(user, song) -> Dict[str, Any]:
 
 
 def generate_social_content(user, song_title: str, transcription: str) -> Dict[str, Any]:
+    stage_name, prompt = _social_content_prompt(user, song_title, transcription)
+    if not has_budget("social_content"):
+        return templated_social_content(stage_name, song_title)
+    text = _call_gemini(prompt, stage="social_content")
+    return templated_social_content(stage_name, song_title, captions=text)
+
+
+async def agenerate_social_content(user, song_title: str, transcription: str) -> Dict[str, Any]:
+    stage_name, prompt = _social_content_prompt(user, song_title, transcription)
+    if not has_budget("social_content"):
+        return templated_social_content(stage_name, song_title)
+    text = await _acall_gemini(prompt, stage="social_content")
+    return templated_social_content(stage_name, song_title, captions=text)
+
+
+def _social_content_prompt(user, song_title: str, transcription: str) -> Tuple[str, str]:
+    """(stage_name, prompt)"""
     profile = getattr(user, "artist_profile", None)
     stage_name = profile.stage_name if profile and getattr(profile, "stage_name", None) else getattr(user, "username", "Unknown")
-
+    transcription = transcription or ""
     prompt = (
         f"Artist {stage_name} just dropped: '{song_title}'\n\n"
         f"Lyrics snippet:\n{transcription[:280]}{'...' if len(transcription) > 280 else ''}\n\n"
@@ -224,10 +392,19 @@ def generate_social_content(user, song_title: str, transcription: str) -> Dict[s
         f"- One 15-second video script idea\n"
         f"- Streaming call-to-action"
     )
-    text = _call_gemini(prompt)
+    return stage_name, prompt
 
+
+def templated_social_content(stage_name: str, song_title: str, captions: Optional[str] = None) -> Dict[str, Any]:
+    """Social content built from templates; `captions` defaults to templated captions too."""
+    if captions is None:
+        captions = (
+            f"1. '{song_title}' is OUT NOW 🔥 Tap in and tell me your favourite line!\n"
+            f"2. {stage_name} x '{song_title}' — press play and turn it up 🎧\n"
+            f"3. New vibe unlocked: '{song_title}' by {stage_name}. Stream it everywhere 🚀"
+        )
     return {
-        "captions": text,
+        "captions": captions,
         "hashtags": "#NewMusic #UnsignedArtist #HipHop #Rap #Afrobeats #Viral #Music2025 #Fire",
         "flyer_text": f"Listen to '{song_title}' by {stage_name} — out now!",
         "short_video_scripts": "POV: You just heard the song that's about to take over your playlist",
@@ -238,11 +415,25 @@ def generate_social_content(user, song_title: str, transcription: str) -> Dict[s
 
 
 def generate_artist_branding(user) -> Dict[str, Any]:
+    if not has_budget("branding"):
+        return _branding_result(BRANDING_FALLBACK)
+    return _branding_result(_call_gemini(_branding_prompt(user), stage="branding"))
+
+
+async def agenerate_artist_branding(user) -> Dict[str, Any]:
+    if not has_budget("branding"):
+        return _branding_result(BRANDING_FALLBACK)
+    return _branding_result(await _acall_gemini(_branding_prompt(user), stage="branding"))
+
+
+BRANDING_FALLBACK = "Your authenticity is your brand. Own your story — the world is watching."
+
+
+def _branding_prompt(user) -> str:
     profile = getattr(user, "artist_profile", None)
     name = profile.stage_name if profile and getattr(profile, "stage_name", None) else getattr(user, "username", "Unknown")
     genre = profile.primary_genre if profile and getattr(profile, "primary_genre", None) else "Hip-hop/Rap"
-
-    prompt = (
+    return (
         f"Artist: {name}\n"
         f"Genre: {genre}\n\n"
         f"Create a full artist brand package:\n"
@@ -251,11 +442,9 @@ def generate_artist_branding(user) -> Dict[str, Any]:
         f"- Visual aesthetic (colors, style, mood board)\n"
         f"- Social media voice\n"
     )
-    try:
-        text = _call_gemini(prompt)
-    except Exception:
-        text = "Your authenticity is your brand. Own your story — the world is watching."
 
+
+def _branding_result(text: str) -> Dict[str, Any]:
     return {
         "stage_name_suggestions": text,
         "taglines": text,
@@ -265,13 +454,27 @@ def generate_artist_branding(user) -> Dict[str, Any]:
 
 
 def generate_song_release_plan(user, song, days: int = 7) -> Tuple[List[Dict[str, str]], List[str]]:
+    if not has_budget("release_plan"):
+        return generate_release_plan(days)
+    ai_response = _call_gemini(_release_plan_prompt(user, song, days), stage="release_plan")
+    return _parse_release_plan(ai_response, days)
+
+
+async def agenerate_song_release_plan(user, song, days: int = 7) -> Tuple[List[Dict[str, str]], List[str]]:
+    if not has_budget("release_plan"):
+        return generate_release_plan(days)
+    ai_response = await _acall_gemini(_release_plan_prompt(user, song, days), stage="release_plan")
+    return _parse_release_plan(ai_response, days)
+
+
+def _release_plan_prompt(user, song, days: int) -> str:
     profile = getattr(user, "artist_profile", None)
     stage_name = profile.stage_name if profile and getattr(profile, "stage_name", None) else getattr(user, "username", "Unknown")
     song_title = getattr(song, "title", "Unknown Song")
     genre = getattr(song, "genre", "Hip-hop/Rap")
     transcription = getattr(song, "transcription", "")
-    
-    base_prompt = (
+
+    return (
         f"You are a music release strategist. Create a detailed {days}-day release plan for this new song.\n\n"
         f"Artist: {stage_name}\n"
         f"Genre: {genre}\n"
@@ -284,8 +487,8 @@ def generate_song_release_plan(user, song, days: int = 7) -> Tuple[List[Dict[str
         f"Make it beginner-friendly and clear. Return in a format that can be parsed into schedule and reminders."
     )
 
-    ai_response = _call_gemini(base_prompt)
 
+def _parse_release_plan(ai_response: str, days: int) -> Tuple[List[Dict[str, str]], List[str]]:
     schedule = []
     reminders = []
     lines = ai_response.splitlines()
@@ -306,6 +509,7 @@ def generate_song_release_plan(user, song, days: int = 7) -> Tuple[List[Dict[str
             reminders.append(line)
 
     if not schedule:
+        mark_degraded("release_plan")
         return generate_release_plan(days)
 
     return schedule, reminders
@@ -332,15 +536,6 @@ def generate_release_plan(days: int = 7) -> Tuple[List[Dict[str, str]], List[str
     return schedule, reminders
 
 
-# music/utils.py - ADD THESE NEW FUNCTIONS
-
-import os
-import requests
-from typing import Dict, Any
-import google.generativeai as genai
-
-genai.configure(api_key=os.getenv("GENAI_API_KEY"))
-
 # ============================================================
 # AI Image Generation for Social Posts
 # ============================================================
@@ -361,8 +556,88 @@ def generate_social_post_with_image(
         platform: Target platform (instagram, tiktok, facebook)
     
     Returns:
-        Dict with caption, hashtags, image_url, default_prompt
+        Dict with caption, hashtags, image_url, default_prompt, artist_name, genre
+    """
+    stage_name, genre, caption_prompt = _social_post_prompt(user, song, custom_prompt, platform)
+
+    caption_response = None
+    if has_budget("social_post_caption"):
+        caption_response = _call_gemini(caption_prompt, stage="social_post_caption")
+
+    # Generate image using AI (multiple options)
+    image_url = generate_ai_image_for_post(
+        song_title=song.title,
+        artist_name=stage_name,
+        genre=genre,
+        custom_prompt=custom_prompt,
+        platform=platform
+    )
+    return _social_post_result(song, stage_name, genre, caption_response, image_url)
+
+
+async def agenerate_social_post_with_image(
+    user,
+    song,
+    custom_prompt: str = "",
+    platform: str = "instagram"
+) -> Dict[str, Any]:
+    """
+    Async generate_social_post_with_image: the caption and the image are
+    requested concurrently (user.artist_profile must already be loaded).
+    """
+    stage_name, genre, caption_prompt = _social_post_prompt(user, song, custom_prompt, platform)
+
+    async def caption():
+        if has_budget("social_post_caption"):
+            return await _acall_gemini(caption_prompt, stage="social_post_caption")
+        return None
+
+    caption_response, image_url = await asyncio.gather(
+        caption(),
+        agenerate_ai_image_for_post(
+            song_title=song.title,
+            artist_name=stage_name,
+            genre=genre,
+            custom_prompt=custom_prompt,
+            platform=platform
+        ),
+    )
+    return _social_post_result(song, stage_name, genre, caption_response, image_url)
+
+
+def regenerate_social_post(user, song, post, stages: List[str]) -> Dict[str, Any]:
+    """
+    Regenerate the degraded parts of an existing post: "social_post_caption"
+    (new caption and hashtags) and/or "social_post_image" (new image_url).
+    Parts whose upstream call fails again come back as fallbacks and are
+    marked degraded, as on creation.
     """
+    stage_name, genre, _ = _social_post_prompt(user, song, "", post.platform)
+    default_prompt = f"Promotional post for {song.title} by {stage_name}"
+    custom_prompt = "" if post.prompt_used == default_prompt else post.prompt_used
+    stage_name, genre, caption_prompt = _social_post_prompt(user, song, custom_prompt, post.platform)
+
+    parts = {}
+    if "social_post_caption" in stages:
+        caption_response = None
+        if has_budget("social_post_caption"):
+            caption_response = _call_gemini(caption_prompt, stage="social_post_caption")
+        result = _social_post_result(song, stage_name, genre, caption_response, "")
+        parts.update(caption=result["caption"], hashtags=result["hashtags"])
+    if "social_post_image" in stages:
+        parts["image_url"] = generate_ai_image_for_post(
+            song_title=song.title,
+            artist_name=stage_name,
+            genre=genre,
+            custom_prompt=custom_prompt,
+            platform=post.platform
+        )
+    parts.update(artist_name=stage_name, genre=genre)
+    return parts
+
+
+def _social_post_prompt(user, song, custom_prompt: str, platform: str) -> Tuple[str, str, str]:
+    """(stage_name, genre, caption prompt)"""
     profile = getattr(user, "artist_profile", None)
     stage_name = profile.stage_name if profile and getattr(profile, "stage_name", None) else getattr(user, "username", "Unknown")
     genre = profile.primary_genre if profile and getattr(profile, "primary_genre", None) else "Hip-hop/Rap"
@@ -385,34 +660,125 @@ def generate_social_post_with_image(
         f"2. 10 trending hashtags\n\n"
         f"Make it authentic, engaging, and platform-appropriate for {platform}."
     )
-    
-    caption_response = _call_gemini(caption_prompt)
-    
-    # Parse response (simple split by lines)
-    lines = caption_response.split('\n')
-    caption = '\n'.join(lines[:3]) if len(lines) >= 3 else caption_response[:280]
-    hashtags = ' '.join([line for line in lines if line.strip().startswith('#')])
+    return stage_name, genre, caption_prompt
+
+
+def _social_post_result(song, stage_name: str, genre: str, caption_response: Optional[str], image_url: str) -> Dict[str, Any]:
+    if caption_response is not None:
+        # Parse response (simple split by lines)
+        lines = caption_response.split('\n')
+        caption = '\n'.join(lines[:3]) if len(lines) >= 3 else caption_response[:280]
+        hashtags = ' '.join([line for line in lines if line.strip().startswith('#')])
+    else:
+        caption = f"🔥 '{song.title}' by {stage_name} is out now!\nTurn it up and share it with your people 🎧"
+        hashtags = ""
     
     if not hashtags:
         hashtags = f"#{genre.replace(' ', '')} #NewMusic #{stage_name.replace(' ', '')} #Viral #MusicPromotion"
 
-    # Generate image using AI (multiple options)
+    return {
+        "caption": caption.strip(),
+        "hashtags": hashtags.strip(),
+        "image_url": image_url,
+        "default_prompt": f"Promotional post for {song.title} by {stage_name}",
+        "artist_name": stage_name,
+        "genre": genre,
+    }
+
+
+def generate_social_post_batch(
+    user,
+    song,
+    platforms: List[str],
+    custom_prompt: str = "",
+    options: int = 3,
+) -> Dict[str, Any]:
+    """
+    Generate caption options for several platforms with ONE structured Gemini
+    call, plus one base image shared by every variant.
+
+    Returns:
+        Dict with variants ({platform: [{caption, hashtags, fallback?}, ...]}),
+        image_url, default_prompt, artist_name, genre
+    """
+    profile = getattr(user, "artist_profile", None)
+    stage_name = profile.stage_name if profile and getattr(profile, "stage_name", None) else getattr(user, "username", "Unknown")
+    genre = profile.primary_genre if profile and getattr(profile, "primary_genre", None) else "Hip-hop/Rap"
+    default_hashtags = f"#{genre.replace(' ', '')} #NewMusic #{stage_name.replace(' ', '')} #Viral #MusicPromotion"
+
+    parsed = {}
+    if has_budget("social_post_caption"):
+        prompt = (
+            f"Create viral social media captions for this song:\n\n"
+            f"Artist: {stage_name}\n"
+            f"Song: {song.title}\n"
+            f"Genre: {genre}\n"
+            f"Lyrics snippet: {song.transcription[:200] if song.transcription else 'Instrumental'}\n\n"
+        )
+        if custom_prompt:
+            prompt += f"Artist's request: {custom_prompt}\n\n"
+        prompt += (
+            f"For EACH of these platforms: {', '.join(platforms)}\n"
+            f"write {options} different caption options (2-3 lines, emojis included, "
+            f"platform-appropriate) and 10 trending hashtags for each option.\n\n"
+            f"Return ONLY JSON, no commentary, shaped exactly like:\n"
+            f'{{"<platform>": [{{"caption": "...", "hashtags": "#a #b ..."}}]}}'
+        )
+        parsed = _parse_json_object(
+            _call_gemini(prompt, stage="social_post_caption", max_output_tokens=4096)
+        )
+        if not parsed:
+            mark_degraded("social_post_caption")
+
+    variants = {}
+    for platform in platforms:
+        entries = parsed.get(platform) if isinstance(parsed.get(platform), list) else []
+        captions = []
+        for entry in entries:
+            if len(captions) == options:
+                break
+            if isinstance(entry, dict) and entry.get("caption"):
+                captions.append({
+                    "caption": str(entry["caption"]).strip(),
+                    "hashtags": str(entry.get("hashtags") or default_hashtags).strip(),
+                })
+        while len(captions) < options:
+            captions.append({
+                "caption": f"🔥 '{song.title}' by {stage_name} is out now!\nTurn it up and share it with your people 🎧",
+                "hashtags": default_hashtags,
+                "fallback": True,
+            })
+        variants[platform] = captions
+
     image_url = generate_ai_image_for_post(
         song_title=song.title,
         artist_name=stage_name,
         genre=genre,
         custom_prompt=custom_prompt,
-        platform=platform
+        platform=", ".join(platforms),
     )
 
     return {
-        "caption": caption.strip(),
-        "hashtags": hashtags.strip(),
+        "variants": variants,
         "image_url": image_url,
         "default_prompt": f"Promotional post for {song.title} by {stage_name}",
+        "artist_name": stage_name,
+        "genre": genre,
     }
 
 
+def _parse_json_object(text: str) -> Dict[str, Any]:
+    """Parse a JSON object out of an LLM reply (tolerates ```json fences); {} if invalid."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
 def generate_ai_image_for_post(
     song_title: str,
     artist_name: str,
@@ -422,12 +788,48 @@ def generate_ai_image_for_post(
 ) -> str:
     """
     Generate AI image using multiple services
-    Priority: Imagen 3 > DALL-E > Stability AI > Placeholder
+    Providers (Imagen 3, DALL-E, Stability AI) are raced in order of their
+    recent health; falls back to a placeholder when none answers in time.
     
     Returns:
         Image URL (string)
     """
-    
+    base_prompt = _image_prompt(song_title, artist_name, genre, custom_prompt, platform)
+
+    # Remote providers are only worth trying while the request can wait for them
+    if has_budget("social_post_image", settings.AI_IMAGE_MIN_SECONDS):
+        # Race the healthiest configured providers, first good image wins
+        with timing.stage("image"):
+            image_url = image_dispatcher.generate(base_prompt, timeout=upstream_timeout(settings.AI_UPSTREAM_TIMEOUT))
+        if image_url:
+            return image_url
+        mark_degraded("social_post_image")
+
+    # Fallback: Return placeholder or use a template
+    return generate_placeholder_image(song_title, artist_name, genre)
+
+
+async def agenerate_ai_image_for_post(
+    song_title: str,
+    artist_name: str,
+    genre: str,
+    custom_prompt: str = "",
+    platform: str = "instagram"
+) -> str:
+    """Async generate_ai_image_for_post; the provider race runs on the event loop."""
+    base_prompt = _image_prompt(song_title, artist_name, genre, custom_prompt, platform)
+
+    if has_budget("social_post_image", settings.AI_IMAGE_MIN_SECONDS):
+        with timing.stage("image"):
+            image_url = await image_dispatcher.agenerate(base_prompt, timeout=upstream_timeout(settings.AI_UPSTREAM_TIMEOUT))
+        if image_url:
+            return image_url
+        mark_degraded("social_post_image")
+
+    return generate_placeholder_image(song_title, artist_name, genre)
+
+
+def _image_prompt(song_title: str, artist_name: str, genre: str, custom_prompt: str, platform: str) -> str:
     # Build image generation prompt
     base_prompt = (
         f"Create a professional music promotional image for {platform}. "
@@ -442,69 +844,29 @@ def generate_ai_image_for_post(
         base_prompt += f"Additional style: {custom_prompt}. "
     
     base_prompt += "No faces, abstract art preferred."
+    return base_prompt
 
-    # Method 1: Try Google Imagen 3 (requires Vertex AI setup)
-    try:
-        image_url = generate_with_google_imagen(base_prompt)
-        if image_url:
-            return image_url
-    except Exception as e:
-        print(f"Imagen 3 failed: {e}")
 
-    # Method 2: Try DALL-E (requires OpenAI API key)
-    try:
-        image_url = generate_with_dalle(base_prompt)
-        if image_url:
-            return image_url
-    except Exception as e:
-        print(f"DALL-E failed: {e}")
+# ============================================================
+# Image Generation Methods
+# ============================================================
 
-    # Method 3: Try Stability AI (requires API key)
+def _generate_with(provider_name: str, prompt: str) -> str:
+    provider = IMAGE_PROVIDERS[provider_name]
     try:
-        image_url = generate_with_stability_ai(base_prompt)
-        if image_url:
-            return image_url
+        return provider.generate(prompt, upstream_timeout(settings.AI_UPSTREAM_TIMEOUT)) or ""
     except Exception as e:
-        print(f"Stability AI failed: {e}")
-
-    # Fallback: Return placeholder or use a template
-    return generate_placeholder_image(song_title, artist_name, genre)
-
+        logger.warning("Image provider failed", extra={"provider": provider_name, "error": repr(e)})
+        return ""
 
-# ============================================================
-# Image Generation Methods
-# ============================================================
 
 def generate_with_google_imagen(prompt: str) -> str:
     """
     Generate image using Google Imagen 3 (Vertex AI)
     Requires: google-cloud-aiplatform library and project setup
+    The Vertex AI client and model are initialised once per process.
     """
-    try:
-        from google.cloud import aiplatform
-        from vertexai.preview.vision_models import ImageGenerationModel
-        
-        # Initialize Vertex AI
-        aiplatform.init(
-            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-        )
-        
-        model = ImageGenerationModel.from_pretrained("imagen-3.0-generate-001")
-        
-        images = model.generate_images(
-            prompt=prompt,
-            number_of_images=1,
-            aspect_ratio="1:1",  # Square for Instagram
-        )
-        
-        if images and len(images) > 0:
-            # Upload to cloud storage and return URL
-            # For now, return base64 or local path
-            return images[0].url if hasattr(images[0], 'url') else ""
-    except Exception as e:
-        print(f"Imagen error: {e}")
-        return ""
+    return _generate_with("imagen", prompt)
 
 
 def generate_with_dalle(prompt: str) -> str:
@@ -512,20 +874,7 @@ def generate_with_dalle(prompt: str) -> str:
     Generate image using OpenAI DALL-E
     Requires: openai library and API key
     """
-    try:
-        import openai
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        
-        response = openai.Image.create(
-            prompt=prompt,
-            n=1,
-            size="1024x1024"
-        )
-        
-        return response['data'][0]['url']
-    except Exception as e:
-        print(f"DALL-E error: {e}")
-        return ""
+    return _generate_with("dalle", prompt)
 
 
 def generate_with_stability_ai(prompt: str) -> str:
@@ -533,37 +882,7 @@ def generate_with_stability_ai(prompt: str) -> str:
     Generate image using Stability AI (Stable Diffusion)
     Requires: Stability AI API key
     """
-    try:
-        api_key = os.getenv("STABILITY_API_KEY")
-        if not api_key:
-            return ""
-        
-        url = "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        body = {
-            "text_prompts": [{"text": prompt}],
-            "cfg_scale": 7,
-            "height": 1024,
-            "width": 1024,
-            "samples": 1,
-            "steps": 30,
-        }
-        
-        response = requests.post(url, headers=headers, json=body)
-        
-        if response.status_code == 200:
-            data = response.json()
-            # Save image and return URL
-            # For now return base64 or placeholder
-            return data.get('artifacts', [{}])[0].get('url', '')
-    except Exception as e:
-        print(f"Stability AI error: {e}")
-        return ""
+    return _generate_with("stability", prompt)
 
 
 def generate_placeholder_image(song_title: str, artist_name: str, genre: str) -> str:
@@ -589,86 +908,55 @@ def generate_local_promotional_image(song_title: str, artist_name: str, genre: s
     """
     Generate a simple promotional image locally using PIL
     No external API required - good for MVP/testing
+    Only the square PNG is rendered and stored (once per content hash, so
+    repeat calls reuse it); save_local_promotional_images writes every variant.
     """
+    from .images import store_image_bytes
+    from .rendering import VARIANTS, encode_image, render_promotional_image
+
     try:
-        from PIL import Image, ImageDraw, ImageFont
-        import io
-        import base64
-        from django.core.files.base import ContentFile
-        
-        # Create image
-        width, height = 1080, 1080
-        
-        # Gradient background colors based on genre
-        genre_colors = {
-            "HipHop": [(99, 102, 241), (139, 92, 246)],  # Blue to Purple
-            "Pop": [(236, 72, 153), (251, 146, 60)],      # Pink to Orange
-            "R&B": [(59, 130, 246), (147, 51, 234)],      # Blue to Purple
-            "Afrobeat": [(234, 179, 8), (239, 68, 68)],   # Yellow to Red
-            "Default": [(99, 102, 241), (139, 92, 246)]
-        }
-        
-        colors = genre_colors.get(genre, genre_colors["Default"])
-        
-        # Create gradient
-        img = Image.new('RGB', (width, height))
-        draw = ImageDraw.Draw(img)
-        
-        for y in range(height):
-            r = int(colors[0][0] + (colors[1][0] - colors[0][0]) * y / height)
-            g = int(colors[0][1] + (colors[1][1] - colors[0][1]) * y / height)
-            b = int(colors[0][2] + (colors[1][2] - colors[0][2]) * y / height)
-            draw.rectangle([(0, y), (width, y+1)], fill=(r, g, b))
-        
-        # Add text
-        try:
-            # Try to use a nice font
-            font_large = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 80)
-            font_medium = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 50)
-            font_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 40)
-        except:
-            # Fallback to default font
-            font_large = ImageFont.load_default()
-            font_medium = ImageFont.load_default()
-            font_small = ImageFont.load_default()
-        
-        # Draw song title
-        title_bbox = draw.textbbox((0, 0), song_title, font=font_large)
-        title_width = title_bbox[2] - title_bbox[0]
-        title_x = (width - title_width) / 2
-        draw.text((title_x, 400), song_title, fill='white', font=font_large)
-        
-        # Draw artist name
-        artist_bbox = draw.textbbox((0, 0), artist_name, font=font_medium)
-        artist_width = artist_bbox[2] - artist_bbox[0]
-        artist_x = (width - artist_width) / 2
-        draw.text((artist_x, 520), artist_name, fill='white', font=font_medium)
-        
-        # Draw genre
-        genre_bbox = draw.textbbox((0, 0), genre.upper(), font=font_small)
-        genre_width = genre_bbox[2] - genre_bbox[0]
-        genre_x = (width - genre_width) / 2
-        draw.text((genre_x, 620), genre.upper(), fill='rgba(255,255,255,0.8)', font=font_small)
-        
-        # Save to bytes
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        # Save to Django media storage
-        from django.core.files.storage import default_storage
-        filename = f"social_posts/{song_title}_{artist_name}.png".replace(' ', '_')
-        path = default_storage.save(filename, ContentFile(buffer.read()))
-        
-        # Return media URL
-        from django.conf import settings
-        return f"{settings.MEDIA_URL}{path}"
-        
-    except Exception as e:
-        print(f"Local image generation error: {e}")
+        with timing.stage("local_image"):
+            img = render_promotional_image(song_title, artist_name, genre, VARIANTS["square"])
+            image = store_image_bytes(encode_image(img, "png"))
+        return f"{settings.MEDIA_URL}{image.image.name}"
+    except Exception:
+        logger.exception("Local image generation failed")
         return generate_placeholder_image(song_title, artist_name, genre)
 
 
+@timing.timed("local_image")
+def save_local_promotional_images(
+    song_title: str,
+    artist_name: str,
+    genre: str,
+    variants: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Render square, story and landscape promo images in one pass and store
+    each as PNG, WebP and JPEG in Django media storage.
+
+    Returns:
+        {variant: {"png": url, "webp": url, "jpeg": url}}
+    """
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from django.utils.text import slugify
+    from .rendering import FORMATS, encode_image, render_promotional_images
+
+    images = render_promotional_images(song_title, artist_name, genre, variants)
+    stem = slugify(f"{song_title}-{artist_name}") or "promo"
+
+    urls = {}
+    for variant, img in images.items():
+        urls[variant] = {}
+        for fmt in FORMATS:
+            filename = f"social_posts/{stem}_{variant}.{'jpg' if fmt == 'jpeg' else fmt}"
+            path = default_storage.save(filename, ContentFile(encode_image(img, fmt)))
+            urls[variant][fmt] = f"{settings.MEDIA_URL}{path}"
+        img.close()  # full-size canvases; don't wait for the GC to free them
+    return urls
+
+
 # ============================================================
 # Example usage in generate_social_post_with_image
 # ============================================================
@@ -692,13 +980,11 @@ def generate_ai_image_for_post_v2(
     )
     
     # Try external APIs
-    for generator in [generate_with_google_imagen, generate_with_dalle, generate_with_stability_ai]:
-        try:
-            url = generator(base_prompt)
-            if url:
-                return url
-        except Exception:
-            continue
+    if has_budget("social_post_image", settings.AI_IMAGE_MIN_SECONDS):
+        with timing.stage("image"):
+            url = image_dispatcher.generate(base_prompt, timeout=upstream_timeout(settings.AI_UPSTREAM_TIMEOUT))
+        if url:
+            return url
     
     # Fallback to local generation
     return generate_local_promotional_image(song_title, artist_name, genre)
\ No newline at end of file
@@ -2,110 +2,334 @@
 # ============================================================
 # music/views.py - UPDATED WITH NEW ENDPOINTS
 # ============================================================
+import asyncio
+
+from asgiref.sync import sync_to_async
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from .models import Song, AIFeedback, SocialPost, StreamingLink, SocialContent, ReleasePlan, ArtistBranding, SongAnalytics
-from users.models import ArtistProfile
+import mimetypes
+
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.validators import URLValidator
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Lower
+from .models import (
+    Song, AIFeedback, SocialPost, StreamingLink, SocialContent, ReleasePlan, ArtistBranding, SongAnalytics,
+    GeneratedImage, SongDashboard
+)
+from users.models import (
+    ArtistProfile, ArtistPlatform, ArtistGoal, PLATFORM_CHOICES, GOAL_CHOICES, normalise_choices
+)
 from .serializers import (
-    SongSerializer, AIFeedbackSerializer, SocialPostSerializer, StreamingLinkSerializer,
+    SongSerializer, SongSummarySerializer, AIFeedbackSerializer, SocialPostSerializer, StreamingLinkSerializer,
     SocialContentSerializer, ReleasePlanSerializer, ArtistBrandingSerializer, 
     SongAnalyticsSerializer, ArtistProfileSerializer
 )
+from . import threadbudget
+from cimback import memory, profiling, timing
+from .archive import recent_messages
+from .async_views import AsyncViewMixin, aload_artist_profile
+from .caching import CachedArtifactMixin
+from .dashboard import refresh_dashboard, schedule_refresh
+from .deadlines import DeadlineMixin, collect_degraded, degraded_stages, mark_degraded
+from .images import image_url, is_provider_image, persist_post_image, store_resized
+from .pagination import ArtistPagination, ConversationPagination, SocialPostPagination, SongPagination
+from .rendering import PLATFORM_VARIANTS, VARIANTS
+from .search import search_artists, search_enabled, search_songs
+from .warmup import warmup_state
 from .utils import (
     transcribe_audio, extract_audio_features, generate_ai_feedback_with_history,
     generate_social_content, generate_song_release_plan, generate_artist_branding,
-    generate_song_analytics, generate_social_post_with_image
+    generate_song_analytics, generate_social_post_batch, agenerate_ai_feedback_with_history,
+    agenerate_social_content, agenerate_song_release_plan, agenerate_artist_branding,
+    agenerate_song_analytics, agenerate_social_post_with_image, regenerate_social_post
 )
 
+SONG_AI_STAGES = ["feedback", "social_content", "release_plan", "branding", "analytics"]
+# Parts of a social post that can fall back locally (kept on SocialPost.degraded_stages)
+SOCIAL_POST_STAGES = ["social_post_caption", "social_post_image"]
+
+
+def run_song_ai_stages(user, song, stages=SONG_AI_STAGES):
+    """
+    Run the AI post-processing stages for a song and store their output.
+    Every upstream call finishes before the results are written in one short
+    transaction, so no write lock is held while waiting on Gemini.
+    Stages that ran out of time are recorded on song.degraded_stages so
+    SongRefreshView can regenerate them later.
+    """
+    results = {}
+    if "feedback" in stages:
+        results["feedback"] = generate_ai_feedback_with_history(
+            user=user, song=song, artist_input=None, conversation_history=[]
+        )
+    if "social_content" in stages:
+        results["social_content"] = generate_social_content(user, song.title, song.transcription)
+    if "release_plan" in stages:
+        results["release_plan"] = generate_song_release_plan(song=song, user=user)
+    if "branding" in stages:
+        results["branding"] = generate_artist_branding(user)
+    if "analytics" in stages:
+        results["analytics"] = generate_song_analytics(user, song)
+    return store_song_ai_stages(user, song, stages, results)
+
+
+async def arun_song_ai_stages(user, song, stages=SONG_AI_STAGES):
+    """Async run_song_ai_stages: the upstream calls of all stages are in flight at once."""
+    await aload_artist_profile(user)
+    calls = {
+        "feedback": lambda: agenerate_ai_feedback_with_history(
+            user=user, song=song, artist_input=None, conversation_history=[]
+        ),
+        "social_content": lambda: agenerate_social_content(user, song.title, song.transcription),
+        "release_plan": lambda: agenerate_song_release_plan(song=song, user=user),
+        "branding": lambda: agenerate_artist_branding(user),
+        "analytics": lambda: agenerate_song_analytics(user, song),
+    }
+    names = [stage for stage in SONG_AI_STAGES if stage in stages]
+    outputs = await asyncio.gather(*(calls[stage]() for stage in names))
+    return await sync_to_async(store_song_ai_stages)(user, song, stages, dict(zip(names, outputs)))
+
+
+def initial_feedback(song):
+    """
+    The song's upload feedback: its first message, when that is an AI
+    message still in AIFeedback (None once chat history was archived).
+    """
+    if song.feedback_archives.exists():
+        return None
+    first = song.feedbacks.order_by("created_at", "id").first()
+    return first if first is not None and not first.is_user_message else None
+
+
+@timing.timed("db_write")
+def store_song_ai_stages(user, song, stages, results):
+    was_degraded = list(song.degraded_stages)
+    still_degraded = [stage for stage in degraded_stages() if stage in SONG_AI_STAGES]
+    remaining = [stage for stage in song.degraded_stages if stage not in stages]
+    song.degraded_stages = remaining + [stage for stage in still_degraded if stage not in remaining]
+
+    with transaction.atomic():
+        if results.get("feedback") is not None:
+            # A refresh replaces the fallback reply instead of adding a second "first" message
+            initial = initial_feedback(song) if "feedback" in was_degraded else None
+            if initial is not None:
+                initial.message = results["feedback"]
+                initial.save(update_fields=["message"])
+            else:
+                AIFeedback.objects.create(song=song, is_user_message=False, message=results["feedback"])
+        if results.get("social_content") is not None:
+            SocialContent.objects.update_or_create(song=song, defaults=results["social_content"])
+        if results.get("release_plan") is not None:
+            schedule, reminders = results["release_plan"]
+            ReleasePlan.objects.update_or_create(
+                song=song, defaults={"schedule_days": schedule, "reminder_texts": reminders}
+            )
+        if results.get("branding") is not None:
+            ArtistBranding.objects.update_or_create(user=user, defaults=results["branding"])
+        if results.get("analytics") is not None:
+            SongAnalytics.objects.update_or_create(song=song, defaults=results["analytics"])
+        song.save(update_fields=["degraded_stages"])
+    return song
+
+
+def refresh_social_post(user, song, post):
+    """
+    Regenerate the degraded caption and/or image of `post` in place. Parts
+    that fall back again are kept as they were and stay degraded.
+    """
+    stages = list(post.degraded_stages)
+    image = None
+    with collect_degraded() as failed:
+        parts = regenerate_social_post(user, song, post, stages)
+        if "social_post_image" in stages and "social_post_image" not in failed:
+            base = persist_post_image(parts["image_url"], song.title, parts["artist_name"], parts["genre"])
+            if base is not None:
+                image = store_resized(base, VARIANTS[PLATFORM_VARIANTS.get(post.platform, "square")])
+            else:
+                mark_degraded("social_post_image")
+
+    fields = ["degraded_stages"]
+    if "social_post_caption" in stages and "social_post_caption" not in failed:
+        post.caption, post.hashtags = parts["caption"], parts["hashtags"]
+        fields += ["caption", "hashtags"]
+    if image is not None:
+        post.image_url, post.image_file, post.generated_image = image_url(image), image.image.name, image
+        fields += ["image_url", "image_file", "generated_image"]
+    post.degraded_stages = [stage for stage in stages if stage in failed]
+    post.save(update_fields=fields)
+    return post
+
 
 # ---------------- Upload Song + Initial AI ----------------
-class UploadSongView(generics.CreateAPIView):
+class UploadSongView(DeadlineMixin, AsyncViewMixin, generics.CreateAPIView):
     serializer_class = SongSerializer
     permission_classes = [permissions.IsAuthenticated]
+    deadline_key = "upload"
 
-    def perform_create(self, serializer):
+    async def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        song = await self.aperform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        return Response(self.get_serializer(song).data, status=status.HTTP_201_CREATED, headers=headers)
+
+    async def aperform_create(self, serializer):
         user = self.request.user
-        song = serializer.save(user=user)
+        with timing.stage("upload_save"):
+            song = await sync_to_async(serializer.save)(user=user)
 
-        # Audio processing
+        # Audio processing: CPU-bound, so both run in worker threads side by side
         if song.audio_file:
-            song.transcription = transcribe_audio(song.audio_file.path)
-            features = extract_audio_features(song.audio_file.path)
+            path = song.audio_file.path
+            song.transcription, features = await asyncio.gather(
+                asyncio.to_thread(transcribe_audio, path),
+                asyncio.to_thread(extract_audio_features, path),
+            )
             song.tempo = features.get('tempo')
             song.key = features.get('key')
             song.energy = features.get('energy')
         else:
             song.transcription = song.lyrics_text or ""
-        song.save()
+        await song.asave()
+
+        # Initial AI feedback, social content, release plan, branding, analytics
+        await arun_song_ai_stages(user, song)
+
+        return song
 
-        # Initial AI Feedback
-        initial_feedback = generate_ai_feedback_with_history(
-            user=user, song=song, artist_input=None, conversation_history=[]
-        )
-        AIFeedback.objects.create(song=song, is_user_message=False, message=initial_feedback)
 
-        # Social Content (Legacy)
-        social_data = generate_social_content(user, song.title, song.transcription)
-        SocialContent.objects.create(song=song, **social_data)
+class SongRefreshView(DeadlineMixin, APIView):
+    """
+    POST: Regenerate the AI stages that were degraded to local fallbacks,
+    the song's and those of its social posts
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    deadline_key = "refresh"
 
-        # Release Plan
-        schedule, reminders = generate_song_release_plan(song=song, user=user)
-        ReleasePlan.objects.create(song=song, schedule_days=schedule, reminder_texts=reminders)
+    def post(self, request, song_id):
+        song = get_object_or_404(Song, id=song_id)
+        if song.user != request.user:
+            return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
 
-        # Branding
-        branding_data = generate_artist_branding(user)
-        ArtistBranding.objects.update_or_create(user=user, defaults=branding_data)
+        stages = list(song.degraded_stages)
+        if stages:
+            run_song_ai_stages(request.user, song, stages)
 
-        # Analytics
-        analytics_data = generate_song_analytics(user, song)
-        SongAnalytics.objects.update_or_create(song=song, defaults=analytics_data)
+        posts = list(song.social_posts.exclude(degraded_stages=[]))
+        for post in posts:
+            refresh_social_post(request.user, song, post)
 
-        return song
+        return Response({
+            "song_id": song.id,
+            "refreshed": [stage for stage in stages if stage not in song.degraded_stages],
+            "degraded": song.degraded_stages,
+            "social_posts": {
+                "refreshed": [post.id for post in posts if not post.degraded_stages],
+                "degraded": [post.id for post in posts if post.degraded_stages],
+            },
+        }, status=status.HTTP_200_OK)
+
+
+# ---------------- Song Catalog ----------------
+class SongListView(generics.ListAPIView):
+    """
+    GET: Paginated song summaries, newest first (no transcription or lyrics)
+    Query params:
+        - artist: ArtistProfile id (defaults to the current user's songs)
+        - page, page_size
+    """
+    serializer_class = SongSummarySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SongPagination
+
+    def get_queryset(self):
+        queryset = Song.objects.only(*SongSummarySerializer.load_fields)
+        artist = self.request.query_params.get('artist')
+        if artist and artist.isdigit():
+            queryset = queryset.filter(artist_id=int(artist))
+        elif artist:
+            queryset = queryset.none()
+        else:
+            queryset = queryset.filter(user=self.request.user)
+        return queryset.order_by('-uploaded_at', '-id')
+
+
+class SongDashboardView(APIView):
+    """
+    GET: Everything the song screen shows in one precomputed document:
+    song summary, recent conversation, social content, release plan,
+    analytics, recent social posts and active streaming links
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, song_id):
+        dashboard = SongDashboard.objects.filter(song_id=song_id, user=request.user).only('document').first()
+        if dashboard is None:
+            song = get_object_or_404(Song, id=song_id)
+            if song.user != request.user:
+                return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+            # Songs from before dashboards existed are built on first view
+            dashboard = refresh_dashboard(song.id)
+        return Response(dashboard.document, status=status.HTTP_200_OK)
 
 
 # ---------------- Interactive AI Feedback ----------------
-class SongFeedbackView(generics.GenericAPIView):
+class SongFeedbackView(DeadlineMixin, AsyncViewMixin, generics.GenericAPIView):
     serializer_class = AIFeedbackSerializer
     permission_classes = [permissions.IsAuthenticated]
+    deadline_key = "feedback"
 
     def get(self, request, song_id):
+        """
+        Conversation oldest first, one page at a time
+        Query params:
+            - cursor: next page after a previous response's next_cursor
+            - since: only messages newer than this cursor (for polling)
+            - limit: page size (default 50, max 200)
+        """
         song = get_object_or_404(Song, id=song_id)
         if song.user != request.user:
             return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
 
-        feedbacks = song.feedbacks.all().order_by('created_at')
+        paginator = ConversationPagination()
+        feedbacks = paginator.paginate_song(song, request)
         serializer = self.get_serializer(feedbacks, many=True)
-        
+
         return Response({
             "conversation": serializer.data,
             "song_title": song.title,
-            "song_id": song.id
+            "song_id": song.id,
+            "next_cursor": paginator.next_cursor,
+            "has_more": paginator.has_more,
         }, status=status.HTTP_200_OK)
 
-    def post(self, request, song_id):
-        song = get_object_or_404(Song, id=song_id)
-        if song.user != request.user:
+    async def post(self, request, song_id):
+        song = await aget_object_or_404(Song, id=song_id)
+        if song.user_id != request.user.id:
             return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
 
         artist_input = request.data.get('artist_input', '').strip()
         if not artist_input:
             return Response({"error": "artist_input is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get conversation history
-        conversation_history = song.feedbacks.all().order_by('created_at')[:10]
-        history_context = [{'is_user': msg.is_user_message, 'message': msg.message} for msg in conversation_history]
+        history_context = await sync_to_async(self.history_context)(song)
+        await aload_artist_profile(request.user)
 
         # Generate AI response
-        ai_response = generate_ai_feedback_with_history(
+        ai_response = await agenerate_ai_feedback_with_history(
             user=request.user, song=song, artist_input=artist_input, conversation_history=history_context
         )
 
         # Save messages
-        user_message = AIFeedback.objects.create(song=song, is_user_message=True, message=artist_input)
-        ai_message = AIFeedback.objects.create(song=song, is_user_message=False, message=ai_response)
+        with timing.stage("db_write"):
+            user_message = await AIFeedback.objects.acreate(song=song, is_user_message=True, message=artist_input)
+            ai_message = await AIFeedback.objects.acreate(song=song, is_user_message=False, message=ai_response)
 
         return Response({
             "user_message": {
@@ -119,26 +343,35 @@ class SongFeedbackView(generics.GenericAPIView):
                 "is_user_message": False,
                 "message": ai_message.message,
                 "created_at": ai_message.created_at
-            }
+            },
+            "degraded": degraded_stages(),
         }, status=status.HTTP_201_CREATED)
 
+    @staticmethod
+    def history_context(song):
+        """Last 10 messages as prompt context; the archive is only read when the hot table has fewer."""
+        conversation_history = recent_messages(song.id, 10)
+        return [{'is_user': msg.is_user_message, 'message': msg.message} for msg in conversation_history]
+
 
 # ============================================================
 # NEW: Social Posts with AI-Generated Images
 # ============================================================
-class SocialPostListView(generics.ListCreateAPIView):
+class SocialPostListView(DeadlineMixin, AsyncViewMixin, generics.ListCreateAPIView):
     """
-    GET: List all social posts for a song
+    GET: List social posts for a song, newest first (?cursor=, ?limit=)
     POST: Generate new social post with AI image
     """
     serializer_class = SocialPostSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SocialPostPagination
+    deadline_key = "social_post"
 
     def get_queryset(self):
         song_id = self.kwargs['song_id']
-        return SocialPost.objects.filter(song_id=song_id).order_by('-created_at')
+        return SocialPost.objects.filter(song_id=song_id).select_related('generated_image').order_by('-created_at')
 
-    def post(self, request, song_id):
+    async def post(self, request, song_id):
         """
         Generate social post with AI-generated image
         Body: {
@@ -146,34 +379,163 @@ class SocialPostListView(generics.ListCreateAPIView):
             "platform": "instagram"  // optional, defaults to "instagram"
         }
         """
-        song = get_object_or_404(Song, id=song_id)
+        song = await aget_object_or_404(Song, id=song_id)
         
-        if song.user != request.user:
+        if song.user_id != request.user.id:
             return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
 
         custom_prompt = request.data.get('prompt', '')
         platform = request.data.get('platform', 'instagram')
 
-        # Generate post with image
-        post_data = generate_social_post_with_image(
+        # Generate post with image (caption and image requested concurrently)
+        await aload_artist_profile(request.user)
+        post_data = await agenerate_social_post_with_image(
             user=request.user,
             song=song,
             custom_prompt=custom_prompt,
             platform=platform
         )
 
+        # Keep our own copy of the image instead of hot-linking the provider
+        with timing.stage("image_store"):
+            generated = await sync_to_async(persist_post_image)(
+                post_data.get('image_url'), song.title, post_data['artist_name'], post_data['genre']
+            )
+
         # Create post record
-        social_post = SocialPost.objects.create(
+        with timing.stage("db_write"):
+            social_post = await SocialPost.objects.acreate(
+                song=song,
+                caption=post_data['caption'],
+                hashtags=post_data['hashtags'],
+                image_url=image_url(generated) if generated else post_data.get('image_url'),
+                image_file=generated.image.name if generated else None,
+                generated_image=generated,
+                platform=platform,
+                prompt_used=custom_prompt or post_data.get('default_prompt', ''),
+                degraded_stages=[stage for stage in degraded_stages() if stage in SOCIAL_POST_STAGES],
+            )
+
+        serializer = self.get_serializer(social_post)
+        data = dict(serializer.data, degraded=degraded_stages())
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class SocialPostBatchView(DeadlineMixin, APIView):
+    """
+    POST: Generate post variants for several platforms in one call
+    Body: {
+        "platforms": ["instagram", "tiktok", "facebook"],
+        "prompt": "Make it more energetic",  // optional
+        "options": 3  // caption options per platform, 1-5, defaults to 3
+    }
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    deadline_key = "social_post"
+    max_platforms = 8
+    max_options = 5
+
+    def post(self, request, song_id):
+        song = get_object_or_404(Song, id=song_id)
+
+        if song.user != request.user:
+            return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+
+        platforms = request.data.get('platforms')
+        if not isinstance(platforms, list) or not platforms:
+            return Response({"error": "'platforms' must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        platforms = list(dict.fromkeys(str(p).strip().lower() for p in platforms if str(p).strip()))
+        if not platforms or len(platforms) > self.max_platforms:
+            return Response(
+                {"error": f"Between 1 and {self.max_platforms} platforms are allowed"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            options = int(request.data.get('options', 3))
+        except (TypeError, ValueError):
+            return Response({"error": "'options' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        options = max(1, min(options, self.max_options))
+        custom_prompt = request.data.get('prompt', '')
+
+        batch = generate_social_post_batch(
+            user=request.user,
             song=song,
-            caption=post_data['caption'],
-            hashtags=post_data['hashtags'],
-            image_url=post_data.get('image_url'),
-            platform=platform,
-            prompt_used=custom_prompt or post_data.get('default_prompt', '')
+            platforms=platforms,
+            custom_prompt=custom_prompt,
+            options=options
         )
 
-        serializer = self.get_serializer(social_post)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # One base image, fitted once per layout the platforms need. Local
+        # renders are drawn natively per layout so cropping never cuts the text.
+        layouts = {}
+        base = None
+        if is_provider_image(batch.get('image_url')):
+            base = persist_post_image(batch['image_url'], song.title, batch['artist_name'], batch['genre'])
+        for platform in platforms:
+            variant = PLATFORM_VARIANTS.get(platform, "square")
+            if variant in layouts:
+                continue
+            if base:
+                layouts[variant] = store_resized(base, VARIANTS[variant])
+            else:
+                layouts[variant] = persist_post_image(
+                    None, song.title, batch['artist_name'], batch['genre'], size=VARIANTS[variant]
+                )
+
+        image_degraded = ["social_post_image"] if "social_post_image" in degraded_stages() else []
+        posts = []
+        for platform in platforms:
+            image = layouts.get(PLATFORM_VARIANTS.get(platform, "square"))
+            for option in batch['variants'][platform]:
+                posts.append(SocialPost(
+                    song=song,
+                    caption=option['caption'],
+                    hashtags=option['hashtags'],
+                    image_url=image_url(image) if image else batch.get('image_url'),
+                    image_file=image.image.name if image else None,
+                    generated_image=image,
+                    platform=platform,
+                    prompt_used=custom_prompt or batch.get('default_prompt', ''),
+                    degraded_stages=(["social_post_caption"] if option.get('fallback') else []) + image_degraded,
+                ))
+
+        with transaction.atomic():
+            SocialPost.objects.bulk_create(posts)
+            # bulk_create sends no post_save
+            schedule_refresh(song.id, "social_posts")
+
+        serializer = SocialPostSerializer(posts, many=True, context={'request': request})
+        return Response({
+            "posts": serializer.data,
+            "degraded": degraded_stages(),
+        }, status=status.HTTP_201_CREATED)
+
+
+class GeneratedImageView(APIView):
+    """
+    GET: Serve a stored generated image, or one of its thumbnails with ?size=
+    Content-addressed, so responses are cacheable forever.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request, sha256):
+        image = get_object_or_404(GeneratedImage, sha256=sha256)
+        size = request.query_params.get('size')
+        name = image.thumbnails.get(size) if size else image.image.name
+        if not name:
+            raise Http404("Unknown thumbnail size")
+
+        etag = f'"{image.sha256}-{size or "full"}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            response = FileResponse(default_storage.open(name, 'rb'), content_type=content_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
 
 
 class SocialPostDetailView(generics.RetrieveDestroyAPIView):
@@ -240,6 +602,65 @@ class StreamingLinkListView(generics.ListCreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 
+class StreamingLinkBulkView(APIView):
+    """
+    POST: Add or update several streaming links at once
+    Body: {
+        "links": [
+            {"platform": "spotify", "url": "https://open.spotify.com/track/..."},
+            {"platform": "deezer", "url": "https://www.deezer.com/track/..."}
+        ]
+    }
+    Returns every active link of the song.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_links = 20
+
+    def post(self, request, song_id):
+        song = get_object_or_404(Song, id=song_id)
+
+        if song.user != request.user:
+            return Response({"error": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+
+        links = request.data.get('links')
+        if not isinstance(links, list) or not links:
+            return Response({"error": "'links' must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(links) > self.max_links:
+            return Response({"error": f"At most {self.max_links} links are allowed"}, status=status.HTTP_400_BAD_REQUEST)
+
+        validate_url = URLValidator(schemes=['http', 'https'])
+        urls = {}
+        for i, link in enumerate(links):
+            platform = str(link.get('platform', '')).strip().lower() if isinstance(link, dict) else ''
+            url = str(link.get('url', '')).strip() if isinstance(link, dict) else ''
+            if not platform or not url:
+                return Response(
+                    {"error": f"links[{i}]: both 'platform' and 'url' are required"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if len(platform) > 50 or len(url) > 500:
+                return Response({"error": f"links[{i}]: platform or url too long"}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                validate_url(url)
+            except ValidationError:
+                return Response({"error": f"links[{i}]: invalid url"}, status=status.HTTP_400_BAD_REQUEST)
+            urls[platform] = url  # a repeated platform keeps its last url
+
+        with transaction.atomic():
+            StreamingLink.objects.bulk_create(
+                [StreamingLink(song=song, platform=platform, url=url, is_active=True) for platform, url in urls.items()],
+                update_conflicts=True,
+                unique_fields=['song', 'platform'],
+                update_fields=['url', 'is_active'],
+            )
+            # bulk_create sends no post_save
+            schedule_refresh(song.id, "streaming_links")
+
+        active = StreamingLink.objects.filter(song=song, is_active=True).order_by('platform')
+        serializer = StreamingLinkSerializer(active, many=True)
+        return Response({"links": serializer.data}, status=status.HTTP_200_OK)
+
+
 class StreamingLinkDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     GET: Retrieve link
@@ -272,11 +693,16 @@ class ArtistDiscoveryView(generics.ListAPIView):
         - genre: Filter by primary_genre
         - experience: Filter by experience_level
         - language: Filter by languages_of_lyrics
-        - platform: Filter by current_platforms (contains)
-        - search: Search in stage_name or username
+        - platform: Comma-separated current_platforms, e.g. tiktok,youtube
+        - goal: Comma-separated goals_or_interests, e.g. promote,branding
+        - platform_match, goal_match: "any" (default) or "all" of the listed values
+        - search: Ranked full-text search over stage name, username and genre
+          (prefix and accent-insensitive; returns the best matches on one page)
+        - cursor, limit: keyset pagination (50 per page by default)
     """
     serializer_class = ArtistProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ArtistPagination
 
     def get_queryset(self):
         queryset = ArtistProfile.objects.all().select_related('user')
@@ -287,7 +713,8 @@ class ArtistDiscoveryView(generics.ListAPIView):
         # Filters
         genre = self.request.query_params.get('genre')
         if genre:
-            queryset = queryset.filter(primary_genre__iexact=genre)
+            # Same match as primary_genre__iexact, but can use artist_genre_id_idx
+            queryset = queryset.alias(genre_lower=Lower('primary_genre')).filter(genre_lower=genre.lower())
 
         experience = self.request.query_params.get('experience')
         if experience:
@@ -297,52 +724,226 @@ class ArtistDiscoveryView(generics.ListAPIView):
         if language:
             queryset = queryset.filter(languages_of_lyrics=language)
 
-        platform = self.request.query_params.get('platform')
-        if platform:
-            queryset = queryset.filter(current_platforms__contains=[platform])
+        queryset = self.filter_rows(queryset, ArtistPlatform, 'platform', PLATFORM_CHOICES)
+        queryset = self.filter_rows(queryset, ArtistGoal, 'goal', GOAL_CHOICES)
 
         search = self.request.query_params.get('search')
-        if search:
+        if search and not search_enabled():
             queryset = queryset.filter(
                 Q(stage_name__icontains=search) | 
                 Q(user__username__icontains=search)
             )
 
-        return queryset[:50]  # Limit to 50 results
+        return queryset
+
+    def filter_rows(self, queryset, model, field, choices):
+        """
+        Filter on a multi-value attribute through its indexed join table.
+        Alone, the join table drives the query (id IN ...). Next to a column
+        filter, that column's (value, -id) index drives it in page order and
+        each row is probed with EXISTS, so no sort is needed either way.
+        """
+        raw = self.request.query_params.get(field)
+        if not raw:
+            return queryset
+        values = normalise_choices(raw.split(','), choices)
+        if not values:
+            return queryset.none()
+
+        match_all = self.request.query_params.get(f'{field}_match') == 'all'
+        groups = [[value] for value in sorted(values)] if match_all else [sorted(values)]
+        probe = any(self.request.query_params.get(param) for param in ('genre', 'experience', 'language'))
+        for group in groups:
+            if probe:
+                rows = model.objects.filter(profile=OuterRef('pk'), **{f'{field}__in': group})
+                queryset = queryset.filter(Exists(rows))
+            else:
+                rows = model.objects.filter(**{f'{field}__in': group}).values('profile_id')
+                queryset = queryset.filter(id__in=rows)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        search = request.query_params.get('search')
+        if not search or not search_enabled():
+            return super().list(request, *args, **kwargs)
+
+        # Ranked results replace keyset order: filter the FTS hits, then sort by bm25
+        ranking = {artist_id: rank for artist_id, rank in search_artists(search)}
+        artists = self.get_queryset().filter(id__in=ranking)
+        limit = self.paginator.get_limit(request)
+        artists = sorted(artists, key=lambda artist: ranking[artist.id])[:limit]
+        return Response({
+            'next': None,
+            'next_cursor': None,
+            'has_more': False,
+            'results': self.get_serializer(artists, many=True).data,
+        })
+
+
+class SongSearchView(generics.GenericAPIView):
+    """
+    GET: Ranked full-text search over the current user's song titles,
+    transcriptions and lyrics, with a highlighted snippet per hit
+    Query params:
+        - q: search text (prefix and accent-insensitive)
+    """
+    serializer_class = SongSummarySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if search_enabled():
+            hits = search_songs(query, request.user.id)
+            ranking = {song_id: rank for song_id, rank, _ in hits}
+            snippets = {song_id: snippet for song_id, _, snippet in hits}
+            songs = Song.objects.only(*SongSummarySerializer.load_fields).filter(id__in=ranking)
+            songs = sorted(songs, key=lambda song: ranking[song.id])
+        else:
+            songs = list(
+                Song.objects.only(*SongSummarySerializer.load_fields)
+                .filter(user=request.user)
+                .filter(Q(title__icontains=query) | Q(transcription__icontains=query) | Q(lyrics_text__icontains=query))
+                .order_by('-uploaded_at', '-id')[:50]
+            )
+            snippets = {}
+
+        results = self.get_serializer(songs, many=True).data
+        for song, data in zip(songs, results):
+            data['snippet'] = snippets.get(song.id, '')
+        return Response({"results": results})
 
 
 # Legacy endpoints (keep for backward compatibility)
-class SocialContentView(generics.RetrieveAPIView):
+# Served with ETag / Last-Modified from a response cache cleared when the artifact is regenerated
+class SocialContentView(CachedArtifactMixin, generics.RetrieveAPIView):
     serializer_class = SocialContentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    artifact_model = SocialContent
 
     def get_object(self):
         song_id = self.kwargs['song_id']
         return get_object_or_404(SocialContent, song_id=song_id)
 
 
-class ReleasePlanView(generics.RetrieveAPIView):
+class ReleasePlanView(CachedArtifactMixin, generics.RetrieveAPIView):
     serializer_class = ReleasePlanSerializer
     permission_classes = [permissions.IsAuthenticated]
+    artifact_model = ReleasePlan
 
     def get_object(self):
         song_id = self.kwargs['song_id']
         return get_object_or_404(ReleasePlan, song_id=song_id)
 
 
-class ArtistBrandingView(generics.RetrieveAPIView):
+class ArtistBrandingView(CachedArtifactMixin, generics.RetrieveAPIView):
     serializer_class = ArtistBrandingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    artifact_model = ArtistBranding
+    lookup_url_kwarg = 'artist_id'
 
     def get_object(self):
         user_id = self.kwargs['artist_id']
         return get_object_or_404(ArtistBranding, user_id=user_id)
 
 
-class SongAnalyticsView(generics.RetrieveAPIView):
+class SongAnalyticsView(CachedArtifactMixin, generics.RetrieveAPIView):
     serializer_class = SongAnalyticsSerializer
     permission_classes = [permissions.IsAuthenticated]
+    artifact_model = SongAnalytics
 
     def get_object(self):
         song_id = self.kwargs['song_id']
         return get_object_or_404(SongAnalytics, song_id=song_id)
+
+
+# ---------------- Readiness ----------------
+class ReadinessView(APIView):
+    """
+    GET: 200 once this worker can take traffic, 503 while the audio
+    warmup (AUDIO_WARMUP) is still running, plus the worker's effective
+    thread budget. No auth, for load balancers.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        state = warmup_state()
+        code = status.HTTP_200_OK if state["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+        response = Response({"ready": state["ready"], "warmup": state["status"],
+                             "warmup_seconds": state["seconds"], "error": state["error"],
+                             "threads": threadbudget.report()}, status=code)
+        response["Cache-Control"] = "no-store"
+        return response
+
+
+class StageTimingView(APIView):
+    """
+    GET: Per-endpoint, per-stage latency histograms of this worker process
+    since it started (staff only)
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(timing.histograms(), status=status.HTTP_200_OK)
+
+
+class ProfileDownloadView(APIView):
+    """
+    GET: A request profile stored by cimback.profiling on this host, by the
+    name in the profiled response's X-Profile header (staff only)
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, name):
+        if name not in profiling.stored_profiles():
+            raise Http404
+        response = FileResponse(open(profiling.profile_path(name), "rb"), as_attachment=True, filename=name)
+        response["Content-Type"] = "text/plain; charset=utf-8" if name.endswith(".folded") else "application/octet-stream"
+        return response
+
+
+class MemoryStatsView(APIView):
+    """
+    GET: This worker's RSS, tracemalloc state, stored snapshots and per-endpoint,
+    per-stage memory figures of MEMORY_PROFILE_ENDPOINTS (staff only)
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(memory.summary(), status=status.HTTP_200_OK)
+
+
+class MemorySnapshotView(APIView):
+    """
+    POST: Take a tracemalloc snapshot of this worker (starts tracing if needed)
+    DELETE: Drop the snapshots and stop tracing (staff only)
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        return Response(memory.save_snapshot(), status=status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        memory.stop_tracing()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MemorySnapshotDiffView(APIView):
+    """
+    GET: Top allocation growth from a snapshot to ?against=<id>, or to now
+    (staff only)
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, snapshot_id):
+        against = request.query_params.get("against")
+        if against is not None and not against.isdigit():
+            return Response({"error": "against must be a snapshot id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        diff = memory.diff_snapshots(snapshot_id, int(against) if against is not None else None)
+        if diff is None:
+            return Response({"error": "Snapshot not found on this worker"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(diff, status=status.HTTP_200_OK)
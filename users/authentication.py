@@ -0,0 +1,146 @@
+# ============================================================
+# users/authentication.py - JWT AUTH WITHOUT A PER-REQUEST USER QUERY
+# ============================================================
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import ArtistProfile, User
+
+# Never kept in memory; loaded on access if a view really needs it
+USER_FIELDS = [f.attname for f in User._meta.concrete_fields if f.attname != "password"]
+PROFILE_FIELDS = [f.attname for f in ArtistProfile._meta.concrete_fields]
+
+
+class TTLCache:
+    """Thread-safe LRU of at most `size` entries, each kept for `ttl` seconds."""
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# user id -> (user values, profile values or None). Per process: saves in
+# another worker reach this one only once the entry expires, so the TTL
+# bounds how long a changed or revoked user can stay stale.
+user_cache = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+
+
+def load_user_record(user_id) -> Optional[tuple]:
+    user = User.objects.select_related("artist_profile").filter(pk=user_id).first()
+    if user is None:
+        return None
+    profile = getattr(user, "artist_profile", None)
+    return (
+        tuple(getattr(user, name) for name in USER_FIELDS),
+        tuple(getattr(profile, name) for name in PROFILE_FIELDS) if profile else None,
+    )
+
+
+def build_user(record) -> User:
+    """
+    Fresh User (with artist_profile attached, or known to be missing) from a
+    cached record, so request.user and request.user.artist_profile cost no query.
+    """
+    user_values, profile_values = record
+    user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, user_values)
+    profile = None
+    if profile_values is not None:
+        profile = ArtistProfile.from_db(DEFAULT_DB_ALIAS, PROFILE_FIELDS, profile_values)
+        profile._state.fields_cache["user"] = user
+    user._state.fields_cache["artist_profile"] = profile
+    return user
+
+
+def cached_user(user_id) -> Optional[User]:
+    record = user_cache.get(user_id)
+    if record is None:
+        record = load_user_record(user_id)
+        if record is None:
+            return None
+        user_cache.set(user_id, record)
+    return build_user(record)
+
+
+def invalidate_user(user_id) -> None:
+    user_cache.delete(user_id)
+
+
+def is_revoked(user: User, token) -> bool:
+    """
+    Tokens issued up to the user's last revocation are no longer accepted
+    ("iat" has one-second resolution, so the revocation second counts as revoked).
+    """
+    revoked_at = user.tokens_revoked_at
+    return revoked_at is not None and token.get("iat", 0) <= int(revoked_at.timestamp())
+
+
+def issue_tokens(user: User) -> RefreshToken:
+    """
+    Refresh token for `user`. Tokens carry only the user id: role and
+    profile come from `user_cache`, which saves and revocations keep fresh,
+    where claims would stay stale until the token expires.
+    """
+    return RefreshToken.for_user(user)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user_id claim through
+    `user_cache` instead of querying users_user on every request. The entry
+    is dropped when the user or their profile is saved and when the user
+    revokes their tokens.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if is_revoked(user, validated_token):
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return user
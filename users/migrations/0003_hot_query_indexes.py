@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-19 04:12
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_alter_artistprofile_languages_of_lyrics"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="artistprofile",
+            index=models.Index(
+                django.db.models.functions.text.Lower("primary_genre"),
+                models.F("experience_level"),
+                name="artist_genre_exp_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="artistprofile",
+            index=models.Index(
+                fields=["experience_level", "languages_of_lyrics"],
+                name="artist_exp_lang_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="artistprofile",
+            index=models.Index(fields=["languages_of_lyrics"], name="artist_lang_idx"),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0 on 2026-10-19 04:15
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="artistprofile",
+            name="artist_genre_exp_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="artistprofile",
+            name="artist_exp_lang_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="artistprofile",
+            name="artist_lang_idx",
+        ),
+        migrations.AddIndex(
+            model_name="artistprofile",
+            index=models.Index(
+                django.db.models.functions.text.Lower("primary_genre"),
+                models.OrderBy(models.F("id"), descending=True),
+                name="artist_genre_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="artistprofile",
+            index=models.Index(
+                fields=["experience_level", "-id"], name="artist_exp_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="artistprofile",
+            index=models.Index(
+                fields=["languages_of_lyrics", "-id"], name="artist_lang_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 5.0 on 2026-10-19 04:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_rows(apps, schema_editor):
+    from users.models import GOAL_CHOICES, PLATFORM_CHOICES, normalise_choices
+
+    ArtistProfile = apps.get_model("users", "ArtistProfile")
+    ArtistPlatform = apps.get_model("users", "ArtistPlatform")
+    ArtistGoal = apps.get_model("users", "ArtistGoal")
+    platforms, goals = [], []
+    for profile in ArtistProfile.objects.only("id", "current_platforms", "goals_or_interests").iterator():
+        for platform in normalise_choices(profile.current_platforms, PLATFORM_CHOICES):
+            platforms.append(ArtistPlatform(profile_id=profile.id, platform=platform))
+        for goal in normalise_choices(profile.goals_or_interests, GOAL_CHOICES):
+            goals.append(ArtistGoal(profile_id=profile.id, goal=goal))
+    ArtistPlatform.objects.bulk_create(platforms, batch_size=500)
+    ArtistGoal.objects.bulk_create(goals, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArtistGoal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "goal",
+                    models.CharField(
+                        choices=[
+                            ("promote", "Promoting Songs"),
+                            ("collaboration", "Collaboration"),
+                            ("monetization", "Monetization"),
+                            ("branding", "Branding"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="goal_rows",
+                        to="users.artistprofile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArtistPlatform",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "platform",
+                    models.CharField(
+                        choices=[
+                            ("youtube", "YouTube"),
+                            ("tiktok", "TikTok"),
+                            ("boomplay", "Boomplay"),
+                            ("spotify", "Spotify"),
+                            ("facebook", "Facebook"),
+                            ("instagram", "Instagram"),
+                            ("x", "X"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="platform_rows",
+                        to="users.artistprofile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="artistgoal",
+            constraint=models.UniqueConstraint(
+                fields=("goal", "profile"), name="artist_goal_unique"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="artistplatform",
+            constraint=models.UniqueConstraint(
+                fields=("platform", "profile"), name="artist_platform_unique"
+            ),
+        ),
+        migrations.RunPython(backfill_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_artist_platform_goal_rows"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="tokens_revoked_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.db.models import F
+from django.db.models.functions import Lower
 
 LANGUAGE_CHOICES = [
     ('english', 'English'),
@@ -37,6 +39,8 @@ GOAL_CHOICES = [
 class User(AbstractUser):
     is_artist = models.BooleanField(default=False)
     role = models.CharField(max_length=20, default='artist')  # artist, beatmaker, producer, etc.
+    # JWTs issued up to this moment are rejected (logout everywhere)
+    tokens_revoked_at = models.DateTimeField(null=True, blank=True)
 
 
 class ArtistProfile(models.Model):
@@ -48,3 +52,64 @@ class ArtistProfile(models.Model):
     current_platforms = models.JSONField(default=list)  # Example: ["YouTube", "TikTok", "Instagram"]
     social_media_handles = models.JSONField(default=dict, blank=True)  # Example: {"instagram": "@user"}
     goals_or_interests = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [
+            # ArtistDiscoveryView: one index per filter, each already in page
+            # order (-id), so any filter combination reads rows pre-sorted and
+            # stops at the page limit. Genre is matched case-insensitively.
+            models.Index(Lower('primary_genre'), F('id').desc(), name='artist_genre_id_idx'),
+            models.Index(fields=['experience_level', '-id'], name='artist_exp_id_idx'),
+            models.Index(fields=['languages_of_lyrics', '-id'], name='artist_lang_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.sync_attributes()
+
+    def sync_attributes(self):
+        """Mirror current_platforms / goals_or_interests into their indexed join tables."""
+        _sync_rows(ArtistPlatform, self, 'platform', normalise_choices(self.current_platforms, PLATFORM_CHOICES))
+        _sync_rows(ArtistGoal, self, 'goal', normalise_choices(self.goals_or_interests, GOAL_CHOICES))
+
+
+def normalise_choices(values, choices):
+    """Known choice keys in `values`, matched case-insensitively ("YouTube" -> "youtube")."""
+    keys = {key.lower(): key for key, _ in choices}
+    if not isinstance(values, (list, tuple)):
+        return set()
+    return {keys[v.lower()] for v in values if isinstance(v, str) and v.lower() in keys}
+
+
+def _sync_rows(model, profile, field, wanted):
+    current = set(model.objects.filter(profile=profile).values_list(field, flat=True))
+    if current - wanted:
+        model.objects.filter(profile=profile, **{f"{field}__in": current - wanted}).delete()
+    if wanted - current:
+        model.objects.bulk_create(
+            [model(profile=profile, **{field: value}) for value in sorted(wanted - current)],
+            ignore_conflicts=True,
+        )
+
+
+# Denormalised copies of the JSON list attributes, one row per value, so
+# discovery can filter on them with index lookups. Kept in sync by
+# ArtistProfile.save(); the JSON fields stay the source of truth.
+class ArtistPlatform(models.Model):
+    profile = models.ForeignKey(ArtistProfile, on_delete=models.CASCADE, related_name='platform_rows')
+    platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['platform', 'profile'], name='artist_platform_unique'),
+        ]
+
+
+class ArtistGoal(models.Model):
+    profile = models.ForeignKey(ArtistProfile, on_delete=models.CASCADE, related_name='goal_rows')
+    goal = models.CharField(max_length=20, choices=GOAL_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['goal', 'profile'], name='artist_goal_unique'),
+        ]
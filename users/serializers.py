@@ -1,25 +1,45 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import cached_user, is_revoked
 from .models import ArtistProfile
 from music.models import Song
+from music.serializers import SongSummarySerializer
 
 User = get_user_model()
 
-class SongSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Song
-        fields = "__all__"
+# Number of most recent songs embedded in a profile; the full catalog is
+# served page by page from /api/music/songs/
+PROFILE_SONG_PREVIEW = 5
 
 # -----------------------------
 # Artist Profile Serializer
 # -----------------------------
 class ArtistProfileSerializer(serializers.ModelSerializer):
-    songs = SongSerializer(many=True, read_only=True, source='music_songs')
+    songs = serializers.SerializerMethodField()
+    song_count = serializers.SerializerMethodField()
+
     class Meta:
         model = ArtistProfile
         fields = '__all__'
         read_only_fields = ('user',)
 
+    def get_songs(self, obj):
+        recent = (
+            Song.objects.filter(artist_id=obj.id)
+            .only(*SongSummarySerializer.load_fields)
+            .order_by('-uploaded_at', '-id')[:PROFILE_SONG_PREVIEW]
+        )
+        return SongSummarySerializer(recent, many=True).data
+
+    def get_song_count(self, obj):
+        # Annotated by the profile views; falls back to a COUNT query
+        count = getattr(obj, 'song_count', None)
+        return count if count is not None else obj.music_songs.count()
+
 
 # -----------------------------
 # User Serializer
@@ -112,3 +132,17 @@ class RegisterSerializer(serializers.ModelSerializer):
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
+
+
+# -----------------------------
+# Token Refresh Serializer
+# -----------------------------
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuse refresh tokens issued before the user logged out everywhere."""
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        user = cached_user(refresh.get(jwt_settings.USER_ID_CLAIM))
+        if user is None or not user.is_active or is_revoked(user, refresh):
+            raise InvalidToken("Token has been revoked")
+        return super().validate(attrs)
@@ -0,0 +1,20 @@
+# ============================================================
+# users/signals.py - AUTH CACHE INVALIDATION
+# ============================================================
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+from .models import ArtistProfile, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=ArtistProfile)
+@receiver(post_delete, sender=ArtistProfile)
+def drop_cached_profile_user(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
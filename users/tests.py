@@ -1,3 +1,98 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from music.models import Song
+from .authentication import user_cache
+from .models import User, ArtistProfile
+from .serializers import PROFILE_SONG_PREVIEW
+
+
+class ProfilePayloadTests(TestCase):
+    """Profile reads stay constant-size and constant-query as the catalog grows."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="artist", is_artist=True)
+        self.profile = ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_songs(self, count):
+        for i in range(count):
+            Song.objects.create(user=self.user, title=f"Song {i}", transcription="long lyrics " * 200)
+
+    def get_profile(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/users/profile/")
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_profile_queries_do_not_grow_with_catalog(self):
+        self.add_songs(2)
+        _, few = self.get_profile()
+        self.add_songs(30)
+        data, many = self.get_profile()
+        self.assertEqual(few, many)
+        self.assertEqual(data["song_count"], 32)
+        self.assertEqual(len(data["songs"]), PROFILE_SONG_PREVIEW)
+
+    def test_profile_songs_are_summaries(self):
+        self.add_songs(1)
+        data, _ = self.get_profile()
+        self.assertNotIn("transcription", data["songs"][0])
+        self.assertNotIn("lyrics_text", data["songs"][0])
+
+    def test_song_list_is_paginated(self):
+        self.add_songs(25)
+        response = self.client.get("/api/music/songs/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 25)
+        self.assertEqual(len(response.json()["results"]), 20)
+        self.assertNotIn("transcription", response.json()["results"][0])
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Authenticated requests resolve the user from the in-process cache, not the DB."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username="artist", password="pw-12345", role="producer")
+        self.profile = ArtistProfile.objects.create(
+            user=self.user, stage_name="DJ Frank", primary_genre="HipHop", experience_level="beginner",
+            languages_of_lyrics="english", current_platforms=["tiktok"], goals_or_interests=["promote"]
+        )
+        self.client = APIClient()
+        tokens = self.client.post("/api/users/login/", {"username": "artist", "password": "pw-12345"}).json()
+        self.access, self.refresh = tokens["access"], tokens["refresh"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+    def user_queries(self, url="/api/music/songs/"):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q["sql"] for q in ctx.captured_queries if '"users_user"' in q["sql"].split(" WHERE")[0]]
+
+    def test_claims_and_cache(self):
+        # Role and profile aren't claims: they'd go stale, and the cache serves them anyway
+        access = AccessToken(self.access)
+        self.assertEqual((access.get("role"), access.get("profile_id")), (None, None))
+
+        self.assertEqual(len(self.user_queries()), 1)
+        self.assertEqual(self.user_queries(), [])
+
+        # Profile saves drop the entry; the profile then comes with the user, in one query
+        self.profile.stage_name = "DJ F"
+        self.profile.save()
+        self.assertEqual(len(self.user_queries()), 1)
+        self.assertEqual(self.client.get("/api/users/profile/").json()["stage_name"], "DJ F")
+
+    def test_logout_revokes_tokens(self):
+        self.assertEqual(self.client.post("/api/users/logout/").status_code, 204)
+        self.assertEqual(self.client.get("/api/music/songs/").status_code, 401)
+        response = self.client.post("/api/users/token/refresh/", {"refresh": self.refresh}, format="json")
+        self.assertEqual(response.status_code, 401)
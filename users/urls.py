@@ -1,6 +1,8 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import RegisterView, ArtistProfileDetailView, ArtistProfileUpdateView, CustomLoginView
+from .views import (
+    RegisterView, ArtistProfileDetailView, ArtistProfileUpdateView, CustomLoginView, LogoutView,
+    RevocableTokenRefreshView
+)
 
 urlpatterns = [
     # User registration
@@ -8,7 +10,8 @@ urlpatterns = [
 
     # JWT login
     path('login/', CustomLoginView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', RevocableTokenRefreshView.as_view(), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
 
     # ArtistProfile endpoints
     path('profile/', ArtistProfileDetailView.as_view(), name='artist_profile_detail'),
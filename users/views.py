@@ -1,19 +1,26 @@
 # users/views.py
 
+import logging
+
+from django.db.models import Count
+from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
+from django.utils import timezone
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from .authentication import invalidate_user, issue_tokens
 from .models import User
-from .serializers import RegisterSerializer, UserSerializer
+from .serializers import RegisterSerializer, RevocableTokenRefreshSerializer, UserSerializer
 from .models import ArtistProfile
 from .serializers import ArtistProfileSerializer
 
+logger = logging.getLogger(__name__)
+
 # -----------------------------
 # Registration Endpoint
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
@@ -27,7 +34,7 @@ class RegisterView(generics.CreateAPIView):
         user = serializer.save()
 
         # JWT token
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_tokens(user)
         return Response({
             "user_id": user.id,
             "token": str(refresh.access_token)
@@ -59,7 +66,8 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
             'email': self.user.email,
             # add any other fields you want
         }
-        print(data)
+        # Never log `data`: it holds the tokens
+        logger.info("Login", extra={"user_id": self.user.id})
 
         return data
 
@@ -76,7 +84,6 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
 
 from .serializers import UserSerializer  # optional, if you want full control
 
@@ -101,11 +108,7 @@ class CustomLoginView(APIView):
             }, status=status.HTTP_401_UNAUTHORIZED)
 
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
-        
-        # Optional: add custom claims to the access token
-        refresh.access_token['role'] = user.role
-        refresh.access_token['user_id'] = user.id
+        refresh = issue_tokens(user)
 
         return Response({
             'refresh': str(refresh),
@@ -120,6 +123,23 @@ class CustomLoginView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class LogoutView(APIView):
+    """
+    POST: Revoke every access and refresh token issued to the current user
+    so far (all devices)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        User.objects.filter(pk=request.user.pk).update(tokens_revoked_at=timezone.now())
+        invalidate_user(request.user.pk)  # update() sends no post_save
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RevocableTokenRefreshView(TokenRefreshView):
+    serializer_class = RevocableTokenRefreshSerializer
+
+
 # -----------------------------
 # User Profile Endpoint
 # -----------------------------
@@ -147,7 +167,10 @@ class ArtistProfileDetailView(generics.RetrieveAPIView):
     def get_object(self):
         # user_id = self.kwargs['user_id']
         # return ArtistProfile.objects.get(user_id=user_id)
-        return self.request.user.artist_profile
+        return get_object_or_404(
+            ArtistProfile.objects.annotate(song_count=Count('music_songs')),
+            user=self.request.user
+        )
     
     
 
@@ -159,5 +182,8 @@ class ArtistProfileUpdateView(generics.UpdateAPIView):
 
     def get_object(self):
         user_id = self.kwargs['user_id']
-        return ArtistProfile.objects.get(user_id=user_id)
+        return get_object_or_404(
+            ArtistProfile.objects.annotate(song_count=Count('music_songs')),
+            user_id=user_id
+        )
 